@@ -21,7 +21,21 @@ serial interface supported by the devices. There is currently only one class pro
 
 import time
 import re
-from util import Configurator, Configurable
+import sys
+import io
+import array
+from collections import OrderedDict
+from util import Configurator, Configurable, DeviceError, parse_settings, join_settings
+from hardcopy import read_hardcopy, FormatCache, FORMATS, IMAGE_FORMATS
+
+
+_MEASUREMENT_MNEMONICS = (
+    "AMPlitude", "AREa", "BURst", "CARea", "CMEan", "CRMs", "DELay", "FALL",
+    "FREQuency", "HIGH", "LOW", "MAXimum", "MEAN", "MINImum", "NDUty", "NOVershoot",
+    "NWIdth", "PDUty", "PERIod", "PHAse", "PK2pk", "POVershoot", "PWIdth", "RISe", "RMS",
+)
+
+_MEASUREMENT_SOURCES = ("CH1", "CH2", "CH3", "CH4", "MATH", "REF1", "REF2", "REF3", "REF4")
 
 
 class TDS3k(Configurable):
@@ -43,6 +57,12 @@ class TDS3k(Configurable):
         
     """
 
+    format_cache = None
+    """
+    The `~pytek.hardcopy.FormatCache` used by `probe_img_formats` and by `screenshot` with ``fmt="auto"``.
+    If `None` (the default), a cache using the default file is created when it's first needed.
+    """
+
     def __init__(self, port):
         """
         Instances of this class are instantiated by passing in a serial port object, which
@@ -217,20 +237,113 @@ class TDS3k(Configurable):
 
 
 
+    ### SETUP ###
+
+    SETUP_MAX_LINE = 200
+    """
+    The maximum length of a single compound command line sent by `restore`.
+    """
+
+    def snapshot(self, query="SET"):
+        """
+        Captures the complete setup of the device with a single query, and returns it as an
+        `~collections.OrderedDict` mapping the header of each setting (e.g., ``"ACQUIRE:STOPAFTER"``)
+        to its value as the device reported it, in the order the device reported them. This
+        includes every setting the device reports, not just those pytek has methods for.
+        See `pytek.util.parse_settings`.
+
+        Pass the result to `restore` to return the device to this setup later.
+
+        :param str query:   Optional, the query to send, without the question mark: ``"SET"`` (the
+            default) or ``"*LRN"``, which give the same response on TDS 3000 series devices.
+
+        Example:
+
+        >>> setup = tds.snapshot()
+        >>> setup["ACQUIRE:STOPAFTER"]
+        'RUNSTOP'
+        >>> # ... run a test, changing settings ...
+        >>> tds.restore(setup)
+        OrderedDict([('ACQUIRE:STOPAFTER', 'RUNSTOP'), ('TRIGGER:A:MODE', 'AUTO')])
+        >>>
+
+        """
+        return parse_settings(self.send_query(query))
+
+    def restore(self, snapshot):
+        """
+        Returns the device to the setup captured by `snapshot`. The current setup is captured first,
+        and only the settings whose values differ are sent, in the order of the snapshot, joined into
+        as few compound command lines (of at most `SETUP_MAX_LINE` characters) as possible.
+
+        Since the settings are changed with raw commands, the settings cache (see
+        `~pytek.util.Configurable.enable_settings_cache`) is invalidated.
+
+        Returns an `~collections.OrderedDict` of the settings which were sent.
+        """
+        current = self.snapshot()
+        changes = OrderedDict((k, v) for k, v in snapshot.items() if current.get(k) != v)
+        for line in join_settings(changes, self.SETUP_MAX_LINE):
+            self.send_command(line)
+        self.invalidate()
+        return changes
+
+
+    ESR_ERRORS = 0x3C
+    """
+    The bits of the Standard Event Status Register which indicate errors: command errors (``CME``),
+    execution errors (``EXE``), device errors (``DDE``) and query errors (``QYE``).
+    """
+
+    def check_errors(self):
+        """
+        Checks whether the device has reported an error since the status was last read, with a single
+        ``*ESR?;:EVMSG?`` query. Raises a `~pytek.util.DeviceError` with the device's event code and
+        message if it has.
+        """
+        self.headers_off()
+        self.send_command("*ESR?;:EVMSG?")
+        status, _, event = self.port.readline().rstrip().partition(";")
+        status = int(status)
+        if status & self.ESR_ERRORS:
+            code, _, message = event.partition(",")
+            raise DeviceError(message.strip().strip('"') or "Device error.", int(code) if code.strip() else None, status)
+
+    def send_batch(self, settings):
+        """
+        Extends `Configurable.send_batch <pytek.util.Configurable.send_batch>`: clears the status of
+        the device (``*CLS``) as part of the first compound command, and checks for errors with
+        `check_errors` once all of the settings have been sent. If there was an error, the cached
+        values of the batched settings are invalidated, since it isn't known which were applied.
+
+        .. seealso::
+            `~pytek.util.Configurable.batch`
+        """
+        super(TDS3k, self).send_batch([("*CLS", "")] + list(settings))
+        try:
+            self.check_errors()
+        except DeviceError:
+            self.invalidate(*[name for name, val in settings])
+            raise
+
+
     ### ACQUISITION ###
 
-    @Configurator.boolean("ACQUIRE:STATE", nocase=True)
+    @Configurator.boolean("ACQUIRE:STATE", nocase=True, after=("acquire_single", "trigger_auto"))
     def acquire_state(flag):
         """
         +++
         The ``ACQUIRE:STATE`` setting is related to the "RUN / STOP" button on the device,
         and it basically configures whether the device is actually acquiring data or not.
+        The device stops acquiring by itself (e.g., after a single sequence), so this setting
+        is never cached. When configured together with `acquire_single` and `trigger_auto`
+        (e.g., by a `~pytek.profile.Profile`), it's configured after them.
         """
         if flag:
             return ('1', 'ON', 'RUN')
         return ('0', 'OFF', 'STOP')
 
-    @Configurator.boolean("ACQUIRE:STOPAFTER", nocase=True)
+    @Configurator.boolean("ACQUIRE:STOPAFTER", nocase=True, volatile=False)
     def acquire_single(flag):
         """
         +++
@@ -243,6 +356,16 @@ class TDS3k(Configurable):
             return ('SEQ', 'SEQUENCE')
         return ('RUN', 'RUNST', 'RUNSTOP')
 
+    @Configurator.numeric("ACQUIRE:NUMAVG", range=(2, 512), values=(2, 4, 8, 16, 32, 64, 128, 256, 512),
+        integer=True, volatile=False)
+    def acquire_averages():
+        """
+        +++
+        The ``ACQUIRE:NUMAVG`` setting is the number of waveforms averaged when the device is in
+        average acquisition mode. The device only supports powers of two in this range, so other
+        values are rejected rather than rounded by the device.
+        """
+
 
     ### TRIGGER ###
 
@@ -254,7 +377,7 @@ class TDS3k(Configurable):
         """
         self.send_command("TRIGGER", "FORCE");
 
-    @Configurator.boolean("TRIGGER:A:MODE", nocase=True)
+    @Configurator.boolean("TRIGGER:A:MODE", nocase=True, volatile=False)
     def trigger_auto(flag):
         """
         The ``TRIGGER:A:MODE`` is related to the "AUTO" and "NORMAL" selections in
@@ -268,23 +391,11 @@ class TDS3k(Configurable):
         return ["norm", "normal"]
 
 
-    __TRIGGER_STATE_LIST = [
-        ["auto", ],
-        ["armed", ],
-        ["ready", ],
-        ["save", "sav"],
-        ["trigger", "trig"],
-    ]
-    __TRIGGER_STATES = {}
-    for seq in __TRIGGER_STATE_LIST:
-        val = seq[0]
-        for k in seq:
-            __TRIGGER_STATES[k] = val
-
-    def trigger_state(self):
+    @Configurator.enum("TRIGGER:STATE", readonly=True)
+    def trigger_state():
         """
         Returns a string indicating the current trigger state of the device.
-        This queries the ``TRIGGER:STATE`` setting on the device.
+        This queries the ``TRIGGER:STATE`` setting on the device, which is read-only.
 
         The following list gives the possible return values:
 
@@ -294,19 +405,164 @@ class TDS3k(Configurable):
         * **save** - indicates that acquisition is stopped or that all channels are off.
         * **trigger** - indicates that the oscilloscope has seen a trigger and is acquiring the posttrigger information.
 
+        Any other reply from the device is returned as it is.
         """
-        val = self.send_query("TRIGGER:STATE")
-        try:
-            return self.__TRIGGER_STATES[val.lower()]
-        except KeyError:
-            return val
+        return (
+            ("auto", ),
+            ("armed", ),
+            ("ready", ),
+            ("save", "sav"),
+            ("trigger", "trig"),
+        )
+
+
+
+    ### MEASUREMENT ###
+
+    MEASUREMENT_MNEMONICS = _MEASUREMENT_MNEMONICS
+    """
+    The measurement types supported by the ``MEASUREMENT:IMMED:TYPE`` setting, in mnemonic
+    notation: the upper case part is the abbreviated form. See `measurement_type`.
+    """
+
+    MEASUREMENT_TYPES = tuple(m.upper() for m in MEASUREMENT_MNEMONICS)
+    """
+    The measurement types supported by the ``MEASUREMENT:IMMED:TYPE`` setting, in long form.
+    See `measurement_type`.
+    """
+
+    MEASUREMENT_SOURCES = _MEASUREMENT_SOURCES
+    """
+    The waveforms which can be measured, for the ``MEASUREMENT:IMMED:SOURCE1`` setting.
+    See `measurement_source`.
+    """
+
+    MEASUREMENT_MAX_LINE = 200
+    """
+    The maximum length of a single compound command line sent by `measure_immediate`.
+    """
+
+    @Configurator.enum("MEASUREMENT:IMMED:TYPE", volatile=False)
+    def measurement_type():
+        """
+        +++
+        The ``MEASUREMENT:IMMED:TYPE`` setting selects the type of measurement made by the
+        immediate measurement, whose value is queried with ``MEASUREMENT:IMMED:VALUE``. See
+        `MEASUREMENT_TYPES` for the possible values, which can be given in long or abbreviated
+        form, in any case. Queries return the abbreviated form, such as ``"FREQ"``, as the
+        device replies with.
+
+        .. seealso::
+            `measure_immediate`
+        """
+        return [(m,) for m in _MEASUREMENT_MNEMONICS]
+
+    @Configurator.enum("MEASUREMENT:IMMED:SOURCE1", volatile=False)
+    def measurement_source():
+        """
+        +++
+        The ``MEASUREMENT:IMMED:SOURCE1`` setting selects the waveform measured by the immediate
+        measurement, one of `MEASUREMENT_SOURCES`, e.g., ``"CH1"``, ``"MATH"`` or ``"REF2"``.
+
+        .. seealso::
+            `measure_immediate`
+        """
+        return [(src,) for src in _MEASUREMENT_SOURCES]
+
+    def measure_immediate(self, measurements):
+        """
+        Has the device make a set of measurements with its immediate measurement (``MEASUREMENT:IMMED``),
+        and returns the results as a dictionary mapping each ``(type, source)`` pair to a `float`
+        value. Measurements the device can't make (for which it reports ``9.9E37``) are returned as ``nan``.
+
+        :param measurements:    A sequence of ``(type, source)`` pairs, where `type` is one of the
+            `MEASUREMENT_TYPES` (long or abbreviated form, in any case), and `source` is one of the
+            `MEASUREMENT_SOURCES`. The keys of the returned dictionary are the pairs exactly as given.
+            Pairs which differ only in spelling (e.g., ``("FREQ", "CH1")`` and ``("frequency", "ch1")``)
+            are only measured once.
+
+        Types and sources are validated in the same way as by `measurement_type` and `measurement_source`,
+        and a `ValueError` is raised for any invalid pair, before anything is sent to the device.
+
+        Rather than configuring `measurement_type` and `measurement_source` and querying the value
+        one measurement at a time, the measurements are grouped by source so that each source is only
+        selected once, and the commands are sent as compound lines, each of which sets the type and
+        queries the value for several measurements. The device replies to all of the queries in a line
+        with a single line, so it takes one round trip per line. For example, ten measurements on two
+        channels are typically made with a single round trip.
+
+        Example:
+
+        >>> tds.measure_immediate([("FREQ", "CH1"), ("PK2PK", "CH1"), ("PK2PK", "CH2")])
+        {('FREQ', 'CH1'): 1000.0, ('PK2PK', 'CH1'): 3.28, ('PK2PK', 'CH2'): 0.2}
+        >>>
+
+        .. note::
+
+            This leaves the `measurement_type` and `measurement_source` set to the last
+            type and source measured, and invalidates their cached values.
+
+        """
+        #Pairs are validated and keyed by their canonical forms, from the same lookup tables as the
+        # settings. Each type is sent as first spelled, and each source in its canonical form.
+        type_config = self.configurators["measurement_type"]
+        source_config = self.configurators["measurement_source"]
+        canonical = lambda config, val: config.get(self, config.set(self, val))
+        groups = []
+        sources = {}
+        requested = {}
+        for pair in measurements:
+            mtype, source = pair
+            key = (canonical(type_config, mtype), canonical(source_config, source))
+            if key not in requested:
+                requested[key] = []
+                if key[1] not in sources:
+                    sources[key[1]] = []
+                    groups.append(key[1])
+                sources[key[1]].append((key, mtype.strip().upper()))
+            if pair not in requested[key]:
+                requested[key].append(pair)
+
+        results = {}
+        line = []
+        pending = []
+        def flush():
+            if not pending:
+                return
+            self.headers_off()
+            self.send_command(";".join(line))
+            values = self.port.readline().rstrip().split(";")
+            if len(values) != len(pending):
+                raise ValueError("Expected %d measurement values, received: %r" % (len(pending), values))
+            for key, val in zip(pending, values):
+                val = float(val)
+                for pair in requested[key]:
+                    results[pair] = float("nan") if val >= 9.9e37 else val
+            del line[:]
+            del pending[:]
+
+        #Commands after the first in each line are relative to the MEASUREMENT:IMMED node.
+        for source in groups:
+            for i, (key, mtype) in enumerate(sources[source]):
+                parts = ["TYPE %s" % mtype, "VALUE?"]
+                if i == 0:
+                    parts.insert(0, "SOURCE1 %s" % source)
+                if line and len(";".join(line + parts)) > self.MEASUREMENT_MAX_LINE:
+                    flush()
+                if not line:
+                    parts[0] = ":MEASUREMENT:IMMED:" + parts[0]
+                line.extend(parts)
+                pending.append(key)
+        flush()
+        self.invalidate("MEASUREMENT:IMMED:TYPE", "MEASUREMENT:IMMED:SOURCE1")
+        return results
 
 
 
 
     ### Waveform and Data ###
 
-    __WFM_PREAMBLE_FIELDS = (
+    WFM_PREAMBLE_FIELDS = (
             ('bytes_per_sample', int,),
             ('bits_per_sample', int,),
             ('encoding', str,),
@@ -324,8 +580,13 @@ class TDS3k(Configurable):
             ('y_offset', float,),
             ('y_unit', str,),
     )
-    __WFM_PREAMBLE_FIELD_NAMES = tuple(f[0] for f in __WFM_PREAMBLE_FIELDS)
-    __WFM_PREAMBLE_FIELD_CONVERTERS = tuple(f[1] for f in __WFM_PREAMBLE_FIELDS)
+    """
+    The fields of the waveform preamble, in the order they are reported by the device, as
+    a sequence of ``(name, type)`` pairs. The names are the keys of the dictionary returned
+    by `get_waveform_preamble`, and the types are used to convert the values reported by the device.
+    """
+    __WFM_PREAMBLE_FIELD_NAMES = tuple(f[0] for f in WFM_PREAMBLE_FIELDS)
+    __WFM_PREAMBLE_FIELD_CONVERTERS = tuple(f[1] for f in WFM_PREAMBLE_FIELDS)
 
     def get_waveform_preamble(self):
         """
@@ -442,40 +703,121 @@ class TDS3k(Configurable):
         point_count = self.get_num_points()
 
         start_time = time.time()
-        self.send_command("CURVE?")
-        data = self.get_response()
-
+        preamble_data, points = self.__read_curve(width, point_count)
         stop_time = time.time()
 
-        #Strip trailing linebreak.
-        if(ord(data[-1]) == 0x0A):
-            data = data[:-1]
+        if preamble or timing:
+            if preamble:
+                ret = [preamble_data, points]
+            else:
+                ret = [points]
+            if timing:
+                ret.append(stop_time - start_time)
+            return ret
 
-        length = len(data)
-        preamble_len = length - width*point_count
-        preamble_data = data[:preamble_len]
+        return points
+
+    def __read_curve(self, width, point_count):
+        """
+        Sends the ``CURVE?`` query and reads back the curve data, returning a tuple ``(preamble_data, points)``
+        as described in `get_curve`.
+        """
+        self.send_command("CURVE?")
+        preamble_data, data = self.__read_block()
 
         points = []
         if width == 2:
-            for i in xrange(preamble_len, len(data), 2):
+            for i in xrange(0, len(data), 2):
                 msB = ord(data[i])
                 lsB = ord(data[i+1])
                 points.append(msB << 8 | lsB)
         else:
-            points = [ord(b) for b in data[preamble_len:]]
+            points = [ord(b) for b in data]
 
         assert(len(points) == point_count)
+        return preamble_data, points
 
-        if preamble or timing:
-            if preamble:
-                ret = [preamble_data, points]
-            else:
-                ret = [points]
-            if timing:
-                ret.append(stop_time - start_time)
-            return ret
+    def __read_block(self):
+        """
+        Reads a definite length block, ``#<n><length><data>``, such as the response to ``CURVE?``, from
+        the `port`, along with the linefeed which terminates it. Returns a tuple ``(header, data)``.
 
-        return points
+        Unlike `get_response`, this reads exactly the number of bytes given in the header, so it returns
+        as soon as the block has arrived, instead of waiting for the port to time out. Like `get_response`,
+        it waits indefinitely for the first byte.
+        """
+        while True:
+            header = self.port.read(1)
+            if len(header):
+                break
+        header += self.__read_exactly(1)
+        if header[0] != "#" or header[1] not in "123456789":
+            raise ValueError("Expected a definite length block, received: %r" % header)
+        header += self.__read_exactly(int(header[1]))
+        data = self.__read_exactly(int(header[2:]))
+
+        #Consume the terminating linefeed, so it isn't taken as the start of the next response.
+        self.port.read(1)
+        return header, data
+
+    def __read_exactly(self, count):
+        """
+        Reads exactly `count` bytes from the `port`, raising a `ValueError` if it times out first.
+        """
+        data = ""
+        while len(data) < count:
+            chunk = self.port.read(count - len(data))
+            if not len(chunk):
+                raise ValueError("Expected %d bytes from the device, received %d." % (count, len(data)))
+            data += chunk
+        return data
+
+    def iter_curve(self, source="CH1", double=True, start=1, stop=10000, window=1000):
+        """
+        Like `get_curve`, but transfers the curve in consecutive windows of at most `window` points,
+        yielding each window as it arrives. This is a generator which yields a tuple ``(offset, points)``
+        for each window, where `offset` is the index of the window's first point relative to `start`
+        (i.e., 0 for the first window), and `points` is a sequence of data points as from `get_curve`.
+
+        Transferring a curve in windows takes a little longer in total than transferring it all at once,
+        but lets the caller process the curve as it arrives, and abandon the transfer early by simply
+        not iterating any further: no more data is requested from the device once the generator is
+        no longer consumed.
+
+        The waveform source and data format are configured once, before the first window is transferred,
+        so the parameters have the same meaning as for `get_curve`.
+
+        .. warning::
+
+            Like `get_curve`, this method will set waveform preamble and data parameters on the device.
+            In particular, ``DATA:START`` and ``DATA:STOP`` will be left at the bounds of the last window
+            transferred.
+
+        """
+        width = 1
+        if double:
+            width = 2
+
+        if start is None:
+            start = 1
+        if stop is None:
+            stop = 10000
+
+        self.headers_off()
+        self.send_command("DATA:SOURCE", source)
+        self.send_command("DATA:WIDTH", str(width))
+        self.send_command("DATA:ENCDG", "RPBinary")
+        self.send_command("WFMPRE:PT_Fmt", "Y")
+
+        for first in xrange(start, stop + 1, window):
+            last = min(first + window - 1, stop)
+            self.send_command("DATA:START", str(first))
+            self.send_command("DATA:STOP", str(last))
+            preamble_data, points = self.__read_curve(width, self.get_num_points())
+            yield first - start, points
+            if len(points) < last - first + 1:
+                #The record is shorter than requested.
+                break
 
     def get_waveform(self, source="CH1", double=True, start=1, stop=10000, preamble=False, timing=False):
         """
@@ -515,6 +857,22 @@ class TDS3k(Configurable):
             return ret
         return data
 
+    def get_waveform_array(self, source="CH1", double=True, start=1, stop=10000):
+        """
+        Similar to `get_waveform`, but returns the data as a `~pytek.waveform.Waveform` object,
+        which holds the raw curve (as from `get_curve`) in a `numpy` array together with the
+        waveform preamble (as from `get_waveform_preamble`), instead of a generator of scaled
+        points. Scaled values can be computed from the object for the whole record at once.
+
+        This is the form of waveform data expected by the host-side analysis modules of |PYTEK|.
+        It requires `numpy`.
+
+        Parameters are the same as for `get_curve`.
+        """
+        from .waveform import Waveform
+        curve = self.get_curve(source=source, double=double, start=start, stop=stop)
+        return Waveform(curve, self.get_waveform_preamble())
+
     def get_num_points(self):
         """
         Queries the number of points that will be sent in a waveform or curve query,
@@ -554,20 +912,130 @@ class TDS3k(Configurable):
         """
         return self.query_quoted_string("WFMPRE:XUNIT")
 
+    __WFM_PREAMBLE_HEADERS = (
+            ('x_incr', 'XINCR', repr),
+            ('pt_offset', 'PT_OFF', str),
+            ('xzero', 'XZERO', repr),
+            ('x_units', 'XUNIT', lambda v: v if v.startswith('"') else '"%s"' % v),
+            ('y_scale', 'YMULT', repr),
+            ('y_zero', 'YZERO', repr),
+            ('y_offset', 'YOFF', repr),
+            ('y_unit', 'YUNIT', lambda v: v if v.startswith('"') else '"%s"' % v),
+    )
+
+    def put_waveform(self, ref, data, preamble=None, double=None):
+        """
+        Uploads a curve to one of the device's reference memories, for display. This is the inverse
+        of `get_curve`: the data points are raw, unsigned integers in the same range as returned by
+        `get_curve`, and they are scaled on the device according to the given waveform preamble.
+
+        The waveform preamble settings, the data format, and the curve itself (as a single definite-length
+        binary block) are all sent in one write to the device.
+
+        :param ref:     The reference memory to write to, either a number from 1 through 4, or a name
+                        from ``"REF1"`` through ``"REF4"``.
+
+        :param data:    The data points of the curve. This can be any sequence of integers, or a `numpy`
+                        array, which is encoded without iterating over its points. It can also be a
+                        `~pytek.waveform.Waveform`, in which case its curve is uploaded and its preamble
+                        is used if `preamble` is not given. Floating point arrays are accepted only if
+                        every point is a whole number: points are never rounded or truncated, so round
+                        computed curves first.
+
+        :param dict preamble:   Optional, the waveform preamble for the curve, as from `get_waveform_preamble`.
+                        The time base (``x_incr``, ``xzero``, ``pt_offset``), the vertical scaling (``y_scale``,
+                        ``y_offset``, ``y_zero``), and the units (``x_units``, ``y_unit``) are sent to the
+                        device if present. Other fields are ignored, in particular the number of points is
+                        always the length of `data`.
+
+        :param bool double:     Optional, if `True`, data points are sent 16-bits per point, in the range 0
+                        through 65535, otherwise they are sent 8-bits per point, in the range 0 through 255.
+                        The default is the ``bytes_per_sample`` field of the preamble, or `True` if there is
+                        no preamble.
+
+        Example:
+
+        >>> wfm = tds.get_waveform_array("CH1")
+        >>> tds.put_waveform("REF1", wfm)
+        >>>
+
+        """
+        if preamble is None and hasattr(data, "curve") and hasattr(data, "preamble"):
+            preamble = data.preamble
+        if hasattr(data, "curve"):
+            data = data.curve
+        preamble = preamble or {}
+
+        ref = str(ref).upper()
+        if not ref.startswith("REF"):
+            ref = "REF" + ref
+        if ref not in ("REF1", "REF2", "REF3", "REF4"):
+            raise ValueError("Unknown reference memory: %r" % ref)
+
+        if double is None:
+            double = int(preamble.get("bytes_per_sample", 2)) == 2
+        width = 2 if double else 1
+        limit = (1 << (8 * width)) - 1
+
+        #Encode as big-endian unsigned integers: vectorized for numpy arrays, or through the array module.
+        if hasattr(data, "astype"):
+            if len(data) and (data.min() < 0 or data.max() > limit):
+                raise ValueError("Data points must be in the range 0 through %d." % limit)
+            if data.dtype.kind not in "iub" and (data != data.astype(">u2" if double else "u1")).any():
+                raise ValueError("Data points must be whole numbers, round them first.")
+            payload = data.astype(">u2" if double else "u1").tobytes()
+        else:
+            try:
+                encoded = array.array("H" if double else "B", data)
+            except OverflowError:
+                raise ValueError("Data points must be in the range 0 through %d." % limit)
+            except TypeError:
+                raise ValueError("Data points must be whole numbers, round them first.")
+            if double and encoded.itemsize != 2:
+                raise ValueError("Platform has no 2-byte unsigned integer array type.")
+            if double and sys.byteorder == "little":
+                encoded.byteswap()
+            payload = encoded.tobytes() if hasattr(encoded, "tobytes") else encoded.tostring()
+
+        count = len(payload) // width
+        settings = [
+            "DATA:DESTINATION %s" % ref,
+            ":DATA:ENCDG RPBINARY",
+            ":DATA:WIDTH %d" % width,
+            ":WFMPRE:BYT_NR %d" % width,
+            "BIT_NR %d" % (8 * width),
+            "BN_FMT RP",
+            "BYT_OR MSB",
+            "PT_FMT Y",
+            "NR_PT %d" % count,
+        ]
+        for field, header, convert in self.__WFM_PREAMBLE_HEADERS:
+            if field in preamble:
+                settings.append("%s %s" % (header, convert(preamble[field])))
+
+        length = str(len(payload))
+        settings.append(":CURVE #%d%s" % (len(length), length))
+        self.port.write(";".join(settings) + payload + "\r")
+
 
 
     ### HARDCOPY ###
 
-    def screenshot(self, ofile=None, fmt="RLE", inksaver=True, landscape=False):
+    def screenshot(self, ofile=None, fmt="RLE", inksaver=True, landscape=False, progress=None):
         """
         Grabs a hardcopy/screenshot from the device.
 
         If `ofile` is `None` (the default), simply returns the data as a string. Otherwise, it
-        writes the data to the given output stream.
+        writes the data to the given output stream as it arrives, so the image is never held in
+        memory, and returns `None`. See `pytek.hardcopy.read_hardcopy` for details.
 
         :param str fmt:     Optional, specify the format for the image. Valid values will vary
                             by device, but will be a subset of those listed below.
                             The default is "RLE" which gives a Windows Bitmap file.
+                            If "auto", uses the fastest supported format for the device according
+                            to `format_cache`, probing the device with `probe_img_formats` only
+                            if it isn't in the cache yet, and records the transfer time in the cache.
+                            Use `pytek.imaging` to convert the image to the format you need.
                             
         :param bool inksaver:   Optional, if `True` (the default), puts the device into hardcopy-inksaver
                                 mode, in which the background of the graticular is white, instead of black.
@@ -577,6 +1045,11 @@ class TDS3k(Configurable):
                                 which is probably what you want. If `True`, it will be in landscape mode,
                                 which generally means the image will be rotated 90 degrees.
 
+        :param progress:        Optional, a function which is called as the image is transferred, with the
+                                number of bytes received so far, the average transfer rate in bytes per second,
+                                and the estimated total size of the image in bytes (`None` if the format doesn't
+                                give it).
+
         **Possible supported formats**:
 
         The following is a list of the formats that may be supported, but individual devices will only
@@ -616,17 +1089,29 @@ class TDS3k(Configurable):
                                 
 
         """
+        timed = (fmt == "auto")
+        if timed:
+            cache = self.__format_cache()
+            identity = self.__identity()
+            if cache.supported(identity) is None:
+                self.probe_img_formats()
+            fmt = cache.fastest(identity)
+            if fmt is None:
+                raise ValueError("The device supports none of the known image formats.")
+        start = time.time()
+
         self.send_command("HARDCOPY:FORMAT", str(fmt))
         self.send_command("HARDCOPY:LAYOUT", "landscape" if landscape else "portrait")
         self.send_command("HARDCOPY:INKSAVER", "on" if inksaver else "off")
         self.send_command("HARDCOPY:PORT", "RS232")
         self.send_command("HARDCOPY", "START")
-        data = self.get_response()
+        buf = io.BytesIO() if ofile is None else ofile
+        size = read_hardcopy(self.port, buf, progress)
+        if timed:
+            cache.record(identity, fmt, size, time.time() - start)
         if ofile is not None:
-            ofile.write(data)
             return None
-        else:
-            return data
+        return buf.getvalue()
 
     def check_img_format(self, fmt):
         """
@@ -646,6 +1131,48 @@ class TDS3k(Configurable):
         self.send_command("HARDCOPY:FORMAT", orig_fmt)
         return supported
 
+    def probe_img_formats(self, formats=None, timed=False):
+        """
+        Checks which hardcopy formats the device supports with `check_img_format`, and records them
+        in `format_cache` under the device's `identify` string, so `screenshot` with ``fmt="auto"``
+        doesn't have to probe the device again. Returns the list of supported formats.
+
+        :param formats:     Optional, the formats to check. The default is all of the documented
+                            formats, `pytek.hardcopy.FORMATS`.
+
+        :param bool timed:  Optional, if `True`, also takes a screenshot in each supported image format
+                            (see `pytek.hardcopy.IMAGE_FORMATS`) and records its transfer time, so
+                            ``fmt="auto"`` can choose the format which is actually fastest. This can
+                            take many minutes. The default is `False`.
+
+        .. seealso::
+            `screenshot`
+        """
+        supported = [fmt for fmt in (FORMATS if formats is None else formats) if self.check_img_format(fmt)]
+        cache = self.__format_cache()
+        identity = self.__identity()
+        cache.set_supported(identity, supported)
+        if timed:
+            for fmt in IMAGE_FORMATS:
+                if fmt in supported:
+                    start = time.time()
+                    size = len(self.screenshot(fmt=fmt))
+                    cache.record(identity, fmt, size, time.time() - start)
+        return supported
+
+    def __format_cache(self):
+        if self.format_cache is None:
+            self.format_cache = FormatCache()
+        return self.format_cache
+
+    def __identity(self):
+        #The identity doesn't change while the device is connected, so it's only queried once.
+        try:
+            return self.__idn
+        except AttributeError:
+            self.__idn = self.identify()
+            return self.__idn
+
 
 
 
@@ -0,0 +1,412 @@
+"""
+Provides a compact file format for storing large numbers of waveform records, such as the
+logs of a multi-day acquisition, along with classes for writing and reading them.
+
+Curves transferred from the device (e.g., with `TDS3k.get_curve <pytek.TDS3k.get_curve>`)
+are highly redundant: neighbouring samples tend to differ by small amounts, so most of the
+high order bits of each sample carry no information. Each record is therefore *delta encoded*
+(each sample is replaced by its difference from the previous sample, modulo the sample width),
+the bytes of the deltas are *shuffled* so that all of the most significant bytes are grouped
+together, and the result is compressed with `zlib` (or `lzma` or `bz2`). This typically reduces
+16-bit curves to a small fraction of their raw size, and both directions run far faster than
+a serial link can deliver data.
+
+Records are written and read one at a time, so memory use is bounded by the size of a single
+record regardless of the size of the archive. An index of record offsets is written at the end
+of the file when the `ArchiveWriter` is closed, giving random access to records through the
+`ArchiveReader`. If the index is missing (for instance, the writing process was killed),
+the reader recovers by scanning the records sequentially.
+
+Example:
+
+>>> from pytek.archive import ArchiveWriter, ArchiveReader
+>>>
+>>> with ArchiveWriter(open("log.wfa", "wb")) as archive:
+...     for i in xrange(1000):
+...         archive.append(tds.get_waveform_array())
+...
+>>> reader = ArchiveReader(open("log.wfa", "rb"))
+>>> len(reader)
+1000
+>>> wfm = reader[512]
+>>> for wfm in reader:
+...     process(wfm)
+...
+>>>
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, see `pytek.waveform`.
+
+
+File Format
+---------------
+
+All integer fields are little-endian. The file starts with an eight byte magic string,
+``PYTEKWFA``, followed by a two byte format version number. Records follow immediately, each
+of which consists of:
+
+*   a fixed-size record header (see `ArchiveWriter.RECORD_HEADER`), giving the codec, the
+    sample width in bytes, the number of points, the length of the encoded preamble, the length of
+    the compressed payload, and a CRC-32 of the encoded sample bytes;
+*   the waveform preamble, encoded as a JSON object;
+*   the compressed, delta encoded and byte shuffled samples.
+
+When the archive is closed, the index is written: the four byte tag ``WIDX``, a record count,
+and an eight byte offset for each record. Finally, a fixed size trailer gives the offset of the
+index, followed by the four byte tag ``WEND``.
+
+"""
+
+import struct
+import json
+import zlib
+import bz2
+
+import numpy
+
+from .waveform import Waveform
+
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+
+MAGIC = b"PYTEKWFA"
+"""
+The magic string at the start of every archive file.
+"""
+
+VERSION = 1
+"""
+The version of the file format written by `ArchiveWriter`.
+"""
+
+CODECS = {
+    "none": 0,
+    "zlib": 1,
+    "lzma": 2,
+    "bz2": 3,
+}
+"""
+A dictionary mapping the names of supported compression codecs to the ids stored
+in record headers. The ``"lzma"`` codec is only usable if the `lzma` module (or
+`backports.lzma` on python 2) is available.
+"""
+
+_FILE_HEADER = struct.Struct("<8sH")
+_RECORD_HEADER = struct.Struct("<4sBBHIIII")
+_INDEX_HEADER = struct.Struct("<4sI")
+_TRAILER = struct.Struct("<Q4s")
+
+_RECORD_TAG = b"WREC"
+_INDEX_TAG = b"WIDX"
+_END_TAG = b"WEND"
+
+_DTYPES = {
+    1: numpy.dtype("u1"),
+    2: numpy.dtype("<u2"),
+}
+
+
+class ArchiveError(Exception):
+    """
+    Raised when an archive file is malformed or corrupt.
+    """
+    pass
+
+
+def _compressor(codec, level):
+    if codec == "none":
+        return lambda data: data
+    if codec == "zlib":
+        return lambda data: zlib.compress(data, 6 if level is None else level)
+    if codec == "bz2":
+        return lambda data: bz2.compress(data, 9 if level is None else level)
+    if codec == "lzma":
+        if lzma is None:
+            raise ValueError("The lzma codec is not available, the lzma module could not be imported.")
+        return lambda data: lzma.compress(data, preset=(6 if level is None else level))
+    raise ValueError("Unknown codec: %r" % codec)
+
+
+def _decompress(codec_id, data):
+    if codec_id == CODECS["none"]:
+        return data
+    if codec_id == CODECS["zlib"]:
+        return zlib.decompress(data)
+    if codec_id == CODECS["bz2"]:
+        return bz2.decompress(data)
+    if codec_id == CODECS["lzma"]:
+        if lzma is None:
+            raise ValueError("Record uses the lzma codec, but the lzma module could not be imported.")
+        return lzma.decompress(data)
+    raise ArchiveError("Unknown codec id in record: %r" % codec_id)
+
+
+def encode_samples(curve, width):
+    """
+    Delta encodes and byte shuffles the given raw curve, returning the result as a
+    byte string (not yet compressed). `width` is the number of bytes per sample, 1 or 2.
+
+    The deltas are taken modulo the sample width, so encoding is lossless for any
+    unsigned curve data that fits in `width` bytes.
+    """
+    samples = numpy.asarray(curve).astype(_DTYPES[width])
+    deltas = numpy.empty_like(samples)
+    deltas[:1] = samples[:1]
+    numpy.subtract(samples[1:], samples[:-1], out=deltas[1:])
+    if width == 1:
+        return deltas.tobytes()
+    #Shuffle: all most significant bytes, then all least significant bytes.
+    return deltas.view(numpy.uint8).reshape(-1, width)[:, ::-1].T.tobytes()
+
+
+def decode_samples(data, width, count):
+    """
+    The inverse of `encode_samples`, returns a `numpy.ndarray` of `count` samples.
+    """
+    raw = numpy.frombuffer(data, dtype=numpy.uint8)
+    if len(raw) != width * count:
+        raise ArchiveError("Expected %d bytes of sample data, found %d." % (width*count, len(raw)))
+    dtype = _DTYPES[width]
+    if width == 1:
+        deltas = raw
+    else:
+        deltas = raw.reshape(width, count)[::-1].T.copy().view(dtype).reshape(count)
+    return numpy.cumsum(deltas, dtype=dtype)
+
+
+class ArchiveWriter(object):
+    """
+    Writes waveform records to an archive file. Records are compressed and written
+    immediately as they are appended, only the record offsets are kept in memory so
+    that the index can be written when the archive is closed.
+
+    Objects of this class can be used as context managers, in which case the archive
+    is closed at the end of the ``with`` block.
+    """
+
+    RECORD_HEADER = _RECORD_HEADER
+    """
+    The `struct.Struct` describing the header written before each record: the tag ``WREC``,
+    the codec id (see `CODECS`), the sample width in bytes, reserved flags, the number of
+    points, the length of the JSON encoded preamble, the length of the compressed
+    payload, and the CRC-32 of the encoded (but uncompressed) samples.
+    """
+
+    def __init__(self, ofile, codec="zlib", level=None):
+        """
+        :param ofile:   The file-like object to which the archive is written. It must be
+            opened for writing in binary mode. It does not need to be seekable, so the archive can
+            be written to a pipe or socket.
+
+        :param str codec:   Optional, the name of the compression codec to use for records,
+            one of the keys of `CODECS`. The default is ``"zlib"``, which gives a good trade-off
+            of speed and compression. ``"lzma"`` compresses further but more slowly.
+
+        :param int level:   Optional, the compression level (or preset) passed to the codec.
+            If `None`, a reasonable default is used for the codec.
+        """
+        self.ofile = ofile
+        self.codec = codec
+        self.__compress = _compressor(codec, level)
+        self.__codec_id = CODECS[codec]
+        self.__position = 0
+        self.__offsets = []
+        self.closed = False
+        self.__write(_FILE_HEADER.pack(MAGIC, VERSION))
+
+    def __write(self, data):
+        self.ofile.write(data)
+        self.__position += len(data)
+
+    def __len__(self):
+        return len(self.__offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def append(self, curve, preamble=None, width=None):
+        """
+        Appends a record to the archive. Returns the index of the new record.
+
+        :param curve:   The raw curve data, as returned by `TDS3k.get_curve <pytek.TDS3k.get_curve>`.
+            This may also be a `~pytek.waveform.Waveform`, in which case its preamble is used
+            unless one is explicitly given.
+
+        :param dict preamble:   Optional, the waveform preamble to store with the record,
+            as returned by `TDS3k.get_waveform_preamble <pytek.TDS3k.get_waveform_preamble>`.
+
+        :param int width:   Optional, the number of bytes per sample, 1 or 2. By default, this is
+            taken from the ``bytes_per_sample`` field of the preamble if present, otherwise it
+            is determined from the range of the data.
+        """
+        if self.closed:
+            raise ValueError("Cannot append to a closed archive.")
+        if isinstance(curve, Waveform):
+            if preamble is None:
+                preamble = curve.preamble
+            curve = curve.curve
+        preamble = dict(preamble or {})
+        curve = numpy.asarray(curve)
+
+        if width is None:
+            width = int(preamble.get("bytes_per_sample", 0))
+            if width not in _DTYPES:
+                width = 2 if (len(curve) and curve.max() > 0xFF) else 1
+        if width not in _DTYPES:
+            raise ValueError("Unsupported sample width: %r" % width)
+
+        samples = encode_samples(curve, width)
+        payload = self.__compress(samples)
+        pre = json.dumps(preamble, sort_keys=True).encode("utf-8")
+
+        self.__offsets.append(self.__position)
+        self.__write(self.RECORD_HEADER.pack(
+            _RECORD_TAG, self.__codec_id, width, 0, len(curve), len(pre), len(payload),
+            zlib.crc32(samples) & 0xFFFFFFFF
+        ))
+        self.__write(pre)
+        self.__write(payload)
+        return len(self.__offsets) - 1
+
+    def close(self):
+        """
+        Writes the index and trailer to the archive, and flushes the file. Does not close
+        the underlying file. Has no effect if the archive is already closed.
+        """
+        if self.closed:
+            return
+        index_offset = self.__position
+        self.__write(_INDEX_HEADER.pack(_INDEX_TAG, len(self.__offsets)))
+        self.__write(struct.pack("<%dQ" % len(self.__offsets), *self.__offsets))
+        self.__write(_TRAILER.pack(index_offset, _END_TAG))
+        self.ofile.flush()
+        self.closed = True
+
+
+class ArchiveReader(object):
+    """
+    Reads waveform records from an archive file written by `ArchiveWriter`. Records are
+    returned as `~pytek.waveform.Waveform` objects.
+
+    Iterating over the reader streams records sequentially from the start of the archive,
+    reading one record at a time. Indexing the reader (``reader[i]``) seeks directly to the
+    requested record using the archive's index, which is loaded when first needed. If the archive
+    has no index (it was not closed properly), the index is rebuilt by scanning the record
+    headers, and any partial record at the end of the file is ignored.
+    """
+
+    def __init__(self, ifile):
+        """
+        :param ifile:   The file-like object from which to read. It must be opened for reading
+            in binary mode, and must be seekable for random access. The archive is expected to
+            start at the current position of the file.
+        """
+        self.ifile = ifile
+        self.__base = ifile.tell()
+        magic, version = _FILE_HEADER.unpack(self.__read(_FILE_HEADER.size))
+        if magic != MAGIC:
+            raise ArchiveError("Not a waveform archive (bad magic string).")
+        if version > VERSION:
+            raise ArchiveError("Unsupported archive version: %d" % version)
+        self.version = version
+        self.__offsets = None
+
+    def __read(self, size):
+        data = self.ifile.read(size)
+        if len(data) != size:
+            raise EOFError()
+        return data
+
+    def __read_record(self):
+        header = self.__read(_RECORD_HEADER.size)
+        tag, codec_id, width, flags, count, pre_len, payload_len, crc = _RECORD_HEADER.unpack(header)
+        if tag != _RECORD_TAG:
+            raise ArchiveError("Bad record tag: %r" % tag)
+        if width not in _DTYPES:
+            raise ArchiveError("Unsupported sample width in record: %r" % width)
+        preamble = json.loads(self.__read(pre_len).decode("utf-8"))
+        samples = _decompress(codec_id, self.__read(payload_len))
+        if zlib.crc32(samples) & 0xFFFFFFFF != crc:
+            raise ArchiveError("CRC mismatch in record data.")
+        return Waveform(decode_samples(samples, width, count), preamble)
+
+    def __load_index(self):
+        if self.__offsets is not None:
+            return self.__offsets
+
+        self.ifile.seek(0, 2)
+        end = self.ifile.tell()
+        if end - self.__base >= _FILE_HEADER.size + _INDEX_HEADER.size + _TRAILER.size:
+            self.ifile.seek(end - _TRAILER.size)
+            index_offset, tag = _TRAILER.unpack(self.ifile.read(_TRAILER.size))
+            if tag == _END_TAG:
+                self.ifile.seek(self.__base + index_offset)
+                tag, count = _INDEX_HEADER.unpack(self.__read(_INDEX_HEADER.size))
+                if tag != _INDEX_TAG:
+                    raise ArchiveError("Bad index tag: %r" % tag)
+                self.__offsets = struct.unpack("<%dQ" % count, self.__read(8 * count))
+                return self.__offsets
+
+        self.__offsets = self.__scan()
+        return self.__offsets
+
+    def __scan(self):
+        self.ifile.seek(0, 2)
+        end = self.ifile.tell() - self.__base
+        offsets = []
+        position = _FILE_HEADER.size
+        while position + _RECORD_HEADER.size <= end:
+            self.ifile.seek(self.__base + position)
+            fields = _RECORD_HEADER.unpack(self.__read(_RECORD_HEADER.size))
+            if fields[0] != _RECORD_TAG:
+                break
+            size = _RECORD_HEADER.size + fields[5] + fields[6]
+            if position + size > end:
+                #Truncated record at the end of an unclosed archive.
+                break
+            offsets.append(position)
+            position += size
+        return tuple(offsets)
+
+    def __len__(self):
+        return len(self.__load_index())
+
+    def __getitem__(self, idx):
+        """
+        Returns the record at the given index, as a `~pytek.waveform.Waveform`. Negative indices
+        count from the end of the archive.
+        """
+        offsets = self.__load_index()
+        self.ifile.seek(self.__base + offsets[idx])
+        return self.__read_record()
+
+    def __iter__(self):
+        """
+        Iterates over all records in the archive, in order, reading them sequentially. The
+        file position is shared with other uses of the reader, so don't interleave iteration
+        with random access.
+        """
+        self.ifile.seek(self.__base + _FILE_HEADER.size)
+        while True:
+            position = self.ifile.tell()
+            tag = self.ifile.read(len(_RECORD_TAG))
+            if tag != _RECORD_TAG:
+                return
+            self.ifile.seek(position)
+            try:
+                wfm = self.__read_record()
+            except EOFError:
+                #Truncated record at the end of an unclosed archive.
+                return
+            yield wfm
+
@@ -0,0 +1,197 @@
+"""
+Provides a service for watching a device's screen unattended: hardcopies are taken periodically
+with `TDS3k.screenshot <pytek.TDS3k.screenshot>`, and only the ones which differ from the one
+before are kept, in a bounded ring of files on disk.
+
+Each hardcopy is hashed, either as it is, or for just a region of the decoded image (see
+`pytek.imaging`), to ignore parts of the screen which change without anything interesting
+happening. The capture interval adapts to how often the screen changes: it's halved when a
+change is seen, and grows again while the screen stays the same, so a quiet device isn't
+kept busy transferring identical images.
+
+Example:
+
+>>> from pytek.capture import CaptureService
+>>>
+>>> service = CaptureService(tds, "captures", interval=30.0, ring_size=500)
+>>> service.run(count=100)
+>>> service.frames()[-2:]
+['captures/frame-000041.bmp', 'captures/frame-000042.bmp']
+>>>
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, see `pytek.waveform`.
+
+"""
+
+from collections import namedtuple
+import hashlib
+import os
+import re
+import time
+
+from .imaging import decode_image
+
+
+Frame = namedtuple("Frame", "time path digest")
+"""
+A frame kept by a `CaptureService`, a `namedtuple` with the following fields:
+
+*   **time** - the time the capture started, from the service's clock (`None` for a frame found
+    on disk when the service was created).
+*   **path** - the path of the file the hardcopy was written to.
+*   **digest** - the hex digest of the hash of the hardcopy (or the hashed region of it).
+"""
+
+EXTENSIONS = {"rle": "bmp", "bmp": "bmp", "bmpcolor": "bmp", "tiff": "tif", "png": "png", "pcx": "pcx", "pcxcolor": "pcx"}
+"""
+File extensions for hardcopy formats, by lower case format name. Other formats are saved with
+the extension ``img``.
+"""
+
+_FRAME_NAME = re.compile(r"^frame-(\d+)\.\w+$")
+
+
+class CaptureService(object):
+    """
+    Periodically captures hardcopies from a device, keeping the distinct ones in a ring of files
+    named ``frame-NNNNNN.ext`` in a directory. When the ring is full, the oldest frame is deleted.
+    Frames already in the directory are kept as part of the ring, numbering continues after them,
+    and the newest of them is compared with the first capture.
+    """
+
+    def __init__(self, tds, directory, interval=10.0, min_interval=None, max_interval=None,
+            ring_size=100, fmt="RLE", region=None, sleep=time.sleep, clock=time.time, **screenshot_args):
+        """
+        :param tds:     The `~pytek.TDS3k` to capture from.
+
+        :param str directory:   The directory to keep frames in, which is created if it doesn't exist.
+
+        :param float interval:  Optional, the initial time in seconds from the start of one capture to
+            the start of the next. The default is 10 seconds.
+
+        :param float min_interval:  Optional, the shortest the interval becomes while the screen keeps
+            changing. The default is `interval`, so the interval only grows from its initial value.
+
+        :param float max_interval:  Optional, the longest the interval becomes while the screen stays
+            the same. The default is ten times `interval`.
+
+        :param int ring_size:   Optional, the most frames to keep on disk, at least 1. The default is 100.
+
+        :param str fmt:     Optional, the hardcopy format, see `TDS3k.screenshot <pytek.TDS3k.screenshot>`.
+            The default is "RLE".
+
+        :param region:  Optional, a tuple ``(top, bottom, left, right)`` of pixel bounds, as for slicing
+            the array from `~pytek.imaging.decode_image`. If given, each hardcopy is decoded and only
+            this region is hashed, so changes outside of it are ignored. Note that the whole hardcopy is
+            decoded for every capture, not just the region, which costs far more than hashing the data.
+            By default, the hardcopy data is hashed as it is, without decoding.
+
+        :param sleep:   Optional, the function used to wait between captures. The default is `time.sleep`.
+
+        :param clock:   Optional, the function used to tell the time. The default is `time.time`.
+
+        Any other keyword arguments are passed on to `TDS3k.screenshot <pytek.TDS3k.screenshot>`.
+        """
+        if ring_size < 1:
+            raise ValueError("The ring must hold at least one frame: %r" % ring_size)
+        self.tds = tds
+        self.directory = directory
+        self.interval = interval
+        self.min_interval = interval if min_interval is None else min_interval
+        self.max_interval = 10 * interval if max_interval is None else max_interval
+        self.ring_size = ring_size
+        self.fmt = fmt
+        self.region = region
+        self.sleep = sleep
+        self.clock = clock
+        self.screenshot_args = screenshot_args
+        self.last = None
+        self.captures = 0
+        self.__running = False
+
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.__next = 0
+        existing = self.frames()
+        if existing:
+            #Continue from the newest frame, so an unchanged screen isn't kept again.
+            self.__next = int(_FRAME_NAME.match(os.path.basename(existing[-1])).group(1)) + 1
+            with open(existing[-1], "rb") as ifile:
+                self.last = Frame(None, existing[-1], self.digest(ifile.read()))
+
+    def frames(self):
+        """
+        Returns the paths of the frames in the ring, from the oldest to the newest.
+        """
+        names = [n for n in os.listdir(self.directory) if _FRAME_NAME.match(n)]
+        names.sort(key=lambda n: int(_FRAME_NAME.match(n).group(1)))
+        return [os.path.join(self.directory, n) for n in names]
+
+    def digest(self, data):
+        """
+        Returns the hex digest of the hash of a hardcopy, or of the configured `region` of it (which
+        requires decoding the whole hardcopy).
+        """
+        if self.region is not None:
+            top, bottom, left, right = self.region
+            data = decode_image(data)[top:bottom, left:right].tobytes()
+        return hashlib.sha1(data).hexdigest()
+
+    def capture(self):
+        """
+        Takes a single hardcopy, and keeps it if it differs from the last one kept. Adjusts
+        `interval` according to whether or not the screen changed.
+
+        Returns the new `Frame` if the hardcopy was kept, otherwise `None`.
+        """
+        start = self.clock()
+        data = self.tds.screenshot(fmt=self.fmt, **self.screenshot_args)
+        self.captures += 1
+        digest = self.digest(data)
+        if self.last is not None and digest == self.last.digest:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+            return None
+
+        self.interval = max(self.min_interval, self.interval / 2.0)
+        path = os.path.join(self.directory, "frame-%06d.%s" % (self.__next, EXTENSIONS.get(self.fmt.lower(), "img")))
+        self.__next += 1
+        with open(path, "wb") as ofile:
+            ofile.write(data)
+        for old in self.frames()[:-self.ring_size]:
+            os.remove(old)
+        self.last = Frame(start, path, digest)
+        return self.last
+
+    def run(self, count=None, duration=None):
+        """
+        Captures hardcopies until `stop` is called, waiting `interval` seconds from the start of
+        each capture to the start of the next (or no time, if the capture took longer).
+
+        :param int count:   Optional, the most captures to take. By default, there's no limit.
+
+        :param float duration:  Optional, the most seconds to run for. By default, there's no limit.
+        """
+        self.__running = True
+        started = self.clock()
+        taken = 0
+        while self.__running:
+            start = self.clock()
+            self.capture()
+            taken += 1
+            if count is not None and taken >= count:
+                break
+            wait = start + self.interval - self.clock()
+            if duration is not None and self.clock() + max(wait, 0) - started >= duration:
+                break
+            if wait > 0:
+                self.sleep(wait)
+        self.__running = False
+
+    def stop(self):
+        """
+        Stops `run` after the current capture, for instance from another thread or from a
+        progress callback.
+        """
+        self.__running = False
@@ -0,0 +1,297 @@
+"""
+Provides lazy channel math: expressions over waveform records, such as ``CH1 - CH2``, or
+``CH1 * CH3`` for instantaneous power, which are only computed when their result is needed.
+
+Wrapping records with `channel` gives `Expression` objects, which can be combined with the
+usual arithmetic operators, with each other and with numbers, and integrated or differentiated
+over time. Building an expression doesn't compute anything: it builds an expression graph,
+checking along the way that all of the records in it have the same time base (the same number
+of points, ``x_incr`` and ``xzero``).
+
+When the result is requested, with `Expression.evaluate` or `Expression.measure`, the whole graph
+is evaluated in place, into one output array and a few scratch arrays which are reused from node
+to node. Raw curves are scaled straight into these arrays, so no intermediate record is ever
+allocated, no matter how large the expression.
+
+Example:
+
+>>> from pytek.chmath import channel
+>>>
+>>> v = channel(tds.get_waveform_array("CH1"))
+>>> i = channel(tds.get_waveform_array("CH2")) / 0.1
+>>> energy = (v * i).integrate()
+>>> energy.evaluate()
+<Waveform of 10000 points, no preamble>
+>>> (v - 1.65).measure()["rms"]
+0.83
+>>>
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, see `pytek.waveform`.
+
+"""
+
+import numpy
+
+from .measure import measure
+from .waveform import Waveform
+
+
+def channel(wfm, preamble=None):
+    """
+    Returns an `Expression` for a record.
+
+    :param wfm:     The record, either a `~pytek.waveform.Waveform`, or a raw curve as from
+        `TDS3k.get_curve <pytek.TDS3k.get_curve>`, in which case `preamble` is required.
+
+    :param dict preamble:   The waveform preamble used to scale a raw curve.
+    """
+    if not isinstance(wfm, Waveform):
+        wfm = Waveform(wfm, preamble)
+    return _Channel(wfm)
+
+
+def _wrap(value):
+    if isinstance(value, Expression):
+        return value
+    if isinstance(value, Waveform):
+        return _Channel(value)
+    return _Constant(float(value))
+
+
+def _timebase(*operands):
+    """
+    Returns the common time base of the given expressions, ignoring constants, or raises a
+    `ValueError` if they differ.
+    """
+    timebase = None
+    for expr in operands:
+        if expr.timebase is None:
+            continue
+        if timebase is None:
+            timebase = expr.timebase
+        elif expr.timebase != timebase:
+            raise ValueError("Cannot combine records with different time bases: %r and %r" % (timebase, expr.timebase))
+    return timebase
+
+
+class _Scratch(object):
+    """
+    A pool of scratch arrays of one length, reused while evaluating an expression.
+    """
+
+    def __init__(self, length):
+        self.length = length
+        self.free = []
+
+    def take(self):
+        return self.free.pop() if self.free else numpy.empty(self.length)
+
+    def give(self, buf):
+        self.free.append(buf)
+
+
+class Expression(object):
+    """
+    The base class of channel math expressions. These are created with `channel` and combined
+    with operators, and are not meant to be created directly.
+
+    .. attribute:: timebase
+
+        The time base of the expression's records, as a tuple ``(length, x_incr, xzero)``, or
+        `None` for an expression of constants only.
+    """
+
+    timebase = None
+
+    def __add__(self, other):
+        return _Binary(numpy.add, self, _wrap(other))
+
+    def __radd__(self, other):
+        return _Binary(numpy.add, _wrap(other), self)
+
+    def __sub__(self, other):
+        return _Binary(numpy.subtract, self, _wrap(other))
+
+    def __rsub__(self, other):
+        return _Binary(numpy.subtract, _wrap(other), self)
+
+    def __mul__(self, other):
+        return _Binary(numpy.multiply, self, _wrap(other))
+
+    def __rmul__(self, other):
+        return _Binary(numpy.multiply, _wrap(other), self)
+
+    def __truediv__(self, other):
+        return _Binary(numpy.true_divide, self, _wrap(other))
+
+    def __rtruediv__(self, other):
+        return _Binary(numpy.true_divide, _wrap(other), self)
+
+    __div__ = __truediv__
+    __rdiv__ = __rtruediv__
+
+    def __pow__(self, exponent):
+        return _Binary(numpy.power, self, _Constant(float(exponent)))
+
+    def __neg__(self):
+        return _Unary(numpy.negative, self)
+
+    def __abs__(self):
+        return _Unary(numpy.absolute, self)
+
+    def integrate(self):
+        """
+        Returns an expression for the running integral of this expression over time, by the
+        trapezoidal rule, starting from 0 at the first point.
+        """
+        return _Integral(self)
+
+    def derivative(self):
+        """
+        Returns an expression for the derivative of this expression with respect to time, by
+        central differences (one-sided differences at the first and last points).
+        """
+        return _Derivative(self)
+
+    @property
+    def preamble(self):
+        """
+        A waveform preamble describing the time base of the expression, with no vertical scaling.
+        """
+        if self.timebase is None:
+            return {}
+        length, x_incr, xzero = self.timebase
+        return {"number_of_points": length, "x_incr": x_incr, "xzero": xzero}
+
+    def evaluate(self, out=None):
+        """
+        Evaluates the expression, and returns the result as a `~pytek.waveform.Waveform` whose curve is
+        the result in Y units (i.e., with no vertical scaling).
+
+        :param out:     Optional, a floating point `numpy.ndarray` of the right length to write the result
+            into, to avoid allocating a new one for each evaluation.
+        """
+        if self.timebase is None:
+            raise ValueError("Cannot evaluate an expression without any records.")
+        length = self.timebase[0]
+        if out is None:
+            out = numpy.empty(length)
+        elif out.shape != (length,):
+            raise ValueError("Output array must have shape (%d,)." % length)
+        self._eval(out, _Scratch(length))
+        return Waveform(out, self.preamble)
+
+    def measure(self, **kwargs):
+        """
+        Evaluates the expression, and returns the measurements of the result as from
+        `pytek.measure.measure`, to which all keyword arguments are passed.
+        """
+        return measure(self.evaluate(), **kwargs)
+
+    def _eval(self, out, scratch):
+        """
+        Writes the value of the expression into `out`, using `scratch` for any temporary arrays.
+        """
+        raise NotImplementedError()
+
+
+class _Channel(Expression):
+
+    def __init__(self, wfm):
+        self.wfm = wfm
+        self.timebase = (len(wfm), wfm.x_incr, wfm.xzero)
+
+    def _eval(self, out, scratch):
+        wfm = self.wfm
+        numpy.subtract(wfm.curve, wfm.y_offset, out=out)
+        out *= wfm.y_scale
+        out += wfm.y_zero
+
+
+class _Constant(Expression):
+
+    def __init__(self, value):
+        self.value = value
+
+    def _eval(self, out, scratch):
+        out.fill(self.value)
+
+
+class _Unary(Expression):
+
+    def __init__(self, func, operand):
+        self.func = func
+        self.operand = operand
+        self.timebase = operand.timebase
+
+    def _eval(self, out, scratch):
+        self.operand._eval(out, scratch)
+        self.func(out, out=out)
+
+
+class _Binary(Expression):
+
+    def __init__(self, func, left, right):
+        self.func = func
+        self.left = left
+        self.right = right
+        self.timebase = _timebase(left, right)
+
+    def _eval(self, out, scratch):
+        left, right = self.left, self.right
+        if isinstance(right, _Constant):
+            left._eval(out, scratch)
+            self.func(out, right.value, out=out)
+        elif isinstance(left, _Constant):
+            right._eval(out, scratch)
+            self.func(left.value, out, out=out)
+        else:
+            left._eval(out, scratch)
+            tmp = scratch.take()
+            right._eval(tmp, scratch)
+            self.func(out, tmp, out=out)
+            scratch.give(tmp)
+
+
+class _Integral(Expression):
+
+    def __init__(self, operand):
+        if operand.timebase is None:
+            raise ValueError("Cannot integrate an expression without any records.")
+        self.operand = operand
+        self.timebase = operand.timebase
+
+    def _eval(self, out, scratch):
+        self.operand._eval(out, scratch)
+        dt = self.timebase[1]
+        tmp = scratch.take()
+        numpy.add(out[1:], out[:-1], out=tmp[1:])
+        tmp[1:] *= 0.5 * dt
+        out[0] = 0.0
+        numpy.cumsum(tmp[1:], out=out[1:])
+        scratch.give(tmp)
+
+
+class _Derivative(Expression):
+
+    def __init__(self, operand):
+        if operand.timebase is None:
+            raise ValueError("Cannot differentiate an expression without any records.")
+        if operand.timebase[0] < 2:
+            raise ValueError("Cannot differentiate a record of less than two points.")
+        self.operand = operand
+        self.timebase = operand.timebase
+
+    def _eval(self, out, scratch):
+        self.operand._eval(out, scratch)
+        dt = self.timebase[1]
+        tmp = scratch.take()
+        numpy.subtract(out[2:], out[:-2], out=tmp[1:-1])
+        tmp[1:-1] *= 0.5 / dt
+        tmp[0] = (out[1] - out[0]) / dt
+        tmp[-1] = (out[-1] - out[-2]) / dt
+        out[...] = tmp
+        scratch.give(tmp)
+
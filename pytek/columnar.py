@@ -0,0 +1,210 @@
+"""
+Provides exporters for waveform records into columnar formats: `Apache Arrow <https://arrow.apache.org/>`_
+record batches and tables, and `Parquet <https://parquet.apache.org/>`_ files.
+
+Each waveform record becomes one row. The raw curve data goes in a ``samples`` column whose
+values are fixed-size lists of the raw codes (as from `TDS3k.get_curve <pytek.TDS3k.get_curve>`),
+and each field of the waveform preamble (see `TDS3k.WFM_PREAMBLE_FIELDS <pytek.TDS3k.WFM_PREAMBLE_FIELDS>`)
+goes in a typed column of its own: ``x_incr``, ``y_scale``, etc. are ``float64`` columns,
+``number_of_points`` and similar are ``int64`` columns, and ``waveform_id``, ``y_unit``, etc. are
+``string`` columns. Preamble fields which are missing from a record are null.
+
+The samples of all records in a batch are gathered into a single contiguous array, which Arrow
+then uses in place, so sample data is copied at most once. Exporting a single record whose curve
+is already a contiguous array of the right type doesn't copy the samples at all.
+
+Example:
+
+>>> from pytek.columnar import to_record_batch, write_parquet
+>>>
+>>> records = [tds.get_waveform_array() for i in xrange(100)]
+>>> batch = to_record_batch(records)
+>>> batch.num_rows
+100
+>>> write_parquet(records, "records.parquet")
+>>>
+
+.. note:: **Requires pyarrow**
+
+    This module relies on `pyarrow <https://arrow.apache.org/docs/python/>`_ and `numpy <http://www.numpy.org/>`_,
+    which are not required by the rest of |PYTEK|. You can install them with the ``arrow`` extra.
+
+"""
+
+import numpy
+import pyarrow
+import pyarrow.parquet
+
+from . import TDS3k
+from .waveform import Waveform
+
+
+SAMPLES_COLUMN = "samples"
+"""
+The name of the column which holds the raw curve data for each record.
+"""
+
+_ARROW_TYPES = {
+    int: pyarrow.int64(),
+    float: pyarrow.float64(),
+    str: pyarrow.string(),
+}
+
+PREAMBLE_SCHEMA = pyarrow.schema([
+    pyarrow.field(name, _ARROW_TYPES[conv]) for name, conv in TDS3k.WFM_PREAMBLE_FIELDS
+])
+"""
+The Arrow `~pyarrow.Schema` of the preamble columns, derived from
+`TDS3k.WFM_PREAMBLE_FIELDS <pytek.TDS3k.WFM_PREAMBLE_FIELDS>`.
+"""
+
+
+def _as_waveforms(records):
+    if isinstance(records, Waveform):
+        return [records]
+    waveforms = []
+    for rec in records:
+        if not isinstance(rec, Waveform):
+            rec = Waveform(*rec)
+        waveforms.append(rec)
+    return waveforms
+
+
+def _samples_array(waveforms):
+    """
+    Gathers the curves of all the given waveforms into a single contiguous numpy array
+    (copying at most once), and returns it along with the number of points per record.
+    """
+    if not waveforms:
+        raise ValueError("Expected at least one waveform record.")
+    counts = set(len(wfm) for wfm in waveforms)
+    if len(counts) != 1:
+        raise ValueError("All records in a batch must have the same number of points, found: %s" % sorted(counts))
+    dtype = numpy.result_type(*[wfm.curve.dtype for wfm in waveforms])
+    if len(waveforms) == 1:
+        values = numpy.ascontiguousarray(waveforms[0].curve, dtype=dtype)
+    else:
+        values = numpy.concatenate([wfm.curve for wfm in waveforms]).astype(dtype, copy=False)
+    return values, counts.pop()
+
+
+def _preamble_arrays(waveforms):
+    converters = dict(TDS3k.WFM_PREAMBLE_FIELDS)
+    arrays = []
+    for field in PREAMBLE_SCHEMA:
+        conv = converters[field.name]
+        column = []
+        for wfm in waveforms:
+            val = wfm.preamble.get(field.name)
+            column.append(None if val is None else conv(val))
+        arrays.append(pyarrow.array(column, type=field.type))
+    return arrays
+
+
+def to_record_batch(records):
+    """
+    Converts one or many waveform records into a `pyarrow.RecordBatch`, with one row per record.
+
+    :param records:     A single `~pytek.waveform.Waveform`, or a sequence of records, each of which is
+        either a `~pytek.waveform.Waveform` or a ``(curve, preamble)`` pair as from
+        `TDS3k.get_curve <pytek.TDS3k.get_curve>` and `TDS3k.get_waveform_preamble <pytek.TDS3k.get_waveform_preamble>`.
+        All records must have the same number of points.
+
+    The first column is the `SAMPLES_COLUMN`, a fixed-size list column of the raw codes, followed by
+    one column for each field of the waveform preamble, as described by `PREAMBLE_SCHEMA`.
+    """
+    waveforms = _as_waveforms(records)
+    values, count = _samples_array(waveforms)
+    samples = pyarrow.FixedSizeListArray.from_arrays(pyarrow.array(values), count)
+    arrays = [samples] + _preamble_arrays(waveforms)
+    names = [SAMPLES_COLUMN] + PREAMBLE_SCHEMA.names
+    return pyarrow.RecordBatch.from_arrays(arrays, names)
+
+
+def to_table(records):
+    """
+    Like `to_record_batch`, but returns a `pyarrow.Table`.
+    """
+    return pyarrow.Table.from_batches([to_record_batch(records)])
+
+
+def _parquet_table(batch):
+    #Parquet has no fixed-size list type, so the samples are stored as a variable sized
+    # list column. The offsets are computed, but the sample values are not copied.
+    samples = batch.column(0)
+    count = samples.type.list_size
+    offsets = pyarrow.array(numpy.arange(0, (len(samples) + 1) * count, count, dtype=numpy.int32))
+    lists = pyarrow.ListArray.from_arrays(offsets, samples.flatten())
+    return pyarrow.Table.from_arrays([lists] + batch.columns[1:], batch.schema.names)
+
+
+def write_parquet(records, where, **kwargs):
+    """
+    Writes one or many waveform records to a Parquet file, with the same columns as
+    `to_record_batch`. The samples column is stored as a list column, since Parquet
+    has no fixed-size list type.
+
+    :param records:     The records to write, see `to_record_batch`.
+    :param where:       The path or file-like object to write to.
+
+    Any additional keyword arguments are passed to `pyarrow.parquet.write_table`.
+
+    .. seealso::
+        `ParquetExporter` for writing many batches of records to one file.
+    """
+    pyarrow.parquet.write_table(_parquet_table(to_record_batch(records)), where, **kwargs)
+
+
+class ParquetExporter(object):
+    """
+    Writes batches of waveform records to a single Parquet file, one row group per batch,
+    so an arbitrarily long acquisition can be exported without holding it all in memory.
+
+    Objects of this class can be used as context managers, in which case the file is closed
+    at the end of the ``with`` block.
+
+    Example:
+
+    >>> with ParquetExporter("records.parquet") as exporter:
+    ...     for i in xrange(100):
+    ...         exporter.write([tds.get_waveform_array() for j in xrange(10)])
+    ...
+    >>>
+
+    """
+
+    def __init__(self, where, **kwargs):
+        """
+        :param where:   The path or file-like object to write to.
+
+        Any additional keyword arguments are passed to `pyarrow.parquet.ParquetWriter`.
+        """
+        self.where = where
+        self.kwargs = kwargs
+        self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, records):
+        """
+        Writes one batch of records to the file. See `to_record_batch` for the accepted
+        values of `records`. All batches written to the file must have the same number of
+        points per record.
+        """
+        table = _parquet_table(to_record_batch(records))
+        if self.writer is None:
+            self.writer = pyarrow.parquet.ParquetWriter(self.where, table.schema, **self.kwargs)
+        self.writer.write_table(table)
+
+    def close(self):
+        """
+        Closes the file. Has no effect if nothing was written.
+        """
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
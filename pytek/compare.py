@@ -0,0 +1,215 @@
+"""
+Provides comparison of captured waveform records against a stored *golden* reference record,
+for regression testing.
+
+Before comparing, each capture is aligned with the reference to remove trigger jitter: the
+capture is cross-correlated with the reference over a small range of shifts, the best shift is
+refined to a fraction of a sample by fitting a parabola through the correlation peak, and the
+capture is resampled at that shift by linear interpolation. The aligned capture is then checked
+against a tolerance band around the reference, made of an absolute part and a part relative to
+the reference value at each point.
+
+The result of each comparison is a compact `DiffReport`. Comparisons are vectorized over the
+points of a record and over batches of records, so comparing a 10,000 point record takes a
+fraction of a millisecond, and a whole archive of captures can be checked in bulk with
+`Comparator.compare_many`.
+
+Example:
+
+>>> from pytek.archive import ArchiveReader
+>>> from pytek.compare import Comparator
+>>>
+>>> golden = ArchiveReader(open("golden.wfa", "rb"))[0]
+>>> comparator = Comparator(golden, abs_tol=0.05, rel_tol=0.02, max_shift=20)
+>>> report = comparator.compare(tds.get_waveform_array())
+>>> report.passed, report.shift, report.max_error
+(True, 3.2e-07, 0.031)
+>>>
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, see `pytek.waveform`.
+
+"""
+
+from collections import namedtuple
+
+import numpy
+
+from .waveform import Waveform
+
+
+DiffReport = namedtuple("DiffReport", "passed shift max_error rms_error violations first_violation")
+"""
+The result of comparing a capture against a reference with a `Comparator`, a `namedtuple` with
+the following fields:
+
+*   **passed** - `True` if every compared point of the aligned capture is within the tolerance band.
+*   **shift** - the shift that was applied to align the capture with the reference, in X units
+    (e.g., seconds). Positive if the capture was late relative to the reference.
+*   **max_error** - the largest absolute difference between the aligned capture and the reference,
+    in Y units.
+*   **rms_error** - the RMS difference between the aligned capture and the reference, in Y units.
+*   **violations** - the number of points outside the tolerance band.
+*   **first_violation** - the index (in the reference) of the first point outside the tolerance band,
+    or `None`.
+"""
+
+
+class Comparator(object):
+    """
+    Compares captured records against a golden reference record. Everything that depends only
+    on the reference (its scaled values, the tolerance band, and the part of the record which
+    is compared) is computed once, when the comparator is created.
+
+    Since the capture is shifted to align it, the first and last ``max_shift + 1`` points of the
+    reference are not compared.
+    """
+
+    def __init__(self, golden, abs_tol=0.0, rel_tol=0.0, max_shift=16, preamble=None):
+        """
+        :param golden:  The reference record, either a `~pytek.waveform.Waveform`, or a raw curve as from
+            `TDS3k.get_curve <pytek.TDS3k.get_curve>`, in which case `preamble` is required.
+
+        :param float abs_tol:   Optional, the absolute tolerance, in Y units. The default is 0.
+
+        :param float rel_tol:   Optional, the tolerance relative to the absolute value of the reference at
+            each point, e.g., 0.02 for 2%. This is added to `abs_tol`. The default is 0.
+
+        :param int max_shift:   Optional, the largest shift (in samples, in either direction) considered
+            when aligning captures. The default is 16. If 0, captures are not aligned.
+
+        :param dict preamble:   The waveform preamble used to scale a raw reference curve.
+        """
+        if not isinstance(golden, Waveform):
+            golden = Waveform(golden, preamble)
+        self.golden = golden
+        self.max_shift = int(max_shift)
+        length = len(golden)
+        if length <= 2 * self.max_shift + 3:
+            raise ValueError("Reference record is too short for a maximum shift of %d samples." % self.max_shift)
+
+        s = self.max_shift
+        #The window of reference points which is compared, leaving room for the shift and interpolation.
+        self.__start = s + 1 if s else 0
+        self.__stop = length - s - 1 if s else length
+        ref = golden.y
+        self.__ref = ref[self.__start:self.__stop]
+        self.__tolerance = abs_tol + rel_tol * numpy.abs(self.__ref)
+        self.__centered = ref - ref.mean()
+
+    def __scaled(self, records, preamble):
+        if preamble is not None:
+            scale = Waveform((), preamble)
+            curves = numpy.array(records, ndmin=2, copy=False)
+            self.__check(scale, curves.shape[1])
+            return scale.to_y(curves)
+        rows = []
+        for wfm in records:
+            self.__check(wfm, len(wfm))
+            rows.append(wfm.y)
+        return numpy.array(rows, ndmin=2)
+
+    def __check(self, wfm, length):
+        if length != len(self.golden):
+            raise ValueError("Expected records of %d points, received %d." % (len(self.golden), length))
+        if wfm.x_incr != self.golden.x_incr:
+            raise ValueError("Record has a different sample interval than the reference (%r != %r)." % (
+                wfm.x_incr, self.golden.x_incr))
+
+    def __align(self, y):
+        """
+        Returns the fractional shift (in samples) of each row of `y` which best aligns it with the
+        reference.
+        """
+        s = self.max_shift
+        rows, length = y.shape
+        if s == 0:
+            return numpy.zeros(rows)
+
+        centered = y - y.mean(axis=1, keepdims=True)
+        ref = self.__centered[s:length - s]
+        corr = numpy.empty((rows, 2 * s + 1))
+        for k in xrange(2 * s + 1):
+            corr[:, k] = centered[:, k:k + length - 2*s].dot(ref)
+
+        best = numpy.argmax(corr, axis=1)
+        inner = numpy.clip(best, 1, 2 * s - 1)
+        r = numpy.arange(rows)
+        c0, c1, c2 = corr[r, inner - 1], corr[r, inner], corr[r, inner + 1]
+        denom = c0 - 2*c1 + c2
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            frac = numpy.where(denom < 0, 0.5 * (c0 - c2) / denom, 0.0)
+        frac = numpy.where(best == inner, numpy.clip(frac, -0.5, 0.5), 0.0)
+        return best - s + frac
+
+    def compare_batch(self, records, preamble=None):
+        """
+        Compares a batch of captures against the reference, and returns a list of `DiffReport`
+        objects, one per capture.
+
+        :param records:     Either a 2-D array of raw curves (one record per row) which all share
+            the given `preamble`, or a sequence of `~pytek.waveform.Waveform` objects.
+
+        :param dict preamble:   The waveform preamble used to scale raw curves.
+        """
+        y = self.__scaled(records, preamble)
+        rows = len(y)
+        shift = self.__align(y)
+
+        #Resample each capture at the shifted positions of the compared window, and take the
+        # difference from the reference.
+        width = len(self.__ref)
+        diff = numpy.empty((rows, width))
+        for i in xrange(rows):
+            whole = int(numpy.floor(shift[i]))
+            frac = shift[i] - whole
+            start = self.__start + whole
+            aligned = y[i, start:start + width]
+            if frac:
+                aligned = aligned + (y[i, start + 1:start + width + 1] - aligned) * frac
+            numpy.subtract(aligned, self.__ref, out=diff[i])
+        numpy.abs(diff, out=diff)
+
+        bad = diff > self.__tolerance
+        counts = numpy.count_nonzero(bad, axis=1)
+        first = numpy.argmax(bad, axis=1) + self.__start
+        max_error = diff.max(axis=1)
+        rms_error = numpy.sqrt(numpy.mean(diff * diff, axis=1))
+        dt = self.golden.x_incr
+
+        return [
+            DiffReport(counts[i] == 0, float(shift[i] * dt), float(max_error[i]), float(rms_error[i]),
+                int(counts[i]), int(first[i]) if counts[i] else None)
+            for i in xrange(rows)
+        ]
+
+    def compare(self, wfm, preamble=None):
+        """
+        Compares a single capture against the reference, and returns a `DiffReport`.
+
+        :param wfm:     The capture, either a `~pytek.waveform.Waveform`, or a raw curve, in which
+            case `preamble` is required.
+        """
+        if not isinstance(wfm, Waveform):
+            wfm = Waveform(wfm, preamble)
+        return self.compare_batch([wfm])[0]
+
+    def compare_many(self, records, batch=32):
+        """
+        Compares any number of captures against the reference, for instance all of the records of an
+        `~pytek.archive.ArchiveReader`. This is a generator which yields a `DiffReport` for each record,
+        in order. Records are consumed and compared in batches of `batch` records at a time, so memory
+        use is bounded regardless of the number of records.
+        """
+        pending = []
+        for wfm in records:
+            pending.append(wfm)
+            if len(pending) >= batch:
+                for report in self.compare_batch(pending):
+                    yield report
+                pending = []
+        if pending:
+            for report in self.compare_batch(pending):
+                yield report
+
@@ -0,0 +1,256 @@
+"""
+Provides decimation of waveform records for display: reducing a record to about as many points
+as there are pixels to draw it in.
+
+Two methods are provided:
+
+*   `envelope` reduces a record to the minimum and maximum of each of `n` equal buckets. Drawn as
+    a filled band (or a vertical line per pixel column), this looks exactly like the full record
+    at that width, and never hides a glitch, which is how the device itself displays long records.
+*   `lttb` selects `n` of the record's points with the *largest triangle three buckets* algorithm,
+    which keeps the visual shape of the record when drawn as a simple line.
+
+For stored records which are displayed over and over at different zoom levels, a `Pyramid`
+precomputes min/max envelopes of the record at successively coarser resolutions, so an envelope
+of any span of the record can be produced from the nearest level instead of the raw samples.
+A `PyramidCache` keeps the pyramids of recently displayed records.
+
+Example:
+
+>>> from pytek.decimate import envelope, PyramidCache
+>>> from pytek.archive import ArchiveReader
+>>>
+>>> env = envelope(tds.get_waveform_array(), 800)
+>>> len(env.x), env.lower[:3], env.upper[:3]
+(800, array([-0.16, -0.12, -0.04]), array([-0.08, 0.0, 0.04]))
+>>>
+>>> cache = PyramidCache(ArchiveReader(open("capture.wfa", "rb")).__getitem__)
+>>> env = cache.envelope(12, 800, start=0.0, stop=1e-3)
+>>>
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, see `pytek.waveform`.
+
+"""
+
+from collections import namedtuple, OrderedDict
+
+import numpy
+
+from .waveform import Waveform
+
+
+Envelope = namedtuple("Envelope", "x lower upper")
+"""
+A min/max envelope of a record, as returned by `envelope`, a `namedtuple` with the following fields,
+each a `numpy.ndarray` with one value per bucket:
+
+*   **x** - the X value (e.g., time) of the center of the bucket.
+*   **lower** - the minimum Y value in the bucket.
+*   **upper** - the maximum Y value in the bucket.
+"""
+
+
+def _as_waveform(wfm, preamble):
+    """
+    Returns the record as a `~pytek.waveform.Waveform`, raising a `ValueError` if it's empty.
+    """
+    wfm = wfm if isinstance(wfm, Waveform) else Waveform(wfm, preamble)
+    if len(wfm) == 0:
+        raise ValueError("Cannot reduce an empty record.")
+    return wfm
+
+
+def _bounds(length, n):
+    """
+    Returns the start index of each of `n` (or fewer, for short records) nearly equal buckets
+    spanning `length` points.
+    """
+    n = max(1, min(n, length))
+    return (numpy.arange(n) * length) // n
+
+
+def envelope(wfm, n, preamble=None):
+    """
+    Reduces a record to a min/max `Envelope` of `n` buckets. If the record has `n` points or
+    fewer, each bucket is a single point.
+
+    :param wfm:     The record, either a `~pytek.waveform.Waveform`, or a raw curve as from
+        `TDS3k.get_curve <pytek.TDS3k.get_curve>`, in which case `preamble` is required.
+
+    :param int n:   The number of buckets, typically the width in pixels of the plot.
+
+    :param dict preamble:   The waveform preamble used to scale a raw curve.
+    """
+    wfm = _as_waveform(wfm, preamble)
+    length = len(wfm)
+    starts = _bounds(length, n)
+    #Min and max of the raw codes, scaled afterwards: far fewer values to scale.
+    lo = numpy.minimum.reduceat(wfm.curve, starts)
+    hi = numpy.maximum.reduceat(wfm.curve, starts)
+    lower, upper = wfm.to_y(lo), wfm.to_y(hi)
+    if wfm.y_scale < 0:
+        lower, upper = upper, lower
+    centers = 0.5 * (starts + numpy.append(starts[1:], length) - 1)
+    return Envelope(wfm.xzero + centers * wfm.x_incr, lower, upper)
+
+
+def lttb(wfm, n, preamble=None):
+    """
+    Selects `n` points of a record with the *largest triangle three buckets* algorithm, and returns
+    them as a tuple ``(x, y)`` of arrays. The first and last points of the record are always
+    selected. If the record has `n` points or fewer, all of its points are returned.
+
+    :param wfm:     The record, either a `~pytek.waveform.Waveform`, or a raw curve as from
+        `TDS3k.get_curve <pytek.TDS3k.get_curve>`, in which case `preamble` is required.
+
+    :param int n:   The number of points to select, at least 3.
+
+    :param dict preamble:   The waveform preamble used to scale a raw curve.
+    """
+    wfm = _as_waveform(wfm, preamble)
+    y = wfm.y
+    length = len(y)
+    if length <= n:
+        return wfm.x, y.copy()
+    if n < 3:
+        raise ValueError("LTTB needs at least 3 points.")
+
+    #Interior points are split into n-2 buckets. The average of every bucket is computed up front,
+    # so each step only has to find the largest triangle within its bucket.
+    starts = 1 + _bounds(length - 2, n - 2)
+    stops = numpy.append(starts[1:], length - 1)
+    t = numpy.arange(length, dtype=numpy.float64)
+    avg_y = numpy.add.reduceat(y[1:-1], starts - 1) / (stops - starts)
+    avg_t = 0.5 * (starts + stops - 1)
+    avg_y = numpy.append(avg_y, y[-1])
+    avg_t = numpy.append(avg_t, length - 1)
+
+    selected = numpy.empty(n, dtype=numpy.intp)
+    selected[0] = 0
+    selected[-1] = length - 1
+    a = 0
+    for b in xrange(n - 2):
+        lo, hi = starts[b], stops[b]
+        ct, cy = avg_t[b + 1], avg_y[b + 1]
+        #Twice the area of the triangle from the previous point, to each candidate, to the next bucket's average.
+        area = numpy.abs((t[a] - ct) * (y[lo:hi] - y[a]) - (t[a] - t[lo:hi]) * (cy - y[a]))
+        a = lo + int(numpy.argmax(area))
+        selected[b + 1] = a
+
+    return wfm.xzero + selected * wfm.x_incr, y[selected]
+
+
+class Pyramid(object):
+    """
+    Min/max envelopes of a record at successively coarser resolutions: level 0 is the record
+    itself, and each level reduces the one before it by `factor`. The pyramid takes about
+    ``2 / (factor - 1)`` times the memory of the record.
+    """
+
+    def __init__(self, wfm, preamble=None, factor=4):
+        """
+        :param wfm:     The record, either a `~pytek.waveform.Waveform`, or a raw curve as from
+            `TDS3k.get_curve <pytek.TDS3k.get_curve>`, in which case `preamble` is required.
+
+        :param dict preamble:   The waveform preamble used to scale a raw curve.
+
+        :param int factor:  Optional, the reduction from each level to the next. The default is 4.
+        """
+        wfm = _as_waveform(wfm, preamble)
+        self.wfm = wfm
+        self.factor = factor
+        self.levels = [(wfm.curve, wfm.curve)]
+        lo = hi = wfm.curve
+        while len(lo) > factor:
+            starts = numpy.arange(0, len(lo), factor)
+            lo = numpy.minimum.reduceat(lo, starts)
+            hi = numpy.maximum.reduceat(hi, starts)
+            self.levels.append((lo, hi))
+
+    def __len__(self):
+        return len(self.wfm)
+
+    def envelope(self, n, start=None, stop=None):
+        """
+        Returns the min/max `Envelope` of `n` buckets over the span of the record from X value
+        `start` to `stop` (by default, the whole record). The envelope is computed from the coarsest
+        level which still has at least `n` buckets in the span, so its cost depends on `n`, not on
+        the length of the record. Bucket boundaries are rounded to the resolution of that level.
+        """
+        wfm = self.wfm
+        length = len(wfm)
+        first = 0 if start is None else int(numpy.clip(numpy.floor((start - wfm.xzero) / wfm.x_incr), 0, length - 1))
+        last = length if stop is None else int(numpy.clip(numpy.ceil((stop - wfm.xzero) / wfm.x_incr) + 1, first + 1, length))
+        span = last - first
+
+        level = 0
+        while level + 1 < len(self.levels) and span // (self.factor ** (level + 1)) >= n:
+            level += 1
+        size = self.factor ** level
+        lo, hi = self.levels[level]
+        i0 = first // size
+        i1 = max(i0 + 1, -(-last // size))
+
+        starts = i0 + _bounds(i1 - i0, n)
+        lower = wfm.to_y(numpy.minimum.reduceat(lo[:i1], starts))
+        upper = wfm.to_y(numpy.maximum.reduceat(hi[:i1], starts))
+        if wfm.y_scale < 0:
+            lower, upper = upper, lower
+        ends = numpy.append(starts[1:], i1)
+        centers = 0.5 * (starts * size + numpy.minimum(ends * size, length) - 1)
+        return Envelope(wfm.xzero + centers * wfm.x_incr, lower, upper)
+
+
+class PyramidCache(object):
+    """
+    Keeps the `Pyramid` objects of the most recently used records, building them on demand.
+    """
+
+    def __init__(self, loader, maxsize=64, factor=4):
+        """
+        :param loader:  A callable which takes a key and returns the record for it, as a
+            `~pytek.waveform.Waveform`. For instance, the ``__getitem__`` method of an
+            `~pytek.archive.ArchiveReader`, to use record indices as keys.
+
+        :param int maxsize: Optional, the most pyramids to keep. The default is 64.
+
+        :param int factor:  Optional, the reduction between levels of the pyramids, see `Pyramid`.
+        """
+        self.loader = loader
+        self.maxsize = maxsize
+        self.factor = factor
+        self.__pyramids = OrderedDict()
+
+    def __len__(self):
+        return len(self.__pyramids)
+
+    def __contains__(self, key):
+        return key in self.__pyramids
+
+    def pyramid(self, key):
+        """
+        Returns the `Pyramid` for the given key, loading the record and building it if it's not
+        in the cache.
+        """
+        pyramid = self.__pyramids.pop(key, None)
+        if pyramid is None:
+            pyramid = Pyramid(self.loader(key), factor=self.factor)
+            while len(self.__pyramids) >= self.maxsize:
+                self.__pyramids.popitem(last=False)
+        self.__pyramids[key] = pyramid
+        return pyramid
+
+    def envelope(self, key, n, start=None, stop=None):
+        """
+        Returns the envelope of the record for the given key, see `Pyramid.envelope`.
+        """
+        return self.pyramid(key).envelope(n, start, stop)
+
+    def clear(self):
+        """
+        Removes all pyramids from the cache.
+        """
+        self.__pyramids.clear()
+
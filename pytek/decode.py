@@ -0,0 +1,399 @@
+"""
+Provides host-side decoding of serial protocols (UART, SPI and I2C) from captured channels,
+for devices without a serial bus triggering and analysis module.
+
+Each channel is converted to logic levels with `pytek.edges.digitize` (with optional
+hysteresis), and the clock edges, start bits, or bus conditions of interest are found in a
+vectorized pass over the whole record, so only the decoded bits themselves are handled one by one.
+
+Decoders are objects which keep the state of the bus between calls: when consecutive records
+are decoded with the same decoder, they are treated as one continuous capture, so a frame, word
+or transaction which spans the boundary between two records is decoded when the second record is
+processed. This is intended for records which really are contiguous, such as the windows of one
+long record fetched with `TDS3k.iter_curve <pytek.TDS3k.iter_curve>`; between unrelated
+acquisitions, call `reset` on the decoder.
+
+Each decoded frame, word or transaction is timestamped with the time (X value) at which it
+started, on the time axis of the record in which it started.
+
+Example:
+
+>>> from pytek.decode import UartDecoder
+>>>
+>>> uart = UartDecoder(baud=115200, level=1.65)
+>>> frames = uart.decode(tds.get_waveform_array("CH1"))
+>>> "".join(chr(f.value) for f in frames)
+'Hello, world!\\r\\n'
+>>>
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, see `pytek.waveform`.
+
+"""
+
+from collections import namedtuple
+
+import numpy
+
+from .edges import digitize
+from .waveform import Waveform
+
+
+UartFrame = namedtuple("UartFrame", "time value error")
+"""
+A frame decoded by `UartDecoder`, a `namedtuple` with the following fields:
+
+*   **time** - the time of the start bit's leading edge.
+*   **value** - the data bits, as an integer.
+*   **error** - `None` for a good frame, ``"parity"`` if the parity bit was wrong, or ``"framing"``
+    if a stop bit was not at the idle level.
+"""
+
+SpiWord = namedtuple("SpiWord", "time mosi miso")
+"""
+A word decoded by `SpiDecoder`, a `namedtuple` with the following fields:
+
+*   **time** - the time of the clock edge on which the first bit was sampled.
+*   **mosi** - the word on the MOSI (master out, slave in) line, as an integer.
+*   **miso** - the word on the MISO line, or `None` if the MISO channel was not given.
+"""
+
+I2cTransaction = namedtuple("I2cTransaction", "time address read data acks")
+"""
+A transaction decoded by `I2cDecoder`, from a START (or repeated START) condition to the following STOP
+or repeated START, as a `namedtuple` with the following fields:
+
+*   **time** - the time of the START condition.
+*   **address** - the 7-bit address of the target.
+*   **read** - `True` for a read transaction, `False` for a write.
+*   **data** - a tuple of the data bytes transferred after the address, as integers.
+*   **acks** - a tuple of booleans, one for the address byte and one for each data byte, `True` where the
+    byte was acknowledged.
+"""
+
+
+class Decoder(object):
+    """
+    The base class of the protocol decoders. Channels passed to a decoder are converted to
+    logic levels with the decoder's threshold `level` and `hysteresis`, which are in Y units.
+    """
+
+    def __init__(self, level, hysteresis=0.0):
+        self.level = level
+        self.hysteresis = hysteresis
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the state of the bus, so the next record is decoded as the start of a new capture.
+        """
+        self._last = None
+
+    def _digitize(self, channels, preamble):
+        """
+        Returns the time axis, the logic levels of each of the given channels, and the sample interval. The
+        last samples of the previous record (as stored in ``_last``, a tuple of ``(times, levels...)``) are
+        prepended to the time axis and levels. All channels must have the same time base.
+        """
+        waveforms = [wfm if isinstance(wfm, Waveform) else Waveform(wfm, preamble) for wfm in channels]
+        first = waveforms[0]
+        for wfm in waveforms[1:]:
+            if len(wfm) != len(first) or wfm.x_incr != first.x_incr or wfm.xzero != first.xzero:
+                raise ValueError("All channels must have the same number of points and time base.")
+
+        times = first.x
+        levels = [digitize(wfm, self.level, self.hysteresis) for wfm in waveforms]
+        if self._last is not None:
+            times = numpy.concatenate((self._last[0], times))
+            levels = [numpy.concatenate((prev, cur)) for prev, cur in zip(self._last[1:], levels)]
+        return times, levels, first.x_incr
+
+    def _keep(self, start, times, levels):
+        """
+        Stores the samples from index `start` onward, to be prepended to the next record.
+        """
+        self._last = (times[start:],) + tuple(lvl[start:] for lvl in levels)
+
+
+def _pack(bits, msb_first):
+    """
+    Packs a 2-D array of bits (one word per row) into an array of integers.
+    """
+    width = bits.shape[1]
+    shifts = numpy.arange(width)[::-1] if msb_first else numpy.arange(width)
+    return (bits.astype(numpy.int64) << shifts).sum(axis=1)
+
+
+class UartDecoder(Decoder):
+    """
+    Decodes asynchronous serial (UART, RS-232 at logic levels) frames from one channel.
+    """
+
+    def __init__(self, baud, level, hysteresis=0.0, data_bits=8, parity=None, stop_bits=1, idle_high=True):
+        """
+        :param float baud:  The bit rate, in bits per second (assuming the X units of the records are seconds).
+
+        :param float level: The logic threshold, in Y units.
+
+        :param float hysteresis:    Optional, the width of the hysteresis band around `level`. The default is 0.
+
+        :param int data_bits:   Optional, the number of data bits per frame, sent least significant bit first.
+            The default is 8.
+
+        :param str parity:  Optional, ``"even"``, ``"odd"``, or `None` (the default) for no parity bit.
+
+        :param int stop_bits:   Optional, the number of stop bits. The default is 1.
+
+        :param bool idle_high:  Optional, `True` (the default) if the line idles at the high level, as with TTL
+            level UARTs. Use `False` for an inverted line, such as RS-232 probed directly.
+        """
+        if parity not in (None, "even", "odd"):
+            raise ValueError("Unknown parity: %r" % parity)
+        self.baud = baud
+        self.data_bits = data_bits
+        self.parity = parity
+        self.stop_bits = stop_bits
+        self.idle_high = idle_high
+        Decoder.__init__(self, level, hysteresis)
+
+    def decode(self, wfm, preamble=None):
+        """
+        Decodes the frames in a record, and returns a list of `UartFrame` objects. A frame which
+        is cut off at the end of the record is decoded with the next record.
+
+        :param wfm:     The channel, either a `~pytek.waveform.Waveform`, or a raw curve as from
+            `TDS3k.get_curve <pytek.TDS3k.get_curve>`, in which case `preamble` is required.
+
+        :param dict preamble:   The waveform preamble used to scale a raw curve.
+        """
+        times, (line,), x_incr = self._digitize([wfm], preamble)
+        if not self.idle_high:
+            line = ~line
+        bit = 1.0 / (self.baud * x_incr)
+        parity_bits = 0 if self.parity is None else 1
+        frame_bits = 1 + self.data_bits + parity_bits + self.stop_bits
+
+        #Sample offsets from the start edge to the middle of each bit of a frame.
+        centers = ((numpy.arange(frame_bits) + 0.5) * bit).astype(numpy.intp)
+        starts = numpy.flatnonzero(line[:-1] & ~line[1:]) + 1
+
+        frames = []
+        keep = len(line) - 1
+        i = 0
+        while i < len(starts):
+            start = starts[i]
+            if start + centers[-1] >= len(line):
+                keep = start - 1
+                break
+            bits = line[start + centers]
+            if bits[0]:
+                #A glitch rather than a start bit.
+                i += 1
+                continue
+            data = bits[1:1 + self.data_bits]
+            value = int(_pack(data[None, :], False)[0])
+            error = None
+            if self.parity is not None:
+                ones = numpy.count_nonzero(data) + int(bits[1 + self.data_bits])
+                if ones % 2 != (0 if self.parity == "even" else 1):
+                    error = "parity"
+            if not bits[-self.stop_bits:].all():
+                error = "framing"
+            frames.append(UartFrame(float(times[start]), value, error))
+            #The next start bit can't begin before the middle of the last stop bit.
+            i = numpy.searchsorted(starts, start + centers[-1])
+
+        if not self.idle_high:
+            line = ~line
+        self._keep(keep, times, (line,))
+        return frames
+
+
+class SpiDecoder(Decoder):
+    """
+    Decodes SPI words from a clock channel, one or two data channels, and an optional chip select.
+    """
+
+    def __init__(self, level, hysteresis=0.0, bits=8, cpol=0, cpha=0, msb_first=True, cs_active_low=True):
+        """
+        :param float level: The logic threshold, in Y units.
+
+        :param float hysteresis:    Optional, the width of the hysteresis band around `level`. The default is 0.
+
+        :param int bits:    Optional, the number of bits per word. The default is 8.
+
+        :param int cpol:    Optional, the clock polarity: 0 (the default) if the clock idles low, 1 if it
+            idles high.
+
+        :param int cpha:    Optional, the clock phase: 0 (the default) if data is sampled on the leading
+            edge of each clock pulse, 1 if on the trailing edge.
+
+        :param bool msb_first:  Optional, `True` (the default) if words are sent most significant bit first.
+
+        :param bool cs_active_low:  Optional, `True` (the default) if the chip select is active low.
+        """
+        self.bits = bits
+        self.cpol = cpol
+        self.cpha = cpha
+        self.msb_first = msb_first
+        self.cs_active_low = cs_active_low
+        Decoder.__init__(self, level, hysteresis)
+
+    def reset(self):
+        Decoder.reset(self)
+        self.__pending = None
+
+    def decode(self, clk, mosi, miso=None, cs=None, preamble=None):
+        """
+        Decodes the words in a record, and returns a list of `SpiWord` objects. While the chip select
+        is inactive, clock edges are ignored, and a partial word is discarded when the chip select
+        goes inactive. Without a chip select channel, words are counted from the first clock edge
+        decoded since the decoder was created or `reset`. A partial word at the end of the record
+        is completed with the next record.
+
+        :param clk:     The clock channel, a `~pytek.waveform.Waveform`, or a raw curve, in which case
+            `preamble` is required (as for all of the channels).
+
+        :param mosi:    The MOSI channel.
+
+        :param miso:    Optional, the MISO channel.
+
+        :param cs:      Optional, the chip select channel.
+
+        :param dict preamble:   The waveform preamble used to scale raw curves.
+        """
+        channels = [clk, mosi] + [c for c in (miso, cs) if c is not None]
+        times, levels, x_incr = self._digitize(channels, preamble)
+        line_clk, line_mosi = levels[:2]
+        line_miso = levels[2] if miso is not None else None
+        line_cs = levels[-1] if cs is not None else None
+        self._keep(len(times) - 1, times, levels)
+
+        #Data is sampled on the rising edges if the clock idles low and samples on the leading edge, or
+        # idles high and samples on the trailing edge.
+        if self.cpol == self.cpha:
+            edges = numpy.flatnonzero(~line_clk[:-1] & line_clk[1:]) + 1
+        else:
+            edges = numpy.flatnonzero(line_clk[:-1] & ~line_clk[1:]) + 1
+
+        #Number the chip select assertions, so bits can be grouped into transfers.
+        if line_cs is not None:
+            active = ~line_cs if self.cs_active_low else line_cs
+            transfer = numpy.zeros(len(active), dtype=numpy.intp)
+            numpy.cumsum(active[1:] & ~active[:-1], out=transfer[1:])
+            edges = edges[active[edges]]
+            transfer = transfer[edges]
+            still_active = bool(active[-1])
+        else:
+            transfer = numpy.zeros(len(edges), dtype=numpy.intp)
+            still_active = True
+
+        edge_times = times[edges]
+        mosi_bits = line_mosi[edges]
+        miso_bits = line_miso[edges] if line_miso is not None else None
+
+        #Bits left over from the previous record continue the first transfer, unless the chip
+        # select was asserted again in between.
+        if self.__pending is not None and (len(transfer) == 0 or transfer[0] == 0):
+            p_times, p_mosi, p_miso = self.__pending
+            edge_times = numpy.concatenate((p_times, edge_times))
+            mosi_bits = numpy.concatenate((p_mosi, mosi_bits))
+            if miso_bits is not None and p_miso is not None:
+                miso_bits = numpy.concatenate((p_miso, miso_bits))
+            transfer = numpy.concatenate((numpy.zeros(len(p_times), dtype=numpy.intp), transfer))
+        self.__pending = None
+
+        words = []
+        bounds = numpy.flatnonzero(numpy.diff(transfer)) + 1
+        groups = numpy.split(numpy.arange(len(transfer)), bounds)
+        for n, group in enumerate(groups):
+            full = len(group) - len(group) % self.bits
+            if full:
+                idx = group[:full]
+                mosi_words = _pack(mosi_bits[idx].reshape(-1, self.bits), self.msb_first)
+                miso_words = None
+                if miso_bits is not None:
+                    miso_words = _pack(miso_bits[idx].reshape(-1, self.bits), self.msb_first)
+                for w, first in enumerate(idx[::self.bits]):
+                    words.append(SpiWord(float(edge_times[first]), int(mosi_words[w]),
+                        None if miso_words is None else int(miso_words[w])))
+            if n == len(groups) - 1 and full < len(group) and still_active:
+                rest = group[full:]
+                self.__pending = (edge_times[rest], mosi_bits[rest], None if miso_bits is None else miso_bits[rest])
+        return words
+
+
+class I2cDecoder(Decoder):
+    """
+    Decodes I2C transactions from the SCL and SDA channels, with 7-bit addressing.
+    """
+
+    def reset(self):
+        Decoder.reset(self)
+        self.__transaction = None
+        self.__bits = []
+
+    def decode(self, scl, sda, preamble=None):
+        """
+        Decodes the transactions in a record, and returns a list of `I2cTransaction` objects, one for
+        each transaction which ended (with a STOP or repeated START condition) in the record. A
+        transaction which is still in progress at the end of the record is completed with the next
+        record.
+
+        :param scl:     The clock channel, a `~pytek.waveform.Waveform`, or a raw curve, in which case
+            `preamble` is required.
+
+        :param sda:     The data channel.
+
+        :param dict preamble:   The waveform preamble used to scale raw curves.
+        """
+        times, (line_scl, line_sda), x_incr = self._digitize([scl, sda], preamble)
+        self._keep(len(times) - 1, times, (line_scl, line_sda))
+
+        #Bus conditions: START and STOP are SDA edges while SCL is high, and bits are sampled on
+        # rising edges of SCL.
+        scl_high = line_scl[1:] & line_scl[:-1]
+        starts = numpy.flatnonzero(scl_high & line_sda[:-1] & ~line_sda[1:]) + 1
+        stops = numpy.flatnonzero(scl_high & ~line_sda[:-1] & line_sda[1:]) + 1
+        clocks = numpy.flatnonzero(~line_scl[:-1] & line_scl[1:]) + 1
+
+        kinds = numpy.concatenate((numpy.zeros(len(starts)), numpy.ones(len(stops)), numpy.full(len(clocks), 2)))
+        where = numpy.concatenate((starts, stops, clocks))
+        order = numpy.lexsort((kinds, where))
+
+        transactions = []
+        for k, i in zip(kinds[order], where[order]):
+            if k == 0:
+                self.__finish(transactions)
+                self.__transaction = [float(times[i]), None, False, [], []]
+                self.__bits = []
+            elif k == 1:
+                self.__finish(transactions)
+            elif self.__transaction is not None:
+                self.__bits.append(bool(line_sda[i]))
+                if len(self.__bits) == 9:
+                    self.__byte()
+        return transactions
+
+    def __byte(self):
+        """
+        Handles a complete byte and its acknowledge bit.
+        """
+        value = int(_pack(numpy.array(self.__bits[:8])[None, :], True)[0])
+        trans = self.__transaction
+        if trans[1] is None:
+            trans[1] = value >> 1
+            trans[2] = bool(value & 1)
+        else:
+            trans[3].append(value)
+        trans[4].append(not self.__bits[8])
+        self.__bits = []
+
+    def __finish(self, transactions):
+        trans = self.__transaction
+        if trans is not None and trans[1] is not None:
+            transactions.append(I2cTransaction(trans[0], trans[1], trans[2], tuple(trans[3]), tuple(trans[4])))
+        self.__transaction = None
+        self.__bits = []
+
@@ -0,0 +1,313 @@
+"""
+Provides extraction of edges (threshold crossings) from waveform records, and period and
+time interval error (TIE) jitter statistics built on them.
+
+`find_edges` finds every crossing of a threshold in a record in a few vectorized passes, and
+interpolates each one linearly between samples to get sub-sample timestamps, on the time axis
+given by the record's ``xzero`` and ``x_incr``. An optional hysteresis band works like a Schmitt
+trigger: the signal must go all the way through the band for an edge to be counted, so noise on
+a slow edge doesn't produce a burst of false edges.
+
+`JitterStats` accumulates jitter statistics from the edges of any number of acquisitions, in
+constant memory, so jitter can be measured over millions of cycles without keeping the edges
+of every acquisition around.
+
+Example:
+
+>>> from pytek.edges import find_edges, JitterStats
+>>>
+>>> edges = find_edges(tds.get_waveform_array(), level=1.65, hysteresis=0.2)
+>>> edges.times[edges.rising][:3]
+array([  1.2502e-06,   2.2498e-06,   3.2501e-06])
+>>> jitter = JitterStats()
+>>> for i in xrange(1000):
+...     jitter.add(tds.get_waveform_array(), level=1.65, hysteresis=0.2)
+...
+>>> jitter.period.mean, jitter.period.std(), jitter.tie.pk2pk
+(1e-06, 2.1e-10, 1.5e-09)
+>>>
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, see `pytek.waveform`.
+
+"""
+
+from collections import namedtuple
+
+import numpy
+
+from .waveform import Waveform
+
+
+Edges = namedtuple("Edges", "times rising")
+"""
+The edges found in a record by `find_edges`, a `namedtuple` with the following fields:
+
+*   **times** - a `numpy.ndarray` of the time (X value) of each edge, in increasing order.
+*   **rising** - a boolean `numpy.ndarray`, `True` for each rising edge and `False` for each falling
+    edge. With hysteresis, edges always alternate between rising and falling.
+"""
+
+
+def _schmitt(y, level, half):
+    """
+    Returns a boolean array of the logic state of `y` at each sample, as a Schmitt trigger with
+    the given threshold and half-width of the hysteresis band: `True` above the band, `False` below
+    it, and the previous state inside it. Until the signal first leaves the band, the state is that
+    of the first sample relative to `level`.
+    """
+    state = numpy.full(len(y), -1, dtype=numpy.int8)
+    state[y >= level + half] = 1
+    state[y < level - half] = 0
+    if len(y) and state[0] < 0:
+        state[0] = y[0] >= level
+    held = numpy.where(state >= 0, numpy.arange(len(y)), 0)
+    numpy.maximum.accumulate(held, out=held)
+    return state[held] == 1
+
+
+def digitize(wfm, level, hysteresis=0.0, preamble=None):
+    """
+    Converts a record into logic levels, returning a boolean `numpy.ndarray` which is `True` for
+    each sample at the high level. This is the basis of `find_edges`, and of the protocol decoders
+    in `pytek.decode`.
+
+    :param wfm:     The record, either a `~pytek.waveform.Waveform`, or a raw curve as from
+        `TDS3k.get_curve <pytek.TDS3k.get_curve>`, in which case `preamble` is required.
+
+    :param float level: The threshold, in Y units.
+
+    :param float hysteresis:    Optional, the width of the hysteresis band, in Y units, centered on
+        `level`, see `find_edges`. The default is 0.
+
+    :param dict preamble:   The waveform preamble used to scale a raw curve.
+    """
+    if not isinstance(wfm, Waveform):
+        wfm = Waveform(wfm, preamble)
+    half = 0.5 * abs(hysteresis)
+    return _schmitt(wfm.y, level, half) if half else (wfm.y >= level)
+
+
+def find_edges(wfm, level=None, hysteresis=0.0, preamble=None):
+    """
+    Finds all of the edges in a record, and returns them as `Edges`.
+
+    :param wfm:     The record, either a `~pytek.waveform.Waveform`, or a raw curve as from
+        `TDS3k.get_curve <pytek.TDS3k.get_curve>`, in which case `preamble` is required.
+
+    :param float level: Optional, the threshold, in Y units. The default is halfway between the
+        minimum and maximum values of the record.
+
+    :param float hysteresis:    Optional, the width of the hysteresis band, in Y units, centered on
+        `level`. An edge is only counted when the signal goes from one side of the band to the other,
+        and it is timestamped at the crossing of `level` itself. The default is 0, meaning every
+        crossing of `level` is an edge.
+
+    :param dict preamble:   The waveform preamble used to scale a raw curve.
+    """
+    if not isinstance(wfm, Waveform):
+        wfm = Waveform(wfm, preamble)
+    y = wfm.y
+    if level is None:
+        level = 0.5 * (y.min() + y.max())
+    half = 0.5 * abs(hysteresis)
+
+    above = (y >= level)
+    logic = _schmitt(y, level, half) if half else above
+    change = numpy.flatnonzero(logic[1:] != logic[:-1]) + 1
+    rising = logic[change]
+
+    if half:
+        #The state is only known once the signal first leaves the band, so changes up to then
+        # aren't edges.
+        outside = numpy.flatnonzero((y >= level + half) | (y < level - half))
+        change = change[change > outside[0]] if len(outside) else change[:0]
+        rising = logic[change]
+
+        #Each edge is timestamped at the last crossing of the level before the signal left the band.
+        crossed = numpy.zeros(len(y), dtype=bool)
+        numpy.not_equal(above[1:], above[:-1], out=crossed[1:])
+        last = numpy.where(crossed, numpy.arange(len(y)), 0)
+        numpy.maximum.accumulate(last, out=last)
+        idx = last[change]
+    else:
+        idx = change
+
+    y0 = y[idx - 1]
+    frac = (level - y0) / (y[idx] - y0)
+    times = wfm.xzero + ((idx - 1) + frac) * wfm.x_incr
+    return Edges(times, rising)
+
+
+class Statistic(object):
+    """
+    Accumulates the count, mean, variance, minimum and maximum of a stream of values, in
+    constant memory. Values are added in arrays, and each array is merged into the running
+    statistics with the parallel form of Welford's algorithm.
+
+    .. attribute:: count
+
+        The number of values accumulated.
+
+    .. attribute:: mean
+
+        The mean of the values, or ``nan`` if there are none.
+
+    .. attribute:: min
+
+        The smallest value, or ``nan`` if there are none.
+
+    .. attribute:: max
+
+        The largest value, or ``nan`` if there are none.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = numpy.nan
+        self.min = numpy.nan
+        self.max = numpy.nan
+        self.__m2 = 0.0
+
+    def __repr__(self):
+        return "<Statistic count=%d mean=%r std=%r>" % (self.count, self.mean, self.std())
+
+    def add(self, values):
+        """
+        Adds an array (or sequence) of values.
+        """
+        values = numpy.asarray(values, dtype=numpy.float64).ravel()
+        if not len(values):
+            return
+        other = Statistic()
+        other.count = len(values)
+        other.mean = float(values.mean())
+        other.__m2 = float(numpy.sum((values - other.mean) ** 2))
+        other.min = float(values.min())
+        other.max = float(values.max())
+        self.merge(other)
+
+    def merge(self, other):
+        """
+        Merges the values accumulated by another `Statistic` into this one.
+        """
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.__m2 = other.count, other.mean, other.__m2
+            self.min, self.max = other.min, other.max
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.__m2 += other.__m2 + delta * delta * (float(self.count) * other.count / count)
+        self.mean += delta * (float(other.count) / count)
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def pk2pk(self):
+        """
+        The difference between the largest and smallest values.
+        """
+        return self.max - self.min
+
+    def variance(self, ddof=1):
+        """
+        Returns the variance of the values. By default, this is the sample variance (``ddof=1``),
+        pass ``ddof=0`` for the population variance. Returns ``nan`` if there are not enough values.
+        """
+        return self.__m2 / (self.count - ddof) if self.count > ddof else numpy.nan
+
+    def std(self, ddof=1):
+        """
+        Returns the standard deviation of the values, see `variance`.
+        """
+        return numpy.sqrt(self.variance(ddof))
+
+
+class JitterStats(object):
+    """
+    Accumulates jitter statistics from the edges of a clock-like signal, over any number of
+    acquisitions. Only edges in one direction are used (rising edges, by default).
+
+    Three statistics are kept, each a `Statistic`:
+
+    .. attribute:: period
+
+        The period jitter: the time between each pair of consecutive edges.
+
+    .. attribute:: cycle_to_cycle
+
+        The cycle-to-cycle jitter: the difference between each pair of consecutive periods.
+
+    .. attribute:: tie
+
+        The time interval error: the time of each edge relative to an ideal clock. For each
+        acquisition, the ideal clock is the straight line best fitting the edge times (by least
+        squares), or, if a `nominal_period` is given, the clock with that period best fitting the
+        edge times.
+
+    .. attribute:: acquisitions
+
+        The number of acquisitions which contributed edges.
+    """
+
+    def __init__(self, nominal_period=None, rising=True):
+        """
+        :param float nominal_period:    Optional, the period of the ideal clock for TIE, in X units (e.g.,
+            seconds). The default is `None`, meaning the period is fitted for each acquisition, which is
+            equivalent to a constant frequency clock recovery.
+
+        :param bool rising: Optional, if `True` (the default), rising edges are used, otherwise falling
+            edges are used.
+        """
+        self.nominal_period = nominal_period
+        self.rising = rising
+        self.reset()
+
+    def reset(self):
+        """
+        Clears all accumulated statistics.
+        """
+        self.period = Statistic()
+        self.cycle_to_cycle = Statistic()
+        self.tie = Statistic()
+        self.acquisitions = 0
+
+    def add(self, wfm, level=None, hysteresis=0.0, preamble=None):
+        """
+        Adds the edges of one acquisition.
+
+        :param wfm:     Either the `Edges` of the acquisition, as from `find_edges`, or the record itself,
+            in which case edges are found with `find_edges`, using the remaining parameters.
+        """
+        if not isinstance(wfm, Edges):
+            wfm = find_edges(wfm, level, hysteresis, preamble)
+        times = wfm.times[wfm.rising if self.rising else ~wfm.rising]
+        if len(times) < 2:
+            return
+
+        periods = numpy.diff(times)
+        self.period.add(periods)
+        self.cycle_to_cycle.add(numpy.diff(periods))
+
+        k = numpy.arange(len(times), dtype=numpy.float64)
+        if self.nominal_period is None:
+            slope, offset = numpy.polyfit(k, times, 1)
+        else:
+            slope = self.nominal_period
+            offset = numpy.mean(times - k * slope)
+        self.tie.add(times - (offset + k * slope))
+        self.acquisitions += 1
+
+    def merge(self, other):
+        """
+        Merges the statistics accumulated by another `JitterStats` object into this one.
+        """
+        self.period.merge(other.period)
+        self.cycle_to_cycle.merge(other.cycle_to_cycle)
+        self.tie.merge(other.tie)
+        self.acquisitions += other.acquisitions
+
@@ -0,0 +1,234 @@
+"""
+Provides streaming digital filters for waveform records: FIR and IIR filters which keep their
+state from one call to the next, so a long record can be filtered in chunks (for instance, the
+windows of `TDS3k.iter_curve <pytek.TDS3k.iter_curve>`) with exactly the same result as filtering
+it in one piece, and without a start-up transient at the start of each chunk.
+
+Filters are specified by their type and cutoff frequencies in Hertz, and are designed from the
+sample rate of the first record processed (``1 / x_incr``, from the record's preamble). The
+design is kept for as long as the sample rate doesn't change, so after the first record, the
+cost of filtering is just that of the convolution or recursion itself.
+
+Example:
+
+>>> from pytek.filters import FirFilter
+>>>
+>>> lowpass = FirFilter("lowpass", 50e3, numtaps=101)
+>>> for offset, points in tds.iter_curve(window=1000):
+...     filtered = lowpass.process(points, preamble)
+...
+>>> filtered
+<Waveform of 1000 points, no preamble>
+>>>
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, see `pytek.waveform`. `IirFilter`
+    also requires `scipy <https://www.scipy.org/>`_, which you can install with the ``scipy`` extra.
+
+"""
+
+import numpy
+
+from .waveform import Waveform
+
+try:
+    from scipy import signal
+except ImportError:
+    signal = None
+
+
+KINDS = ("lowpass", "highpass", "bandpass", "bandstop")
+"""
+The supported kinds of filters. Low-pass and high-pass filters take a single cutoff frequency,
+band-pass and band-stop filters take a pair of frequencies ``(low, high)``.
+"""
+
+IIR_TYPES = ("butter", "cheby1", "cheby2", "ellip", "bessel")
+"""
+The supported IIR filter families, as designed by `scipy.signal.iirfilter`.
+"""
+
+
+class FilterStage(object):
+    """
+    The base class of streaming filters. Subclasses implement ``_design``, which returns the
+    filter design for a sample rate, ``_initial``, which returns the initial state for a given
+    first input sample, and ``_apply``, which filters an array with a given state and returns
+    the output and the new state.
+    """
+
+    def __init__(self, kind, cutoff, prime=True):
+        """
+        :param str kind:    The kind of filter, one of `KINDS`.
+
+        :param cutoff:      The cutoff frequency in Hertz, or a pair of them for band-pass and
+            band-stop filters (assuming the X units of the records are seconds).
+
+        :param bool prime:  Optional, if `True` (the default), the filter starts out as if its input had
+            always been at the value of the first sample it processes, which avoids a start-up transient.
+            If `False`, it starts out as if its input had always been 0.
+        """
+        if kind not in KINDS:
+            raise ValueError("Unknown kind of filter: %r" % kind)
+        band = kind in ("bandpass", "bandstop")
+        cutoff = numpy.atleast_1d(numpy.asarray(cutoff, dtype=numpy.float64))
+        if len(cutoff) != (2 if band else 1):
+            raise ValueError("A %s filter needs %s cutoff frequency." % (kind, "a pair of" if band else "one"))
+        self.kind = kind
+        self.cutoff = cutoff
+        self.prime = prime
+        self.__x_incr = None
+        self.design = None
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the state of the filter, so the next record processed is the start of a new stream.
+        """
+        self.state = None
+
+    def _normalized(self, x_incr):
+        """
+        Returns the cutoff frequencies as a fraction of the Nyquist frequency.
+        """
+        nyquist = 0.5 / x_incr
+        wn = self.cutoff / nyquist
+        if (wn <= 0).any() or (wn >= 1).any():
+            raise ValueError("Cutoff frequencies must be between 0 and the Nyquist frequency (%g Hz)." % nyquist)
+        return wn
+
+    def process(self, wfm, preamble=None):
+        """
+        Filters a record, or the next chunk of a stream, and returns the result as a
+        `~pytek.waveform.Waveform` with the same time base, whose curve is the filtered
+        signal in Y units (i.e., with no vertical scaling).
+
+        :param wfm:     The record, either a `~pytek.waveform.Waveform`, or a raw curve as from
+            `TDS3k.get_curve <pytek.TDS3k.get_curve>`, in which case `preamble` is required.
+
+        :param dict preamble:   The waveform preamble used to scale a raw curve.
+        """
+        if not isinstance(wfm, Waveform):
+            wfm = Waveform(wfm, preamble)
+        if wfm.x_incr != self.__x_incr:
+            if self.state is not None:
+                raise ValueError("Sample interval changed while filtering a stream, reset the filter first.")
+            self.design = self._design(wfm.x_incr)
+            self.__x_incr = wfm.x_incr
+
+        y = wfm.y
+        if not len(y):
+            return Waveform(y, _timebase(wfm))
+        if self.state is None:
+            self.state = self._initial(y[0] if self.prime else 0.0)
+        out, self.state = self._apply(y, self.state)
+        return Waveform(out, _timebase(wfm))
+
+
+def _timebase(wfm):
+    return dict((k, v) for k, v in wfm.preamble.items() if k not in ("y_scale", "y_offset", "y_zero"))
+
+
+def _sinc_lowpass(numtaps, wn, window):
+    """
+    Returns the taps of a windowed-sinc low-pass filter with the given normalized cutoff, with unity
+    gain at DC.
+    """
+    n = numpy.arange(numtaps) - 0.5 * (numtaps - 1)
+    taps = wn * numpy.sinc(wn * n) * window
+    return taps / taps.sum()
+
+
+class FirFilter(FilterStage):
+    """
+    A linear phase FIR filter, designed with the windowed-sinc method. The output is delayed by
+    ``(numtaps - 1) / 2`` samples relative to the input, see `delay`.
+    """
+
+    def __init__(self, kind, cutoff, numtaps=101, window="hamming", prime=True):
+        """
+        :param int numtaps: Optional, the number of taps (the length of the filter). This must be odd
+            for high-pass and band-stop filters. The default is 101.
+
+        :param str window:  Optional, the window used in the design, one of ``"hamming"`` (the default),
+            ``"hanning"``, ``"blackman"``, or ``"rectangular"``.
+
+        See `FilterStage` for the other parameters.
+        """
+        if kind in ("highpass", "bandstop") and numtaps % 2 == 0:
+            raise ValueError("A %s FIR filter must have an odd number of taps." % kind)
+        windows = {"hamming": numpy.hamming, "hanning": numpy.hanning, "blackman": numpy.blackman, "rectangular": numpy.ones}
+        if window not in windows:
+            raise ValueError("Unknown window: %r" % window)
+        self.numtaps = numtaps
+        self.window = windows[window](numtaps)
+        FilterStage.__init__(self, kind, cutoff, prime)
+
+    @property
+    def delay(self):
+        """
+        The delay of the filter, in samples.
+        """
+        return 0.5 * (self.numtaps - 1)
+
+    def _design(self, x_incr):
+        wn = self._normalized(x_incr)
+        if self.kind in ("lowpass", "highpass"):
+            taps = _sinc_lowpass(self.numtaps, wn[0], self.window)
+        else:
+            taps = _sinc_lowpass(self.numtaps, wn[1], self.window) - _sinc_lowpass(self.numtaps, wn[0], self.window)
+        if self.kind in ("highpass", "bandstop"):
+            taps = -taps
+            taps[self.numtaps // 2] += 1.0
+        return taps
+
+    def _initial(self, value):
+        #The state is the last numtaps-1 input samples.
+        return numpy.full(self.numtaps - 1, value)
+
+    def _apply(self, y, state):
+        x = numpy.concatenate((state, y))
+        out = numpy.convolve(x, self.design, mode="valid")
+        return out, x[len(x) - len(state):]
+
+
+class IirFilter(FilterStage):
+    """
+    An IIR filter, designed with `scipy.signal.iirfilter` and applied as cascaded second order
+    sections with `scipy.signal.sosfilt`. This requires scipy.
+    """
+
+    def __init__(self, kind, cutoff, order=4, ftype="butter", rp=None, rs=None, prime=True):
+        """
+        :param int order:   Optional, the order of the filter. The default is 4.
+
+        :param str ftype:   Optional, the filter family, one of `IIR_TYPES`. The default is ``"butter"``.
+
+        :param float rp:    For Chebyshev type I and elliptic filters, the passband ripple in dB.
+
+        :param float rs:    For Chebyshev type II and elliptic filters, the stopband attenuation in dB.
+
+        See `FilterStage` for the other parameters.
+        """
+        if signal is None:
+            raise ImportError("IirFilter requires scipy, which could not be imported.")
+        if ftype not in IIR_TYPES:
+            raise ValueError("Unknown IIR filter type: %r" % ftype)
+        self.order = order
+        self.ftype = ftype
+        self.rp = rp
+        self.rs = rs
+        FilterStage.__init__(self, kind, cutoff, prime)
+
+    def _design(self, x_incr):
+        wn = self._normalized(x_incr)
+        return signal.iirfilter(self.order, wn if len(wn) > 1 else wn[0], rp=self.rp, rs=self.rs,
+            btype=self.kind, ftype=self.ftype, output="sos")
+
+    def _initial(self, value):
+        return signal.sosfilt_zi(self.design) * value
+
+    def _apply(self, y, state):
+        return signal.sosfilt(self.design, y, zi=state)
+
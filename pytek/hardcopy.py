@@ -0,0 +1,384 @@
+"""
+Provides streaming transfer of hardcopies (screenshots) from a device, as used by
+`TDS3k.screenshot <pytek.TDS3k.screenshot>`.
+
+Hardcopies can take minutes to transfer over a serial port, so rather than buffering the whole
+image in memory, `read_hardcopy` writes it to an output stream chunk by chunk, as it arrives,
+and can report progress to a callback. The total size of the image is found from its header
+where the format allows it (see `ImageTracker`), so the callback can show how far along the
+transfer is, and the transfer ends as soon as the last byte arrives instead of waiting for the
+port to time out.
+
+Probing which hardcopy formats a device supports takes several round trips per format, so a
+`FormatCache` keeps the supported formats of each device (by its `*IDN` string) on disk, along with
+the transfer times of screenshots taken with ``fmt="auto"``, so the fastest format can be chosen
+without probing again.
+
+Unlike the analysis modules, this module only uses the standard library.
+
+Example:
+
+>>> def show(received, rate, total):
+...     print "%d of %s bytes, %.0f B/s" % (received, total, rate)
+...
+>>> with open("screen.bmp", "wb") as ofile:
+...     tds.screenshot(ofile, fmt="RLE", progress=show)
+...
+1 of None bytes, 0 B/s
+960 of 38462 bytes, 958 B/s
+...
+38462 of 38462 bytes, 957 B/s
+>>>
+
+"""
+
+import errno
+import json
+import os
+import struct
+import time
+
+
+FORMATS = ("TDS3PRT", "BMP", "BMPColor", "DESKJET", "DESKJETC", "EPSColor", "EPSMono", "EPSON", "INTERLEAF",
+    "LASERJET", "PCX", "PCXcolor", "RLE", "THINKJET", "TIFF", "DPU3445", "BJC80", "PNG")
+"""
+All of the hardcopy formats documented for the TDS 3000 series, see `TDS3k.screenshot <pytek.TDS3k.screenshot>`.
+Individual devices support a subset of these.
+"""
+
+IMAGE_FORMATS = ("RLE", "TIFF", "PCXcolor", "PCX", "PNG", "EPSColor", "EPSMono", "INTERLEAF", "BMP", "BMPColor")
+"""
+The hardcopy formats which give image files (the others are for printers), from the fastest
+to the slowest to transfer, as far as is known. This is the order in which `FormatCache.fastest`
+chooses between formats it doesn't have transfer times for.
+"""
+
+
+class ImageTracker(object):
+    """
+    Follows the bytes of an image as they are transferred, to estimate its total size and to tell
+    when the last byte has arrived, without keeping more than the start of the image.
+
+    The total size is found from the header for the following formats:
+
+    *   **BMP** (including RLE compressed bitmaps) - the file size field of the header.
+    *   **TIFF** - the extents of the first image file directory, its values, and the strips (or
+        tiles) it points to, if they are all within the first `HEADER_SIZE` bytes of the image.
+    *   **PNG** - the end of the ``IEND`` chunk, found by following the chunk lengths as the
+        image streams past.
+
+    For any other format, or if the header can't be parsed, `total` stays `None`.
+
+    .. attribute:: received
+
+        The number of bytes received so far.
+
+    .. attribute:: total
+
+        The total size of the image in bytes, or `None` if it's not known (yet, or at all for
+        this format). For PNG, this is only known once the start of the last chunk has arrived.
+    """
+
+    HEADER_SIZE = 4096
+    """
+    The most bytes kept from the start of the image, for parsing its header.
+    """
+
+    def __init__(self):
+        self.received = 0
+        self.total = None
+        self.header = b""
+        #Offset and collected bytes of the next PNG chunk header.
+        self.__chunk = len(_PNG_SIGNATURE)
+        self.__pending = b""
+
+    @property
+    def complete(self):
+        """
+        Whether the whole image has been received, according to its header.
+        """
+        return self.total is not None and self.received >= self.total
+
+    @property
+    def remaining(self):
+        """
+        The number of bytes of the image which are known to be still to come, or `None` if that isn't
+        known. Before the ``IEND`` chunk of a PNG image is found, this counts the bytes up to the end of
+        the smallest possible next chunk.
+        """
+        if self.total is not None:
+            return max(self.total - self.received, 0)
+        if self.header[:len(_PNG_SIGNATURE)] == _PNG_SIGNATURE:
+            return self.__chunk + 12 - self.received
+        return None
+
+    def feed(self, chunk):
+        """
+        Updates the tracker with the next chunk of the image.
+        """
+        pos = self.received
+        self.received += len(chunk)
+        if self.total is not None:
+            return
+
+        if len(self.header) < self.HEADER_SIZE:
+            self.header += chunk[:self.HEADER_SIZE - len(self.header)]
+            self.total = _header_size(self.header)
+
+        if self.header[:len(_PNG_SIGNATURE)] == _PNG_SIGNATURE:
+            self.__walk_png(chunk, pos)
+
+    def __walk_png(self, chunk, pos):
+        """
+        Collects the 8 byte header (length and type) of each chunk of a PNG image as it streams past,
+        and sets `total` once the ``IEND`` chunk is found.
+        """
+        end = pos + len(chunk)
+        while self.total is None and self.__chunk + 8 <= end:
+            if self.__chunk + len(self.__pending) >= pos:
+                start = self.__chunk + len(self.__pending) - pos
+                self.__pending += chunk[start:start + 8 - len(self.__pending)]
+            length, ctype = struct.unpack(">I4s", self.__pending)
+            if ctype == b"IEND":
+                self.total = self.__chunk + 12 + length
+            self.__chunk += 12 + length
+            self.__pending = b""
+        if self.total is None and self.__chunk < end:
+            start = max(self.__chunk + len(self.__pending) - pos, 0)
+            self.__pending += chunk[start:]
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+_TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8}
+
+_TIFF_INTEGERS = {1: "B", 3: "H", 4: "I"}
+
+#StripOffsets and StripByteCounts, TileOffsets and TileByteCounts.
+_TIFF_EXTENTS = ((273, 279), (324, 325))
+
+
+def _header_size(header):
+    """
+    Returns the total size of an image given in its header, or `None` if the header doesn't
+    (yet) give it. PNG images are handled by `ImageTracker` itself.
+    """
+    #Windows bitmap, including RLE compressed: "BM" followed by the file size.
+    if header[:2] == b"BM" and len(header) >= 6:
+        return struct.unpack("<I", header[2:6])[0]
+    if header[:4] in (b"II*\0", b"MM\0*"):
+        try:
+            return _tiff_size(header)
+        except struct.error:
+            #Not all of the directory is in the header (yet).
+            return None
+    return None
+
+
+def _tiff_directory(data):
+    """
+    Parses the first image file directory of a TIFF file. Returns a tuple ``(tags, end, following)``:
+    a `dict` mapping each tag with integer (BYTE, SHORT or LONG) values to a tuple of its values, the
+    offset of the end of the directory and all of the values it points to, and the offset of the next
+    directory (zero if there isn't one). Raises `struct.error` if `data` doesn't include all of that.
+    """
+    order = "<" if data[:2] == b"II" else ">"
+    ifd = struct.unpack_from(order + "I", data, 4)[0]
+    count = struct.unpack_from(order + "H", data, ifd)[0]
+    end = ifd + 2 + 12 * count + 4
+    following = struct.unpack_from(order + "I", data, end - 4)[0]
+
+    tags = {}
+    for i in xrange(count):
+        tag, vtype, n = struct.unpack_from(order + "HHI", data, ifd + 2 + 12 * i)
+        size = _TIFF_TYPE_SIZES.get(vtype, 1) * n
+        offset = ifd + 2 + 12 * i + 8
+        if size > 4:
+            offset = struct.unpack_from(order + "I", data, offset)[0]
+            end = max(end, offset + size)
+        if vtype in _TIFF_INTEGERS:
+            tags[tag] = struct.unpack_from(order + _TIFF_INTEGERS[vtype] * n, data, offset)
+    return tags, end, following
+
+
+def _tiff_size(header):
+    """
+    Returns the size of a single image TIFF file from its header, which must include the first image
+    file directory and any values it points to. Raises `struct.error` if it doesn't.
+    """
+    tags, end, following = _tiff_directory(header)
+    if following != 0:
+        #More than one image: don't guess.
+        return None
+    for offsets, counts in _TIFF_EXTENTS:
+        if offsets in tags and counts in tags:
+            end = max([end] + [o + c for o, c in zip(tags[offsets], tags[counts])])
+    return end
+
+
+def read_hardcopy(port, ofile, progress=None, chunk_size=1024, clock=time.time):
+    """
+    Reads a hardcopy from the given port, writing it to the output stream `ofile` as it arrives.
+    Like `TDS3k.get_response <pytek.TDS3k.get_response>`, this waits indefinitely for the first byte.
+    It then reads until the whole image has arrived, according to the size found in its header by
+    `ImageTracker`, so it doesn't have to wait for the port to time out. For formats where the size
+    isn't known, it reads until a read from the port times out. Returns the number of bytes read.
+
+    :param port:    The serial port to read from, which must have a timeout.
+
+    :param ofile:   The output stream to write the image to.
+
+    :param progress:    Optional, a function which is called after each chunk is received, with
+        three arguments: the number of bytes received so far, the average rate of the transfer in
+        bytes per second, and the estimated total size of the image in bytes (or `None`, if it isn't
+        known).
+
+    :param int chunk_size:  Optional, the largest number of bytes to read from the port at once. The
+        default is 1024.
+
+    :param clock:   Optional, the function used to measure time for the rate. The default is `time.time`.
+    """
+    tracker = ImageTracker()
+    while True:
+        data = port.read(1)
+        if len(data):
+            break
+
+    start = clock()
+    while len(data):
+        ofile.write(data)
+        tracker.feed(data)
+        if progress is not None:
+            elapsed = clock() - start
+            progress(tracker.received, float(tracker.received) / elapsed if elapsed > 0 else 0.0, tracker.total)
+        if tracker.complete:
+            break
+        #Never read past the end of the image, so the next response isn't swallowed.
+        remaining = tracker.remaining
+        data = port.read(chunk_size if remaining is None else min(chunk_size, remaining))
+    return tracker.received
+
+
+
+class FormatCache(object):
+    """
+    Keeps a record of the hardcopy formats supported by each device, and how long screenshots
+    take to transfer in each, in a JSON file. Devices are identified by the string returned by
+    `TDS3k.identify <pytek.TDS3k.identify>`, which includes the model and firmware version.
+
+    The file is read when the cache is first used, and written whenever it changes. Transfers are
+    compared by throughput, in bytes per second, since screenshots of a busier screen are larger
+    and take longer in any format.
+    """
+
+    DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".pytek", "hardcopy.json")
+    """
+    The file used if no other path is given: ``hardcopy.json`` in the ``.pytek`` directory of
+    the user's home directory.
+    """
+
+    TOLERANCE = 0.1
+    """
+    The relative change in throughput for a format below which `record` keeps the stored timing,
+    so the file isn't rewritten for every screenshot (e.g., by a `~pytek.capture.CaptureService`).
+    """
+
+    def __init__(self, path=None):
+        """
+        :param str path:    Optional, the path of the cache file, which is created (along with its
+            directory) if it doesn't exist. The default is `DEFAULT_PATH`.
+        """
+        self.path = self.DEFAULT_PATH if path is None else path
+        self.__devices = None
+
+    def __load(self):
+        if self.__devices is None:
+            try:
+                with open(self.path, "r") as ifile:
+                    self.__devices = json.load(ifile)
+            except (IOError, ValueError):
+                #Missing or corrupt: start over.
+                self.__devices = {}
+        return self.__devices
+
+    def __save(self):
+        directory = os.path.dirname(self.path)
+        try:
+            os.makedirs(directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        with open(self.path, "w") as ofile:
+            json.dump(self.__devices, ofile, indent=2, sort_keys=True)
+
+    def __device(self, identity):
+        return self.__load().setdefault(identity, {"supported": None, "timings": {}})
+
+    def supported(self, identity):
+        """
+        Returns the list of formats the identified device was found to support, or `None` if it
+        hasn't been probed.
+        """
+        return self.__load().get(identity, {}).get("supported")
+
+    def set_supported(self, identity, formats):
+        """
+        Records the list of formats the identified device supports.
+        """
+        device = self.__device(identity)
+        if device["supported"] != list(formats):
+            device["supported"] = list(formats)
+            self.__save()
+
+    def timing(self, identity, fmt):
+        """
+        Returns the most recent transfer of a screenshot in the given format from the identified device,
+        as a tuple ``(size, seconds)``, or `None` if there isn't one.
+        """
+        timing = self.__load().get(identity, {}).get("timings", {}).get(fmt)
+        return None if timing is None else tuple(timing)
+
+    def throughput(self, identity, fmt):
+        """
+        Returns the throughput of the most recent recorded transfer in the given format from the
+        identified device, in bytes per second, or `None` if there isn't one.
+        """
+        timing = self.timing(identity, fmt)
+        return None if timing is None else float(timing[0]) / timing[1]
+
+    def record(self, identity, fmt, size, seconds):
+        """
+        Records the transfer of a screenshot of `size` bytes in the given format from the identified
+        device, which took `seconds`. The stored timing is only replaced, and the file written, if the
+        throughput differs from the stored one by more than `TOLERANCE`. Transfers which took no
+        measurable time are ignored. Returns `True` if the timing was stored.
+        """
+        if seconds <= 0:
+            return False
+        previous = self.throughput(identity, fmt)
+        if previous is not None and abs(float(size) / seconds - previous) <= self.TOLERANCE * previous:
+            return False
+        self.__device(identity)["timings"][fmt] = [size, seconds]
+        self.__save()
+        return True
+
+    def fastest(self, identity):
+        """
+        Returns the fastest supported image format for the identified device, or `None` if it hasn't
+        been probed or supports none of the `IMAGE_FORMATS`.
+
+        Formats are considered in the order of `IMAGE_FORMATS`. If the first supported format hasn't
+        been timed, it's returned. Otherwise, the format with the highest recorded throughput is
+        returned, so measured times take precedence, but slow formats are never tried just to time them.
+        """
+        supported = self.supported(identity)
+        if supported is None:
+            return None
+        supported = set(f.lower() for f in supported)
+        candidates = [f for f in IMAGE_FORMATS if f.lower() in supported]
+        if not candidates:
+            return None
+        timed = [(self.throughput(identity, f), f) for f in candidates if self.timing(identity, f) is not None]
+        if not timed or self.timing(identity, candidates[0]) is None:
+            return candidates[0]
+        return max(timed)[1]
@@ -0,0 +1,390 @@
+"""
+Provides decoding of hardcopies (screenshots) from `TDS3k.screenshot <pytek.TDS3k.screenshot>`
+into arrays of pixels, and encoding of pixels as PNG images.
+
+The formats which transfer quickest from the device (**RLE** and **TIFF**) are rarely the ones
+wanted afterwards, while **PNG** and **BMPColor** take many times longer to transfer. With this
+module, hardcopies can always be transferred in a fast format and converted on the host:
+
+*   `decode_image` decodes a Windows bitmap (**BMP**, **BMPColor** and run length encoded **RLE**),
+    PC Paintbrush (**PCX** and **PCXcolor**) or **TIFF** image into a `numpy.ndarray` of RGB pixels.
+*   `encode_png` encodes an array of pixels as a PNG image, using only `zlib` and `struct`.
+*   `transcode_png` does both.
+
+Run length encoded data is parsed into runs in a single pass, and the runs are expanded into pixels
+with vectorized numpy operations, so decoding a full screen hardcopy takes tens of milliseconds.
+
+Example:
+
+>>> from pytek.imaging import decode_image, transcode_png
+>>>
+>>> data = tds.screenshot(fmt="RLE")
+>>> decode_image(data).shape
+(480, 640, 3)
+>>> with open("screen.png", "wb") as ofile:
+...     transcode_png(data, ofile)
+...
+>>>
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, see `pytek.waveform`.
+
+"""
+
+import struct
+import zlib
+
+import numpy
+
+from .hardcopy import _tiff_directory
+
+
+def _expand(starts, counts, values, size, nibbles=False):
+    """
+    Expands runs into a flat array of `size` pixels, which are zero where there is no run. Run `i`
+    repeats `values[i]` `counts[i]` times, from position `starts[i]`. If `nibbles` is `True`,
+    the runs instead alternate between the high and low nibbles of their values, as in 4 bit
+    run length encoded bitmaps. Runs which extend past the end of the array are truncated.
+    """
+    out = numpy.zeros(size, dtype=numpy.uint8)
+    counts = numpy.asarray(counts, dtype=numpy.intp)
+    if not len(counts):
+        return out
+    total = int(counts.sum())
+    #Index of each pixel within its run.
+    k = numpy.arange(total) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+    index = numpy.repeat(numpy.asarray(starts, dtype=numpy.intp), counts) + k
+    pixels = numpy.repeat(numpy.asarray(values, dtype=numpy.uint8), counts)
+    if nibbles:
+        pixels = numpy.where(k & 1, pixels & 0x0F, pixels >> 4)
+    keep = index < size
+    out[index[keep]] = pixels[keep]
+    return out
+
+
+def _unpack(raw, bits, width):
+    """
+    Unpacks rows of packed pixels of the given bit depth (1, 4 or 8) into an array of one value per pixel,
+    cropped to `width`.
+    """
+    if bits == 8:
+        return raw[:, :width]
+    if bits == 4:
+        return numpy.dstack((raw >> 4, raw & 0x0F)).reshape(len(raw), -1)[:, :width]
+    if bits == 1:
+        return numpy.unpackbits(raw, axis=1)[:, :width]
+    raise ValueError("Unsupported bit depth: %d" % bits)
+
+
+def _palette(colors):
+    """
+    Pads a palette of RGB colors to 256 entries, so it can be indexed by any byte.
+    """
+    palette = numpy.zeros((256, 3), dtype=numpy.uint8)
+    colors = colors[:256]
+    palette[:len(colors)] = colors
+    return palette
+
+
+### BMP ###
+
+def _bmp_rle(data, width, height, nibbles):
+    """
+    Decodes 8 bit (or 4 bit, if `nibbles` is `True`) run length encoded bitmap data, into an array of
+    `height` rows of `width` palette indices, bottom row first.
+    """
+    buf = bytearray(data)
+    starts, counts, values = [], [], []
+    x = y = i = 0
+    while i + 1 < len(buf):
+        count, value = buf[i], buf[i + 1]
+        i += 2
+        if count:
+            starts.append(y * width + x)
+            counts.append(count)
+            values.append(value)
+            x += count
+        elif value == 0:
+            #End of line.
+            x = 0
+            y += 1
+        elif value == 1:
+            #End of bitmap.
+            break
+        elif value == 2:
+            #Delta.
+            x += buf[i]
+            y += buf[i + 1]
+            i += 2
+        else:
+            #Absolute mode: `value` pixels, padded to a 16 bit boundary.
+            size = (value + 1) // 2 if nibbles else value
+            literal = buf[i:i + size]
+            pos = y * width + x
+            if nibbles:
+                starts.extend(xrange(pos, pos + value, 2))
+                counts.extend([2] * (value // 2) + [1] * (value & 1))
+            else:
+                starts.extend(xrange(pos, pos + value))
+                counts.extend([1] * value)
+            values.extend(literal)
+            x += value
+            i += size + (size & 1)
+    return _expand(starts, counts, values, width * height, nibbles).reshape(height, width)
+
+
+def decode_bmp(data):
+    """
+    Decodes a Windows bitmap, uncompressed with 1, 4, 8, 24 or 32 bits per pixel, or run length
+    encoded with 4 or 8 bits per pixel. Returns a `numpy.ndarray` of shape ``(height, width, 3)``
+    with the red, green and blue values of each pixel, top row first.
+
+    Raises a `ValueError` if the data is not a supported bitmap.
+    """
+    if data[:2] != b"BM":
+        raise ValueError("Not a Windows bitmap.")
+    pixel_offset, dib_size = struct.unpack_from("<II", data, 10)
+    if dib_size < 40:
+        raise ValueError("Unsupported bitmap header.")
+    width, height, planes, bits, compression = struct.unpack_from("<iiHHI", data, 18)
+    colors = struct.unpack_from("<I", data, 46)[0]
+    top_down = height < 0
+    height = abs(height)
+
+    if compression in (1, 2):
+        indices = _bmp_rle(data[pixel_offset:], width, height, compression == 2)
+    elif compression == 0:
+        stride = (width * bits + 31) // 32 * 4
+        raw = numpy.frombuffer(data, dtype=numpy.uint8, count=stride * height, offset=pixel_offset)
+        raw = raw.reshape(height, stride)
+        if bits == 24:
+            pixels = raw[:, :3 * width].reshape(height, width, 3)[:, :, ::-1]
+        elif bits == 32:
+            pixels = raw[:, :4 * width].reshape(height, width, 4)[:, :, 2::-1]
+        else:
+            indices = _unpack(raw, bits, width)
+    else:
+        raise ValueError("Unsupported bitmap compression: %d" % compression)
+
+    if bits <= 8:
+        colors = colors or 1 << bits
+        table = numpy.frombuffer(data, dtype=numpy.uint8, count=4 * colors, offset=14 + dib_size)
+        pixels = _palette(table.reshape(colors, 4)[:, 2::-1])[indices]
+    if not top_down:
+        pixels = pixels[::-1]
+    return numpy.ascontiguousarray(pixels)
+
+
+### PCX ###
+
+def _pcx_rle(data):
+    """
+    Decodes PCX run length encoded data. A byte with its top two bits set is a count (in its lower
+    six bits) for the byte following it, any other byte is a single literal.
+    """
+    buf = numpy.frombuffer(data, dtype=numpy.uint8)
+    high = buf >= 0xC0
+    #Within a sequence of high bytes following a low byte, counts and values alternate, starting
+    # with a count. The low byte after a sequence of odd length is the value of its last count.
+    index = numpy.arange(len(buf))
+    first = numpy.maximum.accumulate(numpy.where(high, 0, index + 1))
+    is_count = high & ((index - first) % 2 == 0)
+    is_count[-1:] = False
+    is_value = numpy.zeros_like(is_count)
+    is_value[1:] = is_count[:-1]
+    tokens = numpy.flatnonzero(~is_value)
+    counts = numpy.where(is_count[tokens], buf[tokens] & 0x3F, 1)
+    values = numpy.where(is_count[tokens], buf[numpy.minimum(tokens + 1, len(buf) - 1)], buf[tokens])
+    return numpy.repeat(values, counts)
+
+
+def decode_pcx(data):
+    """
+    Decodes a PC Paintbrush image: monochrome, 16 color (four bit planes), 256 color (palette) or
+    24 bit (three planes). Returns a `numpy.ndarray` of shape ``(height, width, 3)`` with the red,
+    green and blue values of each pixel, top row first.
+
+    Raises a `ValueError` if the data is not a supported PCX image.
+    """
+    if len(data) < 128 or data[:1] != b"\x0A":
+        raise ValueError("Not a PCX image.")
+    encoding, bits, xmin, ymin, xmax, ymax = struct.unpack_from("<BBHHHH", data, 2)
+    planes, line = struct.unpack_from("<BH", data, 65)
+    width, height = xmax - xmin + 1, ymax - ymin + 1
+
+    body = data[128:]
+    if bits == 8 and planes == 1 and len(data) >= 128 + 769 and data[-769:-768] == b"\x0C":
+        table = numpy.frombuffer(data[-768:], dtype=numpy.uint8).reshape(256, 3)
+        body = data[128:-769]
+    else:
+        table = numpy.frombuffer(data, dtype=numpy.uint8, count=48, offset=16).reshape(16, 3)
+
+    size = height * planes * line
+    raw = _pcx_rle(body) if encoding else numpy.frombuffer(body, dtype=numpy.uint8)
+    if len(raw) < size:
+        raw = numpy.append(raw, numpy.zeros(size - len(raw), dtype=numpy.uint8))
+    raw = raw[:size].reshape(height, planes, line)
+
+    if bits == 8 and planes == 3:
+        return numpy.ascontiguousarray(raw[:, :, :width].transpose(0, 2, 1))
+    if bits == 8 and planes == 1:
+        return _palette(table)[raw[:, 0, :width]]
+    if bits == 1 and planes == 1:
+        return (_unpack(raw[:, 0], 1, width) * 255)[:, :, numpy.newaxis].repeat(3, axis=2)
+    if bits == 1 and planes == 4:
+        indices = sum(_unpack(raw[:, p], 1, width) << p for p in xrange(4))
+        return _palette(table)[indices]
+    raise ValueError("Unsupported PCX image: %d bits in %d planes." % (bits, planes))
+
+
+### TIFF ###
+
+def _packbits(data):
+    """
+    Decodes PackBits compressed data, as used in TIFF files.
+    """
+    buf = bytearray(data)
+    starts, counts, values = [], [], []
+    pos = i = 0
+    while i < len(buf):
+        n = buf[i]
+        if n < 128:
+            #Literal: the next n+1 bytes.
+            literal = buf[i + 1:i + n + 2]
+            starts.extend(xrange(pos, pos + len(literal)))
+            counts.extend([1] * len(literal))
+            values.extend(literal)
+            pos += len(literal)
+            i += n + 2
+        elif n > 128:
+            #Run: the next byte, 257-n times.
+            if i + 1 < len(buf):
+                starts.append(pos)
+                counts.append(257 - n)
+                values.append(buf[i + 1])
+                pos += 257 - n
+            i += 2
+        else:
+            i += 1
+    return _expand(starts, counts, values, pos)
+
+
+def decode_tiff(data):
+    """
+    Decodes the first image of a TIFF file, uncompressed or PackBits compressed, which is bilevel,
+    grayscale, palette or RGB with up to 8 bits per sample. Returns a `numpy.ndarray` of shape
+    ``(height, width, 3)`` with the red, green and blue values of each pixel, top row first.
+
+    Raises a `ValueError` if the data is not a supported TIFF image.
+    """
+    if data[:4] not in (b"II*\0", b"MM\0*"):
+        raise ValueError("Not a TIFF image.")
+    try:
+        tags = _tiff_directory(data)[0]
+    except struct.error:
+        raise ValueError("Truncated TIFF image.")
+
+    width, height = tags[256][0], tags[257][0]
+    bits = tags.get(258, (1,))[0]
+    compression = tags.get(259, (1,))[0]
+    photometric = tags.get(262, (1,))[0]
+    samples = tags.get(277, (1,))[0]
+    if compression not in (1, 32773):
+        raise ValueError("Unsupported TIFF compression: %d" % compression)
+
+    strips = [data[o:o + c] for o, c in zip(tags[273], tags[279])]
+    if compression == 32773:
+        raw = numpy.concatenate([_packbits(s) for s in strips])
+    else:
+        raw = numpy.frombuffer(b"".join(strips), dtype=numpy.uint8)
+    stride = (width * bits * samples + 7) // 8
+    if len(raw) < stride * height:
+        raise ValueError("Truncated TIFF image.")
+    raw = raw[:stride * height].reshape(height, stride)
+
+    if photometric == 2:
+        if bits != 8:
+            raise ValueError("Unsupported TIFF image: %d bits per sample." % bits)
+        return numpy.ascontiguousarray(raw[:, :width * samples].reshape(height, width, samples)[:, :, :3])
+    values = _unpack(raw, bits, width)
+    if photometric == 3:
+        colormap = numpy.asarray(tags[320], dtype=numpy.uint16).reshape(3, -1).T >> 8
+        return _palette(colormap.astype(numpy.uint8))[values]
+    if photometric in (0, 1):
+        gray = (values.astype(numpy.uint16) * 255 // ((1 << bits) - 1)).astype(numpy.uint8)
+        if photometric == 0:
+            gray = 255 - gray
+        return gray[:, :, numpy.newaxis].repeat(3, axis=2)
+    raise ValueError("Unsupported TIFF photometric interpretation: %d" % photometric)
+
+
+### Dispatch and encoding ###
+
+def decode_image(data):
+    """
+    Decodes a hardcopy image in any of the formats supported by `decode_bmp`, `decode_pcx` and
+    `decode_tiff`, determined from its header. Returns a `numpy.ndarray` of shape
+    ``(height, width, 3)`` with the red, green and blue values of each pixel, top row first.
+
+    Raises a `ValueError` if the format is not supported.
+    """
+    if data[:2] == b"BM":
+        return decode_bmp(data)
+    if data[:4] in (b"II*\0", b"MM\0*"):
+        return decode_tiff(data)
+    if data[:1] == b"\x0A":
+        return decode_pcx(data)
+    raise ValueError("Unsupported image format.")
+
+
+def _png_chunk(ctype, data):
+    return struct.pack(">I", len(data)) + ctype + data + struct.pack(">I", zlib.crc32(ctype + data) & 0xffffffff)
+
+
+def encode_png(pixels, level=6):
+    """
+    Encodes an array of pixels as a PNG image, and returns it as a string. Images with 256 colors
+    or fewer, like hardcopies, are stored with a palette, which makes them much smaller.
+
+    :param pixels:  A `numpy.ndarray` of 8 bit values, either of shape ``(height, width)`` for a
+        grayscale image, or ``(height, width, 3)`` for an RGB image, as from `decode_image`.
+
+    :param int level:   Optional, the `zlib` compression level, from 0 to 9. The default is 6.
+    """
+    pixels = numpy.asarray(pixels, dtype=numpy.uint8)
+    height, width = pixels.shape[:2]
+    palette = b""
+    if pixels.ndim == 2:
+        ctype, rows = 0, pixels
+    elif pixels.ndim == 3 and pixels.shape[2] == 3:
+        packed = (pixels[:, :, 0].astype(numpy.uint32) << 16) | (pixels[:, :, 1].astype(numpy.uint32) << 8) | pixels[:, :, 2]
+        colors, indices = numpy.unique(packed, return_inverse=True)
+        if len(colors) <= 256:
+            ctype, rows = 3, indices.astype(numpy.uint8).reshape(height, width)
+            palette = numpy.dstack((colors >> 16, colors >> 8, colors)).astype(numpy.uint8).tobytes()
+        else:
+            ctype, rows = 2, pixels.reshape(height, width * 3)
+    else:
+        raise ValueError("Pixels must be of shape (height, width) or (height, width, 3).")
+
+    #Each row is prefixed with filter type 0 (none).
+    filtered = numpy.hstack((numpy.zeros((height, 1), dtype=numpy.uint8), rows))
+    chunks = [_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, ctype, 0, 0, 0))]
+    if palette:
+        chunks.append(_png_chunk(b"PLTE", palette))
+    chunks.append(_png_chunk(b"IDAT", zlib.compress(filtered.tobytes(), level)))
+    chunks.append(_png_chunk(b"IEND", b""))
+    return b"\x89PNG\r\n\x1a\n" + b"".join(chunks)
+
+
+def transcode_png(data, ofile=None):
+    """
+    Converts a hardcopy image to PNG, see `decode_image` and `encode_png`. If `ofile` is `None` (the
+    default), returns the PNG image as a string. Otherwise, writes it to the given output stream and
+    returns `None`.
+    """
+    png = encode_png(decode_image(data))
+    if ofile is None:
+        return png
+    ofile.write(png)
@@ -0,0 +1,241 @@
+"""
+Provides mask and limit testing of waveform records, for pass/fail judgement in production test.
+
+A `Mask` describes where a waveform is allowed to go: optional upper and lower limit lines,
+and any number of forbidden polygons (like the masks of the device's mask testing application).
+Before testing, a mask is *compiled* against a waveform preamble, which maps everything onto the
+record's time axis and converts it from Y units to raw codes. The resulting `CompiledMask` holds
+precomputed per-point bounds, so testing a record is just a few vectorized comparisons of its raw
+curve against those bounds, with no scaling of the record at all.
+
+A compiled mask can also test a record while it is being transferred from the device, using
+`TDS3k.iter_curve <pytek.TDS3k.iter_curve>` to fetch it in windows. The transfer stops as soon as a
+window contains a violation, since the record can no longer pass.
+
+Example:
+
+>>> from pytek.mask import Mask
+>>>
+>>> preamble = tds.get_waveform_preamble()
+>>> mask = Mask(upper=3.6, lower=-0.3, polygons=[[(1e-6, 1.0), (2e-6, 1.0), (2e-6, 2.0), (1e-6, 2.0)]])
+>>> compiled = mask.compile(preamble)
+>>> result = compiled.test(tds.get_curve())
+>>> result.passed
+True
+>>> result = compiled.stream_test(tds, window=500)
+>>> result.passed, result.first_violation, result.points_tested
+(False, 1204, 1500)
+>>>
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, see `pytek.waveform`.
+
+"""
+
+from collections import namedtuple
+
+import numpy
+
+from .waveform import Waveform
+
+
+MaskResult = namedtuple("MaskResult", "passed violations first_violation points_tested")
+"""
+The result of testing a record against a `CompiledMask`, a `namedtuple` with the following fields:
+
+*   **passed** - `True` if there were no violations.
+*   **violations** - the number of points which violated the mask.
+*   **first_violation** - the index of the first point which violated the mask, or `None`.
+*   **points_tested** - the number of points tested. When testing during a transfer, this is less than
+    the number of points in the record if the transfer was stopped early.
+"""
+
+
+class Mask(object):
+    """
+    Describes a mask, in the Y units and on the X (time) axis of waveform records. The mask is
+    compiled against a specific preamble with `compile` before testing records.
+    """
+
+    def __init__(self, upper=None, lower=None, x=None, polygons=()):
+        """
+        :param upper:   Optional, the upper limit: points above it are violations. This can be a scalar
+            for a constant limit, or a sequence of values. If a sequence, it gives the limit at each point
+            of the record, unless `x` is given.
+
+        :param lower:   Optional, the lower limit: points below it are violations. See `upper`.
+
+        :param x:   Optional, a sequence of increasing X values (e.g., times) at which `upper` and `lower`
+            are given. If given, the limits are linearly interpolated onto the time axis of the record
+            when the mask is compiled. Outside of the range of `x`, the limits are unbounded.
+
+        :param polygons:    Optional, a sequence of forbidden regions, each given as a sequence of
+            ``(x, y)`` vertices of a convex polygon. Points inside or on the boundary of any polygon are
+            violations.
+        """
+        self.upper = upper
+        self.lower = lower
+        self.x = None if x is None else numpy.asarray(x, dtype=numpy.float64)
+        self.polygons = [numpy.asarray(p, dtype=numpy.float64) for p in polygons]
+        for poly in self.polygons:
+            if poly.ndim != 2 or poly.shape[1] != 2 or len(poly) < 3:
+                raise ValueError("Polygons must be sequences of at least three (x, y) vertices.")
+
+    def __limit(self, limit, t, default):
+        if limit is None:
+            return numpy.full(len(t), default)
+        limit = numpy.asarray(limit, dtype=numpy.float64)
+        if limit.ndim == 0:
+            return numpy.full(len(t), float(limit))
+        if self.x is not None:
+            return numpy.interp(t, self.x, limit, left=default, right=default)
+        if len(limit) != len(t):
+            raise ValueError("Expected a limit for each of the %d points, received %d." % (len(t), len(limit)))
+        return limit.copy()
+
+    def compile(self, preamble, length=None):
+        """
+        Compiles the mask for records described by the given waveform preamble, returning a `CompiledMask`.
+
+        :param dict preamble:   The waveform preamble of the records to test, as from
+            `TDS3k.get_waveform_preamble <pytek.TDS3k.get_waveform_preamble>`. Note that the vertical scaling
+            depends on the data width, so the preamble must be queried with the same width as the records
+            will be transferred with.
+
+        :param int length:  Optional, the number of points in the records. The default is the ``number_of_points``
+            field of the preamble.
+        """
+        scale = Waveform((), preamble)
+        if length is None:
+            length = int(preamble["number_of_points"])
+        t = scale.xzero + numpy.arange(length) * scale.x_incr
+
+        upper = scale.to_codes(self.__limit(self.upper, t, numpy.inf))
+        lower = scale.to_codes(self.__limit(self.lower, t, -numpy.inf))
+        if scale.y_scale < 0:
+            upper, lower = lower, upper
+
+        regions = []
+        for poly in self.polygons:
+            idx, bottom, top = _polygon_columns(poly, t, abs(scale.x_incr) * 1e-6)
+            if len(idx):
+                bottom, top = scale.to_codes(bottom), scale.to_codes(top)
+                if scale.y_scale < 0:
+                    bottom, top = top, bottom
+                regions.append((idx, bottom, top))
+
+        return CompiledMask(upper, lower, regions)
+
+
+def _polygon_columns(poly, t, eps):
+    """
+    For a convex polygon, returns the indices of the given X values which the polygon spans, and
+    the bottom and top of the polygon at each of those X values. X values within `eps` of a vertex
+    are considered to be on it.
+    """
+    x0, x1 = poly[:, 0].min() - eps, poly[:, 0].max() + eps
+    idx = numpy.flatnonzero((t >= x0) & (t <= x1))
+    ts = t[idx]
+    bottom = numpy.full(len(ts), numpy.inf)
+    top = numpy.full(len(ts), -numpy.inf)
+    for (ax, ay), (bx, by) in zip(poly, numpy.roll(poly, -1, axis=0)):
+        lo, hi = min(ax, bx) - eps, max(ax, bx) + eps
+        on = (ts >= lo) & (ts <= hi)
+        if abs(ax - bx) <= eps:
+            ys_lo = numpy.full(numpy.count_nonzero(on), min(ay, by))
+            ys_hi = numpy.full(len(ys_lo), max(ay, by))
+        else:
+            ys_lo = ys_hi = ay + (ts[on] - ax) * ((by - ay) / (bx - ax))
+        bottom[on] = numpy.minimum(bottom[on], ys_lo)
+        top[on] = numpy.maximum(top[on], ys_hi)
+    return idx, bottom, top
+
+
+class CompiledMask(object):
+    """
+    A `Mask` compiled for a specific waveform preamble, with per-point bounds in raw codes.
+    These are created by `Mask.compile`.
+
+    .. attribute:: upper
+
+        A `numpy.ndarray` of the largest allowed code at each point.
+
+    .. attribute:: lower
+
+        A `numpy.ndarray` of the smallest allowed code at each point.
+
+    .. attribute:: regions
+
+        A list of the forbidden regions, one for each polygon of the mask which overlaps the record.
+        Each is a tuple ``(indices, bottom, top)`` of arrays, giving the points spanned by the polygon,
+        and the range of forbidden codes at each of them.
+    """
+
+    def __init__(self, upper, lower, regions):
+        self.upper = upper
+        self.lower = lower
+        self.regions = regions
+
+    def __len__(self):
+        return len(self.upper)
+
+    def violations(self, curves, offset=0):
+        """
+        Returns a boolean `numpy.ndarray` which is `True` for each point that violates the mask.
+
+        :param curves:  A raw curve, or a 2-D array of raw curves (one record per row), as from
+            `TDS3k.get_curve <pytek.TDS3k.get_curve>`.
+
+        :param int offset:  Optional, the index within the record of the first point of `curves`,
+            for testing part of a record.
+        """
+        curves = numpy.asarray(curves)
+        stop = offset + curves.shape[-1]
+        if stop > len(self):
+            raise ValueError("Curve extends past the end of the mask (%d > %d points)." % (stop, len(self)))
+        bad = (curves > self.upper[offset:stop]) | (curves < self.lower[offset:stop])
+        for idx, bottom, top in self.regions:
+            lo, hi = numpy.searchsorted(idx, (offset, stop))
+            if lo == hi:
+                continue
+            cols = idx[lo:hi] - offset
+            vals = curves[..., cols]
+            bad[..., cols] |= (vals >= bottom[lo:hi]) & (vals <= top[lo:hi])
+        return bad
+
+    def test(self, curve, offset=0):
+        """
+        Tests a single raw curve (or part of one, see `violations`) against the mask,
+        and returns a `MaskResult`.
+        """
+        bad = self.violations(curve, offset)
+        count = int(numpy.count_nonzero(bad))
+        first = offset + int(numpy.argmax(bad)) if count else None
+        return MaskResult(count == 0, count, first, len(bad))
+
+    def test_batch(self, curves):
+        """
+        Tests a 2-D array of raw curves (one record per row) against the mask. Returns a
+        `numpy.ndarray` of booleans, `True` for each record which passed.
+        """
+        return ~self.violations(numpy.array(curves, ndmin=2, copy=False)).any(axis=1)
+
+    def stream_test(self, device, source="CH1", double=True, window=500):
+        """
+        Transfers a curve from the given device in windows, with `TDS3k.iter_curve <pytek.TDS3k.iter_curve>`,
+        testing each window as it arrives. As soon as a window contains a violation, the transfer
+        is stopped and the result returned. Returns a `MaskResult`, in which `violations` only
+        counts the points which were transferred.
+
+        The `double` parameter must match the data width of the preamble the mask was compiled
+        against.
+        """
+        tested = 0
+        for offset, points in device.iter_curve(source=source, double=double, stop=len(self), window=window):
+            result = self.test(points, offset)
+            tested += result.points_tested
+            if not result.passed:
+                return MaskResult(False, result.violations, result.first_violation, tested)
+        return MaskResult(True, 0, None, tested)
+
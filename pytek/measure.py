@@ -0,0 +1,286 @@
+"""
+Provides host-side automatic measurements on waveform records, like those the device
+computes with the ``MEASUREMENT`` commands, but computed from captured data instead of on
+the device.
+
+All measurements for a record, or for a whole batch of records, are computed together in a
+handful of vectorized passes over the record, so it's practical to measure thousands of
+stored records per second (for instance, records read back from an `~pytek.archive.ArchiveReader`).
+
+Example:
+
+>>> from pytek.measure import measure
+>>>
+>>> wfm = tds.get_waveform_array()
+>>> m = measure(wfm)
+>>> m["frequency"], m["pk2pk"], m["rise"]
+(1000.0, 3.28, 2.1e-06)
+>>>
+
+
+Definitions
+---------------
+
+Measurements follow the definitions given in the TDS3000 series user manual:
+
+*   **high** and **low** are the values used as the 100% and 0% levels of the waveform. With the
+    default ``"histogram"`` method, they are the most common values above and below the midpoint
+    of the waveform, respectively. With the ``"minmax"`` method, they are simply the maximum and
+    minimum values.
+*   **amplitude** is ``high - low``.
+*   **max**, **min** and **pk2pk** are the maximum, minimum, and their difference.
+*   **mean** and **rms** are the arithmetic mean and the true RMS value over the entire record.
+*   **povershoot** is ``(max - high) / amplitude * 100``, **novershoot** is ``(low - min) / amplitude * 100``.
+*   The reference levels are at 10%, 50% and 90% of the amplitude, above low (see the `ref_levels` parameter
+    of `measure`). Crossings of the reference levels are interpolated linearly between samples.
+*   **period** is the time between the first two rising crossings of the mid reference level, and
+    **frequency** is its reciprocal.
+*   **rise** is the time from the low reference level to the high reference level, on the first rising edge.
+    **fall** is the time from the high reference level to the low reference level, on the first falling edge.
+*   **pwidth** is the time from the first rising crossing of the mid reference level to the following falling
+    crossing. **nwidth** is the time from the first falling crossing to the following rising crossing.
+*   **pduty** and **nduty** are ``pwidth / period * 100`` and ``nwidth / period * 100``.
+
+Measurements which cannot be made on a record (for instance, the period of a record that
+does not contain two rising edges) are reported as ``nan``, where the device would report ``9.9E37``.
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, see `pytek.waveform`.
+
+"""
+
+import numpy
+
+from .waveform import Waveform
+
+
+MEASUREMENTS = (
+    "max", "min", "pk2pk", "high", "low", "amplitude", "mean", "rms",
+    "povershoot", "novershoot",
+    "period", "frequency", "rise", "fall", "pwidth", "nwidth", "pduty", "nduty",
+)
+"""
+The names of the measurements computed by `measure` and `measure_batch`, i.e., the keys
+of the returned dictionaries.
+"""
+
+DEFAULT_REF_LEVELS = (10.0, 50.0, 90.0)
+"""
+The default low, mid and high reference levels, in percent of amplitude.
+"""
+
+
+def _batch_params(records, preamble):
+    """
+    Returns a 2-D array of scaled values (one row per record), and a column vector of
+    ``x_incr`` values, for the given records.
+    """
+    if isinstance(records, Waveform):
+        records = [records]
+    if preamble is None:
+        if isinstance(records, numpy.ndarray):
+            raise TypeError("A preamble is required for measuring raw curve arrays.")
+        waveforms = list(records)
+        codes = numpy.array([wfm.curve for wfm in waveforms], dtype=numpy.float64)
+        column = lambda attr: numpy.array([getattr(wfm, attr) for wfm in waveforms])[:, None]
+        y_offset, y_scale, y_zero, x_incr = map(column, ("y_offset", "y_scale", "y_zero", "x_incr"))
+    else:
+        codes = numpy.array(records, dtype=numpy.float64, ndmin=2)
+        scale = Waveform((), preamble)
+        y_offset, y_scale, y_zero, x_incr = scale.y_offset, scale.y_scale, scale.y_zero, scale.x_incr
+        x_incr = numpy.full((len(codes), 1), x_incr)
+
+    if codes.size == 0:
+        raise ValueError("Cannot measure empty records.")
+    if codes.ndim != 2:
+        raise ValueError("All records in a batch must have the same number of points.")
+    codes -= y_offset
+    codes *= y_scale
+    codes += y_zero
+    return codes, x_incr
+
+
+def _histogram_levels(y, ymin, ymax, bins):
+    """
+    Returns the most common values in the upper and lower halves of each row of `y`, based
+    on a histogram of `bins` equal bins between `ymin` and `ymax`.
+    """
+    rows = len(y)
+    span = (ymax - ymin)
+    span[span == 0] = 1.0
+    idx = ((y - ymin) * (bins / span)).astype(numpy.intp)
+    numpy.clip(idx, 0, bins - 1, out=idx)
+    idx += (numpy.arange(rows) * bins)[:, None]
+    counts = numpy.bincount(idx.ravel(), minlength=rows*bins).reshape(rows, bins)
+    half = bins // 2
+    width = span[:, 0] / bins
+    high = ymin[:, 0] + (half + numpy.argmax(counts[:, half:], axis=1) + 0.5) * width
+    low = ymin[:, 0] + (numpy.argmax(counts[:, :half], axis=1) + 0.5) * width
+    return high, low
+
+
+def _crossings(y, level, rising):
+    """
+    Returns a boolean array which is `True` at each index ``i`` where ``y[i]`` has just crossed the
+    given level (a column vector, one level per row) in the given direction, i.e., where ``y[i-1]``
+    is below the level and ``y[i]`` is at or above it (for rising crossings). The first column is
+    always `False`.
+    """
+    above = (y >= level)
+    mask = numpy.zeros(y.shape, dtype=bool)
+    if rising:
+        numpy.logical_and(above[:, 1:], ~above[:, :-1], out=mask[:, 1:])
+    else:
+        numpy.logical_and(~above[:, 1:], above[:, :-1], out=mask[:, 1:])
+    return mask
+
+
+def _first(mask, after=None):
+    """
+    Returns the index of the first `True` value in each row of `mask`, strictly after the
+    corresponding index in `after` if given. Rows with no such value get -1.
+    """
+    if after is not None:
+        cols = numpy.arange(mask.shape[1])
+        mask = mask & (cols > after[:, None])
+    idx = numpy.argmax(mask, axis=1)
+    idx[~mask[numpy.arange(len(mask)), idx]] = -1
+    return idx
+
+
+def _last_before(mask, before):
+    """
+    Returns the index of the last `True` value in each row of `mask` at or before the corresponding
+    index in `before`. Rows with no such value (or with a negative `before`) get -1.
+    """
+    cols = numpy.where(mask, numpy.arange(mask.shape[1]), -1)
+    numpy.maximum.accumulate(cols, axis=1, out=cols)
+    idx = cols[numpy.arange(len(mask)), numpy.maximum(before, 0)]
+    idx[before < 0] = -1
+    return idx
+
+
+def _interp(y, idx, level):
+    """
+    Returns the interpolated (fractional) sample index at which each row of `y` crosses the given
+    level between samples ``idx - 1`` and ``idx``. Rows where `idx` is negative get ``nan``.
+    """
+    rows = numpy.arange(len(y))
+    valid = idx > 0
+    i = numpy.where(valid, idx, 1)
+    y0 = y[rows, i - 1]
+    y1 = y[rows, i]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        frac = (level[:, 0] - y0) / (y1 - y0)
+    return numpy.where(valid, (i - 1) + frac, numpy.nan)
+
+
+def measure_batch(records, preamble=None, method="histogram", ref_levels=DEFAULT_REF_LEVELS, bins=256):
+    """
+    Computes all `MEASUREMENTS` for a batch of records at once. Returns a dictionary mapping each
+    measurement name to a `numpy.ndarray` of values, one per record.
+
+    :param records:     Either a 2-D array of raw curves (one record per row) which all share the given
+        `preamble`, or a sequence of `~pytek.waveform.Waveform` objects with the same number of
+        points (in which case each record is scaled according to its own preamble).
+
+    :param dict preamble:   The waveform preamble used to scale raw curves. Required if `records` is
+        an array of raw curves, otherwise it must be `None`.
+
+    :param str method:  Optional, how **high** and **low** are determined, either ``"histogram"``
+        (the default) or ``"minmax"``. See the module documentation for details.
+
+    :param ref_levels:  Optional, a sequence of three percentages giving the low, mid and high
+        reference levels. The default is ``(10, 50, 90)``.
+
+    :param int bins:    Optional, the number of histogram bins for the ``"histogram"`` method.
+        The default of 256 matches the resolution of an 8-bit curve.
+    """
+    y, x_incr = _batch_params(records, preamble)
+    dt = x_incr[:, 0]
+    rows = len(y)
+
+    ymax = y.max(axis=1, keepdims=True)
+    ymin = y.min(axis=1, keepdims=True)
+    mean = y.mean(axis=1)
+    rms = numpy.sqrt(numpy.einsum("ij,ij->i", y, y) / y.shape[1])
+
+    if method == "histogram":
+        high, low = _histogram_levels(y, ymin, ymax, bins)
+    elif method == "minmax":
+        high, low = ymax[:, 0], ymin[:, 0]
+    else:
+        raise ValueError("Unknown method for high and low: %r" % method)
+    amplitude = high - low
+
+    lo_pct, mid_pct, hi_pct = ref_levels
+    lo_ref = (low + amplitude * (lo_pct / 100.0))[:, None]
+    mid_ref = (low + amplitude * (mid_pct / 100.0))[:, None]
+    hi_ref = (low + amplitude * (hi_pct / 100.0))[:, None]
+
+    mid_rising = _crossings(y, mid_ref, True)
+    mid_falling = _crossings(y, mid_ref, False)
+
+    #Period, from the first two rising crossings of the mid reference.
+    r1 = _first(mid_rising)
+    r2 = _first(mid_rising, after=numpy.where(r1 < 0, y.shape[1], r1))
+    period = (_interp(y, r2, mid_ref) - _interp(y, r1, mid_ref)) * dt
+
+    #Widths, from the first crossing of the mid reference in each direction to the next crossing.
+    f1 = _first(mid_falling)
+    pwidth = (_interp(y, _first(mid_falling, after=numpy.where(r1 < 0, y.shape[1], r1)), mid_ref) - _interp(y, r1, mid_ref)) * dt
+    nwidth = (_interp(y, _first(mid_rising, after=numpy.where(f1 < 0, y.shape[1], f1)), mid_ref) - _interp(y, f1, mid_ref)) * dt
+
+    #Rise time: first rising crossing of the high ref, back to the last rising crossing of the low ref.
+    hi_r = _first(_crossings(y, hi_ref, True))
+    lo_r = _last_before(_crossings(y, lo_ref, True), hi_r)
+    rise = (_interp(y, hi_r, hi_ref) - _interp(y, lo_r, lo_ref)) * dt
+
+    #Fall time: first falling crossing of the low ref, back to the last falling crossing of the high ref.
+    lo_f = _first(_crossings(y, lo_ref, False))
+    hi_f = _last_before(_crossings(y, hi_ref, False), lo_f)
+    fall = (_interp(y, lo_f, lo_ref) - _interp(y, hi_f, hi_ref)) * dt
+
+    ymax = ymax[:, 0]
+    ymin = ymin[:, 0]
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        safe_amplitude = numpy.where(amplitude > 0, amplitude, numpy.nan)
+        return {
+            "max": ymax,
+            "min": ymin,
+            "pk2pk": ymax - ymin,
+            "high": high,
+            "low": low,
+            "amplitude": amplitude,
+            "mean": mean,
+            "rms": rms,
+            "povershoot": (ymax - high) / safe_amplitude * 100.0,
+            "novershoot": (low - ymin) / safe_amplitude * 100.0,
+            "period": period,
+            "frequency": 1.0 / period,
+            "rise": rise,
+            "fall": fall,
+            "pwidth": pwidth,
+            "nwidth": nwidth,
+            "pduty": pwidth / period * 100.0,
+            "nduty": nwidth / period * 100.0,
+        }
+
+
+def measure(wfm, preamble=None, **kwargs):
+    """
+    Computes all `MEASUREMENTS` for a single record. Returns a dictionary mapping each
+    measurement name to a `float` value.
+
+    :param wfm:     The record to measure, either a `~pytek.waveform.Waveform`, or a raw curve
+        as from `TDS3k.get_curve <pytek.TDS3k.get_curve>`, in which case `preamble` is required.
+
+    :param dict preamble:   The waveform preamble used to scale a raw curve.
+
+    All other keyword arguments are passed to `measure_batch`.
+    """
+    if not isinstance(wfm, Waveform):
+        wfm = Waveform(wfm, preamble)
+    return dict((k, float(v[0])) for k, v in measure_batch([wfm], **kwargs).items())
+
@@ -0,0 +1,227 @@
+"""
+Provides the `PersistenceHistogram` class, the host-side equivalent of infinite persistence
+on the device's display: a 2-D histogram of time versus voltage, accumulated over any number of
+acquisitions.
+
+Each incoming record is binned straight into a fixed size grid of integer counts, so memory use
+doesn't depend on the number of records, and records are not kept. The time axis of the grid is
+mapped from each record's preamble (``xzero`` and ``x_incr``), and can optionally be folded on a
+unit interval to build an eye diagram from a serial data signal.
+
+The column of the grid for each sample of a record depends only on the record's time base, so
+it is computed once and reused for every record with the same time base. Binning a record then
+takes one vectorized pass to compute the voltage bins, and a single `numpy.bincount`.
+
+Example:
+
+>>> from pytek.persistence import PersistenceHistogram
+>>>
+>>> eye = PersistenceHistogram(shape=(256, 400), y_range=(-0.5, 3.8), unit_interval=1e-6, unit_intervals=2)
+>>> for i in xrange(1000):
+...     eye.add(tds.get_waveform_array())
+...
+>>> eye.grid.shape
+(256, 400)
+>>> eye.grid.sum()
+10000000
+>>>
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, see `pytek.waveform`.
+
+"""
+
+import numpy
+
+from .waveform import Waveform
+
+
+class PersistenceHistogram(object):
+    """
+    Accumulates a 2-D histogram of the points of many waveform records. Rows of the `grid`
+    correspond to Y values (e.g., voltage), increasing with the row index, and columns correspond
+    to X values (e.g., time), increasing with the column index.
+
+    .. attribute:: grid
+
+        The 2-D `numpy.ndarray` of counts, with shape ``(rows, columns)``.
+
+    .. attribute:: count
+
+        The number of records accumulated.
+
+    .. attribute:: dropped
+
+        The number of points which fell outside of the grid and were not counted.
+
+    .. attribute:: x_range
+
+        The range ``(start, stop)`` of X values covered by the grid. If the histogram is folded on a
+        unit interval, this is relative to the start of the unit interval.
+
+    .. attribute:: y_range
+
+        The range ``(bottom, top)`` of Y values covered by the grid.
+
+    """
+
+    def __init__(self, shape=(256, 500), y_range=None, x_range=None,
+            unit_interval=None, unit_intervals=2, phase=0.0, dtype=numpy.uint32):
+        """
+        :param shape:   Optional, the shape of the grid, as ``(rows, columns)``. The default is 256 rows
+            (one per code of an 8-bit curve) by 500 columns.
+
+        :param y_range: Optional, the range ``(bottom, top)`` of Y values covered by the grid. The default
+            is the full range of codes of the first record (from one division below the screen to one
+            division above it), scaled according to its preamble.
+
+        :param x_range: Optional, the range ``(start, stop)`` of X values covered by the grid. The default
+            is the span of the first record, or the span of the displayed unit intervals if `unit_interval`
+            is given.
+
+        :param float unit_interval: Optional, if given, X values are folded onto this interval (e.g., one bit
+            period of a serial data signal) to build an eye diagram: each X value is taken relative to the
+            start of the unit interval it falls in.
+
+        :param int unit_intervals:  Optional, the number of consecutive unit intervals shown across the grid
+            when folding. The default is 2, which shows a complete eye with half an interval on either side.
+
+        :param float phase: Optional, the X value of the start of a unit interval, for folding. For a
+            centered eye, this should be half a unit interval before a data transition.
+
+        :param dtype:   Optional, the integer type used for counts. The default is `numpy.uint32`.
+        """
+        self.grid = numpy.zeros(shape, dtype=dtype)
+        self.y_range = None if y_range is None else tuple(map(float, y_range))
+        self.x_range = None if x_range is None else tuple(map(float, x_range))
+        self.unit_interval = unit_interval
+        self.unit_intervals = unit_intervals
+        self.phase = phase
+        if unit_interval is not None and x_range is None:
+            self.x_range = (0.0, float(unit_interval) * unit_intervals)
+
+        self.count = 0
+        self.dropped = 0
+        self.__timebase = None
+        self.__columns = None
+
+    @property
+    def shape(self):
+        return self.grid.shape
+
+    @property
+    def x_edges(self):
+        """
+        A `numpy.ndarray` of the X values of the edges of the columns of the grid.
+        """
+        return numpy.linspace(self.x_range[0], self.x_range[1], self.shape[1] + 1)
+
+    @property
+    def y_edges(self):
+        """
+        A `numpy.ndarray` of the Y values of the edges of the rows of the grid.
+        """
+        return numpy.linspace(self.y_range[0], self.y_range[1], self.shape[0] + 1)
+
+    def __column_map(self, length, xzero, x_incr):
+        """
+        Returns the grid column for each sample index of a record with the given time base, or -1
+        for samples outside of the grid. This is cached for the most recent time base.
+        """
+        timebase = (length, xzero, x_incr)
+        if timebase == self.__timebase:
+            return self.__columns
+
+        #Samples which fall (within rounding error) on the edge of a column or unit interval
+        # are put in the column to the right of the edge.
+        eps = 1e-6
+        x = xzero + numpy.arange(length) * x_incr
+        if self.unit_interval is not None:
+            span = self.unit_interval * self.unit_intervals
+            u = (x - self.phase) / span
+            x = (u - numpy.floor(u + eps)) * span
+        if self.x_range is None:
+            self.x_range = (xzero, xzero + length * x_incr)
+
+        x0, x1 = self.x_range
+        cols = numpy.floor((x - x0) * (self.shape[1] / (x1 - x0)) + eps).astype(numpy.intp)
+        cols[(cols < 0) | (cols >= self.shape[1])] = -1
+
+        self.__timebase = timebase
+        self.__columns = cols
+        return cols
+
+    def add(self, wfm, preamble=None):
+        """
+        Adds a record to the histogram.
+
+        :param wfm:     The record, either a `~pytek.waveform.Waveform`, or a raw curve as from
+            `TDS3k.get_curve <pytek.TDS3k.get_curve>`, in which case `preamble` is required.
+
+        :param dict preamble:   The waveform preamble used to scale a raw curve.
+        """
+        if not isinstance(wfm, Waveform):
+            wfm = Waveform(wfm, preamble)
+        self.add_batch(wfm.curve, wfm.preamble)
+
+    def add_batch(self, curves, preamble):
+        """
+        Adds a batch of records which share the same preamble, given as a 2-D array of raw
+        curves (one record per row).
+        """
+        curves = numpy.array(curves, ndmin=2, copy=False)
+        scale = Waveform((), preamble)
+        if self.y_range is None:
+            width = int(preamble.get("bytes_per_sample", 2 if curves.max() > 0xFF else 1))
+            self.y_range = (float(scale.to_y(0)), float(scale.to_y(1 << (8 * width))))
+
+        rows, columns = self.shape
+        cols = self.__column_map(curves.shape[1], scale.xzero, scale.x_incr)
+
+        #Convert codes directly to fractional rows: row = (code - c0) * k
+        y0, y1 = self.y_range
+        k = scale.y_scale * rows / (y1 - y0)
+        c0 = scale.to_codes(y0)
+        ybins = numpy.floor((curves - c0) * k + 1e-6).astype(numpy.intp)
+
+        valid = (ybins >= 0) & (ybins < rows) & (cols >= 0)
+        flat = ybins
+        flat *= columns
+        flat += cols
+        counts = numpy.bincount(flat[valid], minlength=rows * columns)
+        self.grid += counts.reshape(rows, columns).astype(self.grid.dtype, copy=False)
+
+        self.count += len(curves)
+        self.dropped += int(valid.size - numpy.count_nonzero(valid))
+
+    def merge(self, other):
+        """
+        Adds the counts of another histogram with the same shape and ranges to this one.
+        """
+        if other.shape != self.shape or other.x_range != self.x_range or other.y_range != self.y_range:
+            raise ValueError("Cannot merge histograms with different shapes or ranges.")
+        self.grid += other.grid
+        self.count += other.count
+        self.dropped += other.dropped
+
+    def reset(self):
+        """
+        Clears all counts.
+        """
+        self.grid[...] = 0
+        self.count = 0
+        self.dropped = 0
+
+    def intensity(self, log=False):
+        """
+        Returns the grid as a `numpy.ndarray` of floating point intensities between 0 and 1,
+        relative to the most populated bin, for display. If `log` is `True`, intensities are
+        logarithmic, which better shows rare events.
+        """
+        grid = self.grid.astype(numpy.float64)
+        if log:
+            grid = numpy.log1p(grid)
+        peak = grid.max()
+        return grid / peak if peak else grid
+
@@ -0,0 +1,203 @@
+"""
+Provides declarative configuration profiles: a `Profile` gives the values of a set of settings,
+by the names of the `~pytek.util.Configurator` methods of a device class (e.g., `~pytek.TDS3k`),
+and can be loaded from JSON or YAML files.
+
+Applying a profile only sends the settings which differ from the current state of the device.
+The current state is taken from a *shadow model*: a mapping of setting names to raw values,
+such as from `TDS3k.snapshot <pytek.TDS3k.snapshot>` or the device's settings cache (see
+`~pytek.util.Configurable.enable_settings_cache`). The changed settings are sent in an order
+which respects their dependencies (see the `after` parameter of `~pytek.util.Configurator`),
+in a single `~pytek.util.Configurable.batch`. If the same shadow model is passed to each
+`Profile.apply`, it's kept up to date, so switching between similar profiles only costs
+the settings which differ between them.
+
+Example:
+
+.. code:: json
+
+    {
+        "acquire_single": true,
+        "trigger_auto": false,
+        "measurement_source": "CH1",
+        "acquire_state": true
+    }
+
+>>> from pytek.profile import Profile
+>>>
+>>> profile = Profile.load(TDS3k, "single_shot.json")
+>>> shadow = tds.snapshot()
+>>> profile.apply(tds, shadow)
+OrderedDict([('acquire_single', True), ('acquire_state', True)])
+>>> profile.apply(tds, shadow)
+OrderedDict()
+>>>
+
+YAML profiles require `PyYAML <http://pyyaml.org/>`_.
+
+"""
+
+from collections import OrderedDict
+import json
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+class Profile(object):
+    """
+    The values of a set of settings of a device class, to be applied to devices of that class.
+    """
+
+    def __init__(self, device_class, settings):
+        """
+        :param device_class:    The class of the devices the profile is for, which must use
+            `~pytek.util.Configurator.ConfigurableMeta` (e.g., by extending `~pytek.util.Configurable`).
+
+        :param settings:    A mapping (or sequence of pairs) of the names of `~pytek.util.Configurator`
+            methods of the class to the values to configure them with, as would be passed to the methods.
+
+        Raises a `ValueError` if any of the names are not settings of the class, or are read-only
+        settings (see `~pytek.util.Configurator.readonly`), or the dependencies between the settings
+        are circular.
+        """
+        self.device_class = device_class
+        self.settings = OrderedDict(settings)
+        configurators = getattr(device_class, "configurators", {})
+        unknown = [name for name in self.settings if name not in configurators]
+        if unknown:
+            raise ValueError("Not settings of %s: %s" % (device_class.__name__, ", ".join(unknown)))
+        readonly = [name for name in self.settings if configurators[name].readonly]
+        if readonly:
+            raise ValueError("Read-only settings of %s: %s" % (device_class.__name__, ", ".join(readonly)))
+        self.__order = self.__sort()
+
+    def __sort(self):
+        """
+        Orders the settings so each comes after the settings it depends on, otherwise keeping the
+        order they were given in.
+        """
+        configurators = self.device_class.configurators
+        order = []
+        visiting = set()
+
+        def visit(name):
+            if name in order:
+                return
+            if name in visiting:
+                raise ValueError("Circular dependency between settings: %s" % name)
+            visiting.add(name)
+            for dependency in configurators[name].after:
+                if dependency in self.settings:
+                    visit(dependency)
+            visiting.discard(name)
+            order.append(name)
+
+        for name in self.settings:
+            visit(name)
+        return order
+
+    def __len__(self):
+        return len(self.settings)
+
+    @property
+    def order(self):
+        """
+        The names of the settings, in the order they are applied.
+        """
+        return list(self.__order)
+
+    @classmethod
+    def from_json(cls, device_class, text):
+        """
+        Creates a profile from a JSON object, mapping setting names to values.
+        """
+        return cls(device_class, json.loads(text, object_pairs_hook=OrderedDict))
+
+    @classmethod
+    def from_yaml(cls, device_class, text):
+        """
+        Creates a profile from a YAML mapping of setting names to values. Requires PyYAML.
+        """
+        if yaml is None:
+            raise ImportError("YAML profiles require PyYAML, which could not be imported.")
+        return cls(device_class, yaml.safe_load(text) or {})
+
+    @classmethod
+    def load(cls, device_class, path):
+        """
+        Loads a profile from a file: YAML if its extension is ``.yaml`` or ``.yml``, otherwise JSON.
+        """
+        with open(path, "r") as ifile:
+            text = ifile.read()
+        if path.lower().endswith((".yaml", ".yml")):
+            return cls.from_yaml(device_class, text)
+        return cls.from_json(device_class, text)
+
+    def to_json(self):
+        """
+        Returns the profile as a JSON object, in the form read by `from_json`.
+        """
+        return json.dumps(self.settings, indent=4)
+
+    def shadow(self, device):
+        """
+        Returns a shadow model of the device's current state for `diff` and `apply`, with as few
+        round trips as possible: if the device's settings cache has values for all of the settings
+        in the profile, they are used, without any round trips. Otherwise, the device's ``snapshot``
+        method is used if it has one, otherwise the model is empty, so every setting is sent.
+        """
+        configs = [self.device_class.configurators[name] for name in self.settings]
+        cache = getattr(device, "settings_cache", None)
+        if cache is not None:
+            shadow = dict((c.name, cache.get(c.name, c.ttl)) for c in configs)
+            if None not in shadow.values():
+                return shadow
+        if hasattr(device, "snapshot"):
+            return device.snapshot()
+        return {}
+
+    def diff(self, device, shadow=None):
+        """
+        Returns an `~collections.OrderedDict` of the settings in the profile which differ from the
+        shadow model of the device, in the order they are to be applied.
+
+        :param device:  The device, needed by the settings' filters.
+
+        :param shadow:  Optional, a mapping of setting names (e.g., ``"ACQUIRE:STOPAFTER"``) to raw
+            values, such as returned by `TDS3k.snapshot <pytek.TDS3k.snapshot>`. By default, the model
+            is made with `shadow`.
+
+        Values are compared as the device's methods would return them (e.g., `True` and `False` for
+        boolean settings), so differently spelled raw values which mean the same thing are equal.
+        """
+        if shadow is None:
+            shadow = self.shadow(device)
+        configurators = self.device_class.configurators
+        changes = OrderedDict()
+        for name in self.__order:
+            config = configurators[name]
+            val = self.settings[name]
+            current = shadow.get(config.name)
+            if current is None or config.get(device, current) != config.get(device, config.set(device, val)):
+                changes[name] = val
+        return changes
+
+    def apply(self, device, shadow=None):
+        """
+        Applies the profile to the device, sending only the settings which differ from the shadow model
+        (see `diff`), in a single `~pytek.util.Configurable.batch`. If a shadow model is given, it's
+        updated with the raw values sent. Returns the `~collections.OrderedDict` of the settings sent.
+        """
+        changes = self.diff(device, shadow)
+        configurators = self.device_class.configurators
+        with device.batch():
+            for name, val in changes.items():
+                getattr(device, name)(val)
+        if shadow is not None:
+            for name, val in changes.items():
+                config = configurators[name]
+                shadow[config.name] = config.set(device, val)
+        return changes
@@ -0,0 +1,280 @@
+"""
+Provides spectral analysis of waveform records on the host: windowed FFTs with amplitude
+correction, and running averages over many records.
+
+The device can display an FFT of a channel with the TDS3FFT application module, but the host
+can compute spectra of full length records (or zero padded records, for finer frequency
+spacing), and average the spectra of many acquisitions to reduce the noise floor.
+
+The frequency axis is derived from the ``x_incr`` field of each record's preamble. Windows,
+correction factors, and work buffers are computed once for each record length and reused for
+all subsequent records, so the cost per record is essentially that of the FFT itself.
+
+Example:
+
+>>> from pytek.spectrum import SpectrumAnalyzer
+>>>
+>>> analyzer = SpectrumAnalyzer(window="hanning", scaling="dbv", average="linear")
+>>> for i in xrange(100):
+...     spectrum = analyzer.process(tds.get_waveform_array())
+...
+>>> spectrum.count
+100
+>>> spectrum.peak()
+(1000.0, -3.01)
+>>>
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, see `pytek.waveform`.
+
+"""
+
+import numpy
+
+from .waveform import Waveform
+
+
+WINDOWS = {
+    "rectangular": numpy.ones,
+    "hanning": numpy.hanning,
+    "hamming": numpy.hamming,
+    "blackman": numpy.blackman,
+    "flattop": lambda n: _flattop(n),
+}
+"""
+A dictionary of the supported window functions, by name. Each value is a function which
+takes the number of points and returns the window as an array. The ``"rectangular"``,
+``"hamming"`` and ``"hanning"`` windows match those of the TDS3FFT module. ``"blackman"`` is the
+classic three term Blackman window (`numpy.blackman`), which has somewhat higher sidelobes than
+the four term Blackman-Harris window of the TDS3FFT module. The ``"flattop"`` window gives the
+most accurate amplitudes, at the cost of frequency resolution.
+"""
+
+SCALINGS = ("amplitude", "rms", "dbv", "psd")
+"""
+The supported scalings for spectrum values:
+
+*   ``"amplitude"`` - the peak amplitude of a sinusoid at each frequency, in the Y units
+    of the record (e.g., Volts).
+*   ``"rms"`` - the RMS amplitude of a sinusoid at each frequency, in the Y units of the record.
+*   ``"dbv"`` - the RMS amplitude in decibels relative to one Y unit, e.g., dBV. This is the
+    "dB" vertical scale of the TDS3FFT module.
+*   ``"psd"`` - the power spectral density, in Y units squared per Hertz (e.g., V\ :sup:`2`/Hz).
+"""
+
+AVERAGES = (None, "linear", "exponential", "peak")
+"""
+The supported averaging modes:
+
+*   `None` - no averaging, each spectrum is computed from a single record.
+*   ``"linear"`` - the (power) average of all records processed since the last reset.
+*   ``"exponential"`` - an exponentially weighted (power) average, in which the most recent
+    record has a weight of ``1/count``.
+*   ``"peak"`` - peak hold, the maximum value at each frequency over all records processed since
+    the last reset.
+"""
+
+
+def _flattop(n):
+    a = (0.21557895, 0.41663158, 0.277263158, 0.083578947, 0.006947368)
+    k = 2 * numpy.pi * numpy.arange(n) / (n - 1) if n > 1 else numpy.zeros(n)
+    return a[0] - a[1]*numpy.cos(k) + a[2]*numpy.cos(2*k) - a[3]*numpy.cos(3*k) + a[4]*numpy.cos(4*k)
+
+
+class Spectrum(object):
+    """
+    The result of a spectral analysis, as produced by `SpectrumAnalyzer.process`.
+
+    .. attribute:: frequency
+
+        A `numpy.ndarray` of the frequency of each bin, in Hertz (assuming the X units of
+        the records are seconds).
+
+    .. attribute:: values
+
+        A `numpy.ndarray` of the spectrum value at each frequency, scaled as described by `scaling`.
+
+    .. attribute:: scaling
+
+        The scaling of `values`, one of `SCALINGS`.
+
+    .. attribute:: count
+
+        The number of records which contributed to the spectrum.
+    """
+
+    def __init__(self, frequency, values, scaling, count):
+        self.frequency = frequency
+        self.values = values
+        self.scaling = scaling
+        self.count = count
+
+    def __len__(self):
+        return len(self.values)
+
+    def peak(self, dc=False):
+        """
+        Returns a tuple ``(frequency, value)`` for the largest value in the spectrum.
+        The DC bin is ignored unless `dc` is `True`.
+        """
+        start = 0 if dc else 1
+        idx = start + int(numpy.argmax(self.values[start:]))
+        return float(self.frequency[idx]), float(self.values[idx])
+
+
+class SpectrumAnalyzer(object):
+    """
+    Computes windowed and amplitude corrected spectra of waveform records, optionally averaging
+    over many records. A single analyzer can process any number of records, one at a time with
+    `process`.
+
+    Internally, the analyzer keeps the window, correction factors and work buffers for the current
+    record length, so they are only recomputed when the record length changes.
+    """
+
+    def __init__(self, window="hanning", scaling="amplitude", average=None, count=16, nfft=None, remove_dc=False):
+        """
+        :param str window:  Optional, the name of the window function applied to each record, one of the
+            keys of `WINDOWS`. The default is ``"hanning"``.
+
+        :param str scaling: Optional, how spectrum values are scaled, one of `SCALINGS`. The default
+            is ``"amplitude"``.
+
+        :param str average: Optional, the averaging mode, one of `AVERAGES`. The default is `None`,
+            meaning no averaging.
+
+        :param int count:   Optional, for ``"exponential"`` averaging, the weight of the most recent record is
+            ``1/count``. Until `count` records have been processed, the average is linear. The default is 16.
+
+        :param int nfft:    Optional, the number of points in each FFT. If larger than the record length,
+            records are zero padded, which gives finer frequency spacing. If smaller, records are truncated
+            to their first `nfft` points before the window is applied.
+            The default is `None`, meaning the length of each record.
+
+        :param bool remove_dc:  Optional, if `True`, the mean value of each record is subtracted before
+            windowing, so that a large DC component doesn't leak into the low frequency bins. The default
+            is `False`.
+        """
+        if window not in WINDOWS:
+            raise ValueError("Unknown window: %r" % window)
+        if scaling not in SCALINGS:
+            raise ValueError("Unknown scaling: %r" % scaling)
+        if average not in AVERAGES:
+            raise ValueError("Unknown averaging mode: %r" % average)
+        self.window = window
+        self.scaling = scaling
+        self.average = average
+        self.count = count
+        self.nfft = nfft
+        self.remove_dc = remove_dc
+
+        self.__length = None
+        self.__x_incr = None
+        self.reset()
+
+    def reset(self):
+        """
+        Resets the running average, so the next record processed starts a new average.
+        """
+        self.__accum = None
+        self.__n = 0
+
+    def __prepare(self, length, x_incr):
+        """
+        Computes the window, buffers and correction factors for the given record length and
+        sample interval, unless they were already computed.
+        """
+        if length == self.__length and x_incr == self.__x_incr:
+            return
+        if self.__accum is not None:
+            raise ValueError("Record length or sample interval changed during averaging, reset the analyzer first.")
+
+        nfft = self.nfft or length
+        #Truncated records are windowed over the points used, so the corrections below are those
+        # of the window actually applied.
+        win = WINDOWS[self.window](min(length, nfft)).astype(numpy.float64)
+        self.__window = win
+        self.__buffer = numpy.empty(len(win), dtype=numpy.float64)
+        self.__power = numpy.empty(nfft // 2 + 1, dtype=numpy.float64)
+        self.__frequency = numpy.fft.rfftfreq(nfft, x_incr)
+
+        #Per bin factors which convert |X|^2 into the requested scaling. For amplitude-like
+        # scalings, the coherent gain of the window is corrected so that a sinusoid's peak reads
+        # correctly. For PSD, the noise power bandwidth of the window is corrected.
+        if self.scaling == "psd":
+            factor = numpy.full(len(self.__power), 2.0 / ((1.0 / x_incr) * numpy.sum(win * win)))
+        else:
+            factor = numpy.full(len(self.__power), (2.0 / numpy.sum(win)) ** 2)
+        factor[0] /= 4.0 if self.scaling != "psd" else 2.0
+        if nfft % 2 == 0:
+            factor[-1] /= 4.0 if self.scaling != "psd" else 2.0
+        self.__factor = factor
+
+        self.__length = length
+        self.__x_incr = x_incr
+
+    def __scale(self, power):
+        """
+        Converts a scaled power spectrum (the squared amplitude, or the PSD) into the requested scaling.
+        """
+        if self.scaling == "amplitude":
+            return numpy.sqrt(power)
+        if self.scaling == "rms":
+            return numpy.sqrt(power * 0.5)
+        if self.scaling == "dbv":
+            with numpy.errstate(divide="ignore"):
+                return 10.0 * numpy.log10(power * 0.5)
+        return power.copy()
+
+    def process(self, wfm, preamble=None):
+        """
+        Processes a record, and returns the resulting `Spectrum`. If averaging is enabled, the
+        record is added to the running average and the returned spectrum is the current average.
+
+        :param wfm:     The record, either a `~pytek.waveform.Waveform`, or a raw curve as from
+            `TDS3k.get_curve <pytek.TDS3k.get_curve>`, in which case `preamble` is required.
+
+        :param dict preamble:   The waveform preamble used to scale a raw curve.
+        """
+        if not isinstance(wfm, Waveform):
+            wfm = Waveform(wfm, preamble)
+        y = wfm.y
+        self.__prepare(len(y), wfm.x_incr)
+        y = y[:len(self.__buffer)]
+
+        buf = self.__buffer
+        if self.remove_dc:
+            numpy.subtract(y, y.mean(), out=buf)
+            buf *= self.__window
+        else:
+            numpy.multiply(y, self.__window, out=buf)
+
+        spectrum = numpy.fft.rfft(buf, self.nfft or len(buf))
+        power = self.__power
+        numpy.multiply(spectrum.real, spectrum.real, out=power)
+        power += spectrum.imag * spectrum.imag
+        power *= self.__factor
+
+        self.__n += 1
+        if self.average is None:
+            result = power
+        elif self.__accum is None:
+            self.__accum = power.copy()
+            result = self.__accum
+        else:
+            accum = self.__accum
+            if self.average == "peak":
+                numpy.maximum(accum, power, out=accum)
+            else:
+                n = self.__n
+                if self.average == "exponential":
+                    n = min(n, self.count)
+                #Running mean: accum += (power - accum) / n
+                power -= accum
+                power /= n
+                accum += power
+            result = accum
+
+        return Spectrum(self.__frequency, self.__scale(result), self.scaling, self.__n if self.average else 1)
+
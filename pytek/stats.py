@@ -0,0 +1,229 @@
+"""
+Provides the `RunningStats` class, for accumulating per-point statistics over many repeated
+acquisitions without keeping the records in memory.
+
+Averaging many acquisitions of a repetitive signal is a common way to beat down noise, but
+keeping every record around to compute the mean and standard deviation afterwards makes memory
+grow with the number of records. A `RunningStats` object instead keeps only a fixed number of
+arrays, each the length of one record: the running mean, the running sum of squared deviations
+(from which the variance is derived), and the running minimum and maximum. Each record is folded
+in with a vectorized form of Welford's update, which is numerically stable even for very large
+numbers of records.
+
+Accumulators can be saved to disk and loaded again (e.g., to checkpoint a long acquisition),
+and accumulators fed from different scopes or processes can be merged into one.
+
+Example:
+
+>>> from pytek.stats import RunningStats
+>>>
+>>> stats = RunningStats()
+>>> for i in xrange(500):
+...     stats.add(tds.get_waveform_array())
+...
+>>> stats.count
+500
+>>> stats.mean
+array([-0.1612, -0.0418, ..., -0.0792])
+>>> stats.std()
+array([ 0.0401,  0.0397, ...,  0.0404])
+>>> stats.save("checkpoint.npz")
+>>>
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, see `pytek.waveform`.
+
+"""
+
+import json
+
+import numpy
+
+from .waveform import Waveform
+
+
+class RunningStats(object):
+    """
+    Accumulates the per-point count, mean, variance, minimum and maximum of a sequence of
+    waveform records, in constant memory.
+
+    All records added to an accumulator must have the same number of points and the same
+    time base (``x_incr`` and ``xzero``), but may have different vertical scaling: statistics
+    are accumulated on the scaled values of each record.
+
+    .. attribute:: count
+
+        The number of records accumulated so far.
+
+    .. attribute:: mean
+
+        A `numpy.ndarray` of the mean value at each point, or `None` if no records have been added.
+
+    .. attribute:: min
+
+        A `numpy.ndarray` of the minimum value at each point, or `None` if no records have been added.
+
+    .. attribute:: max
+
+        A `numpy.ndarray` of the maximum value at each point, or `None` if no records have been added.
+
+    .. attribute:: preamble
+
+        The waveform preamble of the first record added, which gives the time base of the statistics.
+
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = None
+        self.min = None
+        self.max = None
+        self.preamble = None
+        self.__m2 = None
+        self.__delta = None
+
+    def __len__(self):
+        return 0 if self.mean is None else len(self.mean)
+
+    def __check(self, length, preamble):
+        if self.mean is None:
+            self.mean = numpy.zeros(length)
+            self.__m2 = numpy.zeros(length)
+            self.min = numpy.full(length, numpy.inf)
+            self.max = numpy.full(length, -numpy.inf)
+            self.preamble = dict(preamble)
+            return
+        if length != len(self.mean):
+            raise ValueError("Expected records of %d points, received %d." % (len(self.mean), length))
+        for field in ("x_incr", "xzero"):
+            if preamble.get(field) != self.preamble.get(field):
+                raise ValueError("Record has a different time base (%s=%r, expected %r)." % (
+                    field, preamble.get(field), self.preamble.get(field)))
+
+    def add(self, wfm, preamble=None):
+        """
+        Adds a single record to the accumulator.
+
+        :param wfm:     The record, either a `~pytek.waveform.Waveform`, or a raw curve as from
+            `TDS3k.get_curve <pytek.TDS3k.get_curve>`, in which case `preamble` is required.
+
+        :param dict preamble:   The waveform preamble used to scale a raw curve.
+        """
+        if not isinstance(wfm, Waveform):
+            wfm = Waveform(wfm, preamble)
+        y = wfm.y
+        self.__check(len(y), wfm.preamble)
+        if self.__delta is None or len(self.__delta) != len(y):
+            self.__delta = numpy.empty(len(y))
+
+        self.count += 1
+        delta = self.__delta
+        numpy.subtract(y, self.mean, out=delta)
+        self.mean += delta / self.count
+        delta *= (y - self.mean)
+        self.__m2 += delta
+        numpy.minimum(self.min, y, out=self.min)
+        numpy.maximum(self.max, y, out=self.max)
+
+    def add_batch(self, curves, preamble):
+        """
+        Adds a batch of records which share the same preamble, given as a 2-D array of
+        raw curves (one record per row). The batch statistics are computed in one vectorized
+        pass and then merged into the accumulator, which is considerably faster than adding
+        the records one at a time.
+        """
+        curves = numpy.array(curves, ndmin=2, copy=False)
+        if not len(curves):
+            return
+        y = Waveform((), preamble).to_y(curves)
+        batch = RunningStats()
+        batch.count = len(y)
+        batch.mean = y.mean(axis=0)
+        batch.__m2 = ((y - batch.mean) ** 2).sum(axis=0)
+        batch.min = y.min(axis=0)
+        batch.max = y.max(axis=0)
+        batch.preamble = dict(preamble)
+        self.merge(batch)
+
+    def merge(self, other):
+        """
+        Merges the statistics of another `RunningStats` object into this one, as if all of the
+        records added to `other` had been added to this object. The other object is not modified.
+
+        This uses the parallel form of Welford's algorithm (due to Chan et al.), so accumulators
+        from different scopes or processes can be combined exactly.
+        """
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count = other.count
+            self.mean = other.mean.copy()
+            self.__m2 = other.__m2.copy()
+            self.min = other.min.copy()
+            self.max = other.max.copy()
+            self.preamble = dict(other.preamble)
+            return
+        self.__check(len(other.mean), other.preamble)
+
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.__m2 += other.__m2 + delta * delta * (float(self.count) * other.count / count)
+        self.mean += delta * (float(other.count) / count)
+        self.count = count
+        numpy.minimum(self.min, other.min, out=self.min)
+        numpy.maximum(self.max, other.max, out=self.max)
+
+    def variance(self, ddof=1):
+        """
+        Returns a `numpy.ndarray` of the variance at each point. By default, this is the sample
+        variance (``ddof=1``), pass ``ddof=0`` for the population variance. Points are ``nan`` if
+        there are not enough records.
+        """
+        if self.mean is None:
+            return None
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            return self.__m2 / (self.count - ddof) if self.count > ddof else numpy.full(len(self.mean), numpy.nan)
+
+    def std(self, ddof=1):
+        """
+        Returns a `numpy.ndarray` of the standard deviation at each point, see `variance`.
+        """
+        var = self.variance(ddof)
+        return None if var is None else numpy.sqrt(var)
+
+    def to_waveform(self):
+        """
+        Returns the mean as a `~pytek.waveform.Waveform` with the time base of the accumulated
+        records, and no vertical scaling (i.e., its curve is the mean in Y units).
+        """
+        preamble = dict((k, v) for k, v in self.preamble.items() if k not in ("y_scale", "y_offset", "y_zero"))
+        return Waveform(self.mean.copy(), preamble)
+
+    def save(self, ofile):
+        """
+        Saves the state of the accumulator to the given path or file-like object, in numpy's
+        ``.npz`` format. It can be loaded again with `load`.
+        """
+        if self.mean is None:
+            raise ValueError("Cannot save an empty accumulator.")
+        numpy.savez(ofile,
+            count=numpy.array(self.count), mean=self.mean, m2=self.__m2,
+            min=self.min, max=self.max, preamble=numpy.array(json.dumps(self.preamble)),
+        )
+
+    @classmethod
+    def load(cls, ifile):
+        """
+        Creates a new accumulator from state saved by `save`, in the given path or file-like object.
+        """
+        data = numpy.load(ifile)
+        stats = cls()
+        stats.count = int(data["count"])
+        stats.mean = data["mean"]
+        stats.__m2 = data["m2"]
+        stats.min = data["min"]
+        stats.max = data["max"]
+        stats.preamble = json.loads(str(data["preamble"]))
+        return stats
+
@@ -1,5 +1,8 @@
 import re
 import os
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 
 class Configurator(object):
     """
@@ -227,7 +230,7 @@ If the value is `None` (the default), then the setting is queried and the value
 is returned.
 """
 
-    def __init__(self, name, get=None, set=None, doc=None):
+    def __init__(self, name, get=None, set=None, doc=None, volatile=True, ttl=None, after=()):
         """
         :param name: Specifies the name of the setting accessed by this object.
             Should be either a `callable` object with a ``__name__`` attribute,
@@ -236,6 +239,16 @@ is returned.
         :param callable get: Optional: if given, passed to `getter`.
         :param callable set: Optional: if given, passed to `setter`.
         :param callable doc: Optional: if given, used as the value of the `doc` attribute.
+        :param bool volatile: Optional: if `True` (the default), the setting may be changed by
+            the device itself, so it is always queried. If `False`, the setting is *host-controlled*,
+            and if the device has a settings cache (see `Configurable.enable_settings_cache`),
+            queries are answered from the cache with the value last configured or queried.
+        :param float ttl: Optional: for a host-controlled setting, the most seconds a cached value
+            is used for before querying the device again. The default is `None`, to use the
+            cache's own time to live.
+        :param after: Optional: the names of the methods for other settings which must be
+            configured before this one, when they are configured together (e.g., by a
+            `~pytek.profile.Profile`).
 
         """
         if callable(name):
@@ -243,6 +256,10 @@ is returned.
         else:
             self.name = str(name)
 
+        self.volatile = volatile
+        self.ttl = ttl
+        self.after = tuple(after)
+
         self.doc = doc
         if doc is None:
             self.doc = self.DEFAULT_DOCTSTR % {'NAME': self.name}
@@ -274,8 +291,15 @@ is returned.
             This is the first arguments passed to ``send_command``.
         :param str val: The raw value to configure the setting to. This is the
             second argument passed to ``send_command``.
+
+        If the device is in a batch (see `Configurable.batch`), the setting is
+        queued in the batch instead of being sent.
         """
-        device.send_command(name, val)
+        batch = getattr(device, "settings_batch", None)
+        if batch is not None:
+            batch.append((name, val))
+        else:
+            device.send_command(name, val)
 
     @classmethod
     def query(cls, device, name):
@@ -308,11 +332,25 @@ is returned.
         The setting's value is retrieved with `query`, then filtered through the
         callable in this object's `get` attribute before being returned.
 
+        If the setting is not `volatile` and the device has a ``settings_cache``
+        (see `Configurable.enable_settings_cache`), configured and queried raw values
+        are stored in the cache, and queries are answered from it while the stored
+        value is still valid.
+
         """
+        cache = None if self.volatile else getattr(device, "settings_cache", None)
         if val is None:
             #Get it
-            return self.get(device, self.query(device, self.name))
-        self.configure(device, self.name, self.set(device, val))
+            raw = None if cache is None else cache.get(self.name, self.ttl)
+            if raw is None:
+                raw = self.query(device, self.name)
+                if cache is not None:
+                    cache.put(self.name, raw)
+            return self.get(device, raw)
+        raw = self.set(device, val)
+        self.configure(device, self.name, raw)
+        if cache is not None:
+            cache.put(self.name, raw)
 
     def create_method(self, name):
         """
@@ -328,6 +366,7 @@ is returned.
             return config(self, val)
         c.__name__ = name
         c.__doc__ = self.doc
+        c.configurator = self
         return c
 
 
@@ -397,12 +436,15 @@ is returned.
         to specify the `name` to use, as well as additional keyword arguments to
         be forwarded on to `set_boolean`.
 
+        With explicit arguments, the keyword arguments `volatile`, `ttl` and `after` are passed
+        to the constructor instead.
+
         .. seealso:
             * set_boolean
             * config
 
         """
-        c = cls(arg)
+        c = cls(arg, volatile=kwargs.pop("volatile", True), ttl=kwargs.pop("ttl", None), after=kwargs.pop("after", ()))
         if callable(arg):
             c.set_boolean(arg, **kwargs)
             return c
@@ -411,10 +453,57 @@ is returned.
             c.set_boolean(func, **kwargs)
             return c
         return wrapper
+
+    @classmethod
+    def enum(cls, arg, **kwargs):
+        """
+        A function decorator utility used to create a `Configurator` object which
+        handles enumerated settings, like `boolean` but delegating to `set_enum`.
+        With explicit arguments, the keyword arguments `volatile`, `ttl` and `after`
+        are passed to the constructor, and all others are forwarded to `set_enum`.
+
+        .. seealso:
+            * set_enum
+            * boolean
+
+        """
+        c = cls(arg, volatile=kwargs.pop("volatile", True), ttl=kwargs.pop("ttl", None), after=kwargs.pop("after", ()))
+        if callable(arg):
+            c.set_enum(arg, **kwargs)
+            return c
+
+        def wrapper(func):
+            c.set_enum(func, **kwargs)
+            return c
+        return wrapper
+
+    @classmethod
+    def numeric(cls, arg, **kwargs):
+        """
+        A function decorator utility used to create a `Configurator` object which
+        handles numeric settings, like `boolean` but delegating to `set_numeric`.
+        With explicit arguments, the keyword arguments `volatile`, `ttl` and `after`
+        are passed to the constructor, and all others (such as `range`, `step` and
+        `units`) are forwarded to `set_numeric`.
+
+        .. seealso:
+            * set_numeric
+            * boolean
+
+        """
+        c = cls(arg, volatile=kwargs.pop("volatile", True), ttl=kwargs.pop("ttl", None), after=kwargs.pop("after", ()))
+        if callable(arg):
+            c.set_numeric(arg, **kwargs)
+            return c
+
+        def wrapper(func):
+            c.set_numeric(func, **kwargs)
+            return c
+        return wrapper
         
 
     @classmethod
-    def config(cls, arg):
+    def config(cls, arg, **kwargs):
         """
 
         A function decorator utility used to create a `Configurator` object and a
@@ -491,8 +580,11 @@ is returned.
         Since at this point the ``foobar`` symbol is actually a Configurator
         object, you can use its other decorators such as `setter` and `getter`.
 
+        With explicit naming, any keyword arguments, such as `volatile`, `ttl` and `after`,
+        are passed to the constructor along with the name.
+
         """
-        c = cls(arg)
+        c = cls(arg, **kwargs)
         if callable(arg):
             c.getter(arg)
             return c
@@ -689,6 +781,219 @@ is returned.
 
         self.update_doc(func)
 
+    __MNEMONIC = re.compile(r'^([A-Z0-9]+)([a-z][a-z0-9]*)$')
+
+    def _readonly(self, device, val):
+        """
+        +++
+        This setting is read-only: configuring it raises a `TypeError`.
+        """
+        raise TypeError("The %s setting is read-only." % self.name)
+
+    @property
+    def readonly(self):
+        """
+        `True` if the setting can only be queried, i.e., its `set` filter is `_readonly`.
+        """
+        return self.set == self._readonly
+
+    def set_enum(self, func, nocase=True, strict=False, readonly=False):
+        """
+        Configures the object's `set` and `get` filters for an enumerated setting, which takes one
+        of a fixed set of values. Values are validated and canonicalized on the host, with lookup
+        tables built once by this method, so invalid values are rejected without sending anything
+        to the device.
+
+        :param callable func:   This function is called once, immediately, with no arguments. It
+            should return a sequence of sequences: one for each possible value, giving the forms
+            of that value. The first form is the *canonical* value, which is returned by queries,
+            and sent to the device when configuring. The other forms are accepted for configuring,
+            and recognized in replies from the device.
+
+            A form in *mnemonic* notation, with an upper case short form followed by the rest of the
+            long form in lower case (e.g., ``"FREQuency"``), stands for both its short (``"FREQ"``)
+            and long (``"FREQUENCY"``) forms. If it's the canonical form, queries return the short
+            form, which is how the device replies, and the long form is sent when configuring.
+
+        :param bool nocase:     Optional, default is `True`. If `True`, values are case-insensitive.
+
+        :param bool strict:     Optional, default is `False`. If `True`, the `get` filter raises a
+            `ValueError` if the device replies with an unrecognized value. Otherwise, unrecognized
+            replies are returned as they are.
+
+        :param bool readonly:   Optional, default is `False`. If `True`, the setting can only be
+            queried, and configuring it raises a `TypeError`.
+
+        The `set` filter raises a `ValueError` for any value which isn't one of the forms.
+
+        .. seealso::
+            `enum`
+        """
+        convert = (lambda val : val.lower()) if nocase else (lambda val : val)
+        replies = {}
+        commands = {}
+        values = []
+        for forms in func():
+            expanded = []
+            for form in forms:
+                match = self.__MNEMONIC.match(form)
+                if match:
+                    expanded.append((match.group(1), form.upper()))
+                    expanded.append((form.upper(), form.upper()))
+                else:
+                    expanded.append((form, form))
+            canonical, command = expanded[0]
+            values.append(canonical)
+            for form, _ in expanded:
+                replies.setdefault(convert(form), canonical)
+                commands.setdefault(convert(form), command)
+        self.values = tuple(values)
+
+        d = dict(VALS = ', '.join('``"%s"``' % v for v in values))
+
+        def g(device, val):
+            """
+            +++
+            For *queries*, returns one of the following: %(VALS)s.
+            """
+            try:
+                return replies[convert(val.strip())]
+            except KeyError:
+                if strict:
+                    raise ValueError("Unexpected value returned from device: %r" % val)
+                return val
+
+        def s(device, val):
+            """
+            +++
+            For *configuring*, accepts any of the values returned by queries, or their alternative
+            forms. Any other value raises a `ValueError`, without anything being sent to the device.
+            """
+            try:
+                return commands[convert(str(val).strip())]
+            except KeyError:
+                raise ValueError("Invalid value for %s: %r" % (self.name, val))
+
+        g.__doc__ = g.__doc__ % d
+        self.getter(g)
+        self.setter(self._readonly if readonly else s)
+        self.update_doc(func)
+
+    #: SI prefixes accepted in numeric values, and their multipliers.
+    SI_PREFIXES = {"p": 1e-12, "n": 1e-9, "u": 1e-6, "m": 1e-3, "": 1.0, "k": 1e3, "M": 1e6, "G": 1e9}
+
+    __NUMBER = re.compile(r'^\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)\s*([a-zA-Z%]*)\s*$')
+
+    def set_numeric(self, func, range=None, step=None, values=None, units=None, integer=False, readonly=False):
+        """
+        Configures the object's `set` and `get` filters for a numeric setting. Values are validated and
+        canonicalized on the host, so invalid values are rejected without sending anything to the device.
+
+        :param callable func:   The decorated function, which is only used for its docstring (see
+            `update_doc`).
+
+        :param range:   Optional, a tuple ``(minimum, maximum)`` of the values accepted for configuring,
+            inclusive. Either can be `None`, for no limit.
+
+        :param step:    Optional, the increment between accepted values, counted from the minimum (or
+            from zero if there's no minimum). Values within a millionth of a step of an accepted value
+            are rounded to it.
+
+        :param values:  Optional, a sequence of the only values accepted for configuring, for settings
+            whose values don't follow a regular step (e.g., powers of two). They are checked after
+            `range` and `step`.
+
+        :param str units:   Optional, the units of the setting (e.g., ``"s"`` or ``"V"``), which are
+            documented, and accepted after the number in string values, along with an SI prefix
+            (see `SI_PREFIXES`). E.g., with units of ``"s"``, ``"20ms"`` means ``0.02``.
+
+        :param bool integer:    Optional, default is `False`. If `True`, the value must be a whole number,
+            and queries return an `int` instead of a `float`.
+
+        :param bool readonly:   Optional, default is `False`. If `True`, the setting can only be
+            queried, and configuring it raises a `TypeError`.
+
+        Queries return ``nan`` if the device replies with ``9.9E37``, which it uses when there is no value.
+
+        .. seealso::
+            `numeric`
+        """
+        minimum, maximum = range if range is not None else (None, None)
+        choices = ", ".join(str(v) for v in values) if values is not None else None
+        d = dict(
+            UNITS = (" %s" % units) if units else "",
+            RANGE = "from %s to %s" % (
+                "-inf" if minimum is None else minimum,
+                "inf" if maximum is None else maximum),
+            STEP = (" in steps of %s" % step) if step else "",
+            VALUES = (" (only %s)" % choices) if choices is not None else "",
+        )
+        allowed = frozenset(float(v) for v in values) if values is not None else None
+
+        def parse(val):
+            if isinstance(val, basestring):
+                match = self.__NUMBER.match(val)
+                if match is None:
+                    raise ValueError("Invalid value for %s: %r" % (self.name, val))
+                number, suffix = float(match.group(1)), match.group(2)
+                if units and suffix.endswith(units):
+                    suffix = suffix[:-len(units)]
+                if suffix not in self.SI_PREFIXES:
+                    raise ValueError("Invalid units for %s: %r" % (self.name, val))
+                return number * self.SI_PREFIXES[suffix]
+            try:
+                return float(val)
+            except (TypeError, ValueError):
+                raise ValueError("Invalid value for %s: %r" % (self.name, val))
+
+        def g(device, val):
+            """
+            +++
+            For *queries*, returns the value as %(TYPE)s%(UNITS_NOTE)s.
+            """
+            val = float(val)
+            if val >= 9.9e37:
+                return float("nan")
+            return int(val) if integer else val
+
+        def s(device, val):
+            """
+            +++
+            For *configuring*, accepts numbers %(RANGE)s%(STEP)s%(VALUES)s%(UNITS)s, or strings giving
+            such a number, optionally followed by an SI prefix and the units. Any other value raises
+            a `ValueError`, without anything being sent to the device.
+            """
+            x = parse(val)
+            if x != x or x in (float("inf"), float("-inf")):
+                raise ValueError("Invalid value for %s: %r" % (self.name, val))
+            if step:
+                origin = minimum if minimum is not None else 0
+                k = (x - origin) / float(step)
+                if abs(k - round(k)) > 1e-6:
+                    raise ValueError("Value for %s must be a multiple of %s: %r" % (self.name, step, val))
+                x = origin + round(k) * step
+            if (minimum is not None and x < minimum) or (maximum is not None and x > maximum):
+                raise ValueError("Value for %s out of range (%s): %r" % (self.name, d["RANGE"], val))
+            if allowed is not None and x not in allowed:
+                raise ValueError("Value for %s must be one of %s: %r" % (self.name, choices, val))
+            if integer:
+                if x != int(x):
+                    raise ValueError("Value for %s must be a whole number: %r" % (self.name, val))
+                return str(int(x))
+            return repr(float(x))
+
+        d["TYPE"] = "an `int`" if integer else "a `float`"
+        d["UNITS_NOTE"] = (", in %s" % units) if units else ""
+        g.__doc__ = g.__doc__ % d
+        s.__doc__ = s.__doc__ % d
+        self.range = (minimum, maximum)
+        self.step = step
+        self.values = tuple(values) if values is not None else None
+        self.units = units
+        self.getter(g)
+        self.setter(self._readonly if readonly else s)
+        self.update_doc(func)
+
 
     class ConfigurableMeta(type):
         """
@@ -699,27 +1004,300 @@ is returned.
         `Configurator` in the class's dictionary, and replace it with a method
         created by the Configurator's `~Configurator.create_method` method.
 
+        It also adds a ``configurators`` attribute to the class: a `dict` mapping the name
+        of each of these methods, including those inherited from base classes, to its
+        `Configurator` object. This is the registry of the class's settings, used by
+        `~pytek.profile.Profile`.
+
         See the example code in the documentation for `Configurator` for an
         example.
         """
 
         def __new__(meta, name, bases, dct):
 
+            configurators = {}
+            for base in reversed(bases):
+                configurators.update(getattr(base, "configurators", {}))
             for attr, val in dct.items():
                 if isinstance(val, Configurator):
+                    configurators[attr] = val
                     method = val.create_method(attr)
                     #Add nicer signature to doc string.
                     method.__doc__ = ("%s([val])\n\n" % attr) + method.__doc__
                     dct[attr] = method
+            dct["configurators"] = configurators
 
             return super(Configurator.ConfigurableMeta, meta).__new__(meta, name, bases, dct)
 
 
+class DeviceError(Exception):
+    """
+    Raised when the device reports an error for commands it was sent.
+
+    .. attribute:: code
+
+        The event code reported by the device, or `None`.
+
+    .. attribute:: status
+
+        The value of the device's Standard Event Status Register, or `None`.
+    """
+
+    def __init__(self, message, code=None, status=None):
+        super(DeviceError, self).__init__(message)
+        self.code = code
+        self.status = status
+
+
+_MESSAGE_UNIT = re.compile(r'''(?:"[^"]*"|'[^']*'|[^;"'])+''')
+
+def parse_settings(response):
+    """
+    Parses a program message such as the response to a ``SET?`` or ``*LRN?`` query, a sequence of
+    commands separated by semicolons, into an `~collections.OrderedDict` mapping the full header
+    of each command (e.g., ``"ACQUIRE:STOPAFTER"``, upper case and without the leading colon) to
+    its argument string, in the order given.
+
+    Headers without a leading colon are relative to the node of the command before them, so
+    ``":ACQUIRE:STOPAFTER RUNSTOP;STATE 1"`` gives ``ACQUIRE:STOPAFTER`` and ``ACQUIRE:STATE``.
+    Common commands (starting with ``*``) are always absolute and don't change the node. Semicolons
+    and colons inside of quoted strings are left alone, and arguments are kept exactly as given,
+    including any quotes, so they can be sent back to the device as they are.
+
+    .. seealso::
+        `join_settings`
+    """
+    settings = OrderedDict()
+    node = ""
+    for unit in _MESSAGE_UNIT.findall(response.strip()):
+        unit = unit.strip()
+        if not unit:
+            continue
+        parts = unit.split(None, 1)
+        header = parts[0].upper()
+        arg = parts[1].strip() if len(parts) > 1 else ""
+        if not header.startswith("*"):
+            if header.startswith(":"):
+                header = header[1:]
+            elif node:
+                header = node + ":" + header
+            node = header.rpartition(":")[0]
+        settings[header] = arg
+    return settings
+
+def join_settings(settings, max_line=None):
+    """
+    The inverse of `parse_settings`: joins a sequence of ``(header, argument)`` pairs (or a mapping)
+    into compound commands, returned as a list of strings. Consecutive commands under the same node
+    use relative headers, to keep the commands short. If `max_line` is given, commands are split
+    between as many strings as needed to keep each of them at most `max_line` characters long
+    (unless a single command is longer).
+    """
+    if hasattr(settings, "items"):
+        settings = settings.items()
+    lines = []
+    line = []
+    length = 0
+    node = None
+    for header, arg in settings:
+        parent = None if header.startswith("*") else header.rpartition(":")[0]
+        if parent is not None and line and node and parent == node:
+            unit = header.rpartition(":")[2]
+        elif parent is not None:
+            unit = ":" + header
+        else:
+            unit = header
+        if arg:
+            unit += " " + arg
+        if line and max_line is not None and length + 1 + len(unit) > max_line:
+            lines.append(";".join(line))
+            line, length, node = [], 0, None
+            if parent is not None:
+                unit = ":" + header + (" " + arg if arg else "")
+        line.append(unit)
+        length += len(unit) + (1 if len(line) > 1 else 0)
+        if parent is not None:
+            node = parent
+    if line:
+        lines.append(";".join(line))
+    return lines
+
+
+class SettingsCache(object):
+    """
+    Raw values of a device's host-controlled settings, as last configured or queried through
+    `Configurator` methods, each with the time it was stored. See
+    `Configurable.enable_settings_cache`.
+    """
+
+    def __init__(self, ttl=None, clock=time.time):
+        """
+        :param float ttl:   Optional, the most seconds a value is used for, for settings which don't
+            give their own `~Configurator.ttl`. The default is `None`, for no limit.
+
+        :param clock:   Optional, the function used to tell the time. The default is `time.time`.
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self.__values = {}
+
+    def __len__(self):
+        return len(self.__values)
+
+    def __contains__(self, name):
+        return name.upper() in self.__values
+
+    def get(self, name, ttl=None):
+        """
+        Returns the stored raw value of the named setting, or `None` if there isn't one, or it is
+        older than `ttl` seconds (or the cache's own `ttl`, if `ttl` is `None`).
+        """
+        try:
+            val, stored = self.__values[name.upper()]
+        except KeyError:
+            return None
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None and self.clock() - stored > ttl:
+            del self.__values[name.upper()]
+            return None
+        return val
+
+    def put(self, name, val):
+        """
+        Stores the raw value of the named setting.
+        """
+        self.__values[name.upper()] = (val, self.clock())
+
+    def invalidate(self, *names):
+        """
+        Removes the stored values of the named settings, or of all settings if no names are given.
+        """
+        if not names:
+            self.__values.clear()
+        for name in names:
+            self.__values.pop(name.upper(), None)
+
+
 class Configurable(object):
     """
     Just a simple base classes that uses `~Configurator.ConfigurableMeta`
     as the metaclass.
+
+    It also provides an optional cache of settings, which is disabled by default.
     """
 
     __metaclass__ = Configurator.ConfigurableMeta
 
+    settings_cache = None
+    """
+    The `SettingsCache` used by the `Configurator` methods of host-controlled settings, or `None`
+    if the cache is disabled. See `enable_settings_cache`.
+    """
+
+    def enable_settings_cache(self, ttl=None, clock=time.time):
+        """
+        Enables caching of host-controlled (non-`~Configurator.volatile`) settings: values configured
+        through `Configurator` methods are remembered, and querying them again is answered without a
+        round trip to the device, until the cached value expires or is invalidated. Volatile settings,
+        which the device can change by itself, are always queried.
+
+        Changes made on the front panel of the device, or by sending commands directly (e.g., with
+        ``send_command``), are not seen by the cache, so call `invalidate` after making them.
+
+        Returns the new `SettingsCache`.
+
+        :param float ttl:   Optional, the most seconds a cached value is used for, for settings which
+            don't give their own. The default is `None`, for no limit.
+
+        :param clock:   Optional, the function used to tell the time. The default is `time.time`.
+        """
+        self.settings_cache = SettingsCache(ttl, clock)
+        return self.settings_cache
+
+    def disable_settings_cache(self):
+        """
+        Disables the settings cache, so all settings are queried from the device.
+        """
+        self.settings_cache = None
+
+    BATCH_MAX_LINE = 200
+    """
+    The maximum length of a single compound command line sent by `send_batch`.
+    """
+
+    settings_batch = None
+    """
+    The list of ``(name, value)`` pairs queued by `Configurator` methods during a `batch`, or `None`
+    if the device isn't in a batch.
+    """
+
+    @contextmanager
+    def batch(self):
+        """
+        A context manager for configuring several settings at once. Within the ``with`` block, the
+        `Configurator` methods queue settings instead of sending them, and on leaving the block the
+        queued settings are sent with `send_batch`, in as few compound commands as possible. If the
+        block raises an exception, nothing is sent. Nested batches are part of the outermost one.
+
+        Queued settings are stored in the settings cache right away (see `enable_settings_cache`). If
+        the block raises an exception, or sending the batch fails, they are invalidated again, so the
+        cache never holds values that weren't sent.
+
+        Example:
+
+        .. code:: python
+
+            with tds.batch():
+                tds.acquire_single(True)
+                tds.trigger_auto(False)
+                tds.acquire_state(True)
+
+        .. note::
+
+            Only *configuring* is batched: queries within the block are sent to the device right away,
+            so they don't reflect settings queued in the batch (except for host-controlled settings
+            answered from the settings cache, see `enable_settings_cache`).
+        """
+        if self.settings_batch is not None:
+            yield
+            return
+        self.settings_batch = []
+        try:
+            yield
+        except:
+            queued, self.settings_batch = self.settings_batch, None
+            if queued:
+                self.invalidate(*[name for name, val in queued])
+            raise
+        queued, self.settings_batch = self.settings_batch, None
+        if queued:
+            try:
+                self.send_batch(queued)
+            except:
+                self.invalidate(*[name for name, val in queued])
+                raise
+
+    def send_batch(self, settings):
+        """
+        Sends the settings queued by a `batch`, a list of ``(name, value)`` pairs, through ``send_command``.
+        When a setting was queued more than once, only its last value is sent. The settings are joined
+        into compound commands of at most `BATCH_MAX_LINE` characters with `join_settings`.
+
+        Subclasses can extend this to check for errors afterwards.
+        """
+        merged = OrderedDict()
+        for name, val in settings:
+            merged.pop(name, None)
+            merged[name] = val
+        for line in join_settings(merged, self.BATCH_MAX_LINE):
+            self.send_command(line)
+
+    def invalidate(self, *names):
+        """
+        Discards the cached values of the named settings (e.g., ``"ACQUIRE:STOPAFTER"``), or of all
+        settings if no names are given, so they will be queried from the device the next time.
+        Does nothing if the settings cache is disabled.
+        """
+        if self.settings_cache is not None:
+            self.settings_cache.invalidate(*names)
+
@@ -0,0 +1,133 @@
+"""
+Provides the `Waveform` class, an array based representation of a waveform captured
+from a device. Where `TDS3k.get_waveform <pytek.TDS3k.get_waveform>` produces a
+generator of ``(x, y)`` tuples, a `Waveform` keeps the raw curve data exactly as it
+was transferred from the device, along with the `waveform preamble <pytek.TDS3k.get_waveform_preamble>`
+needed to scale it. Scaled values are computed on demand, for the whole record at once.
+
+This is the form of waveform data used by the host-side analysis modules of |PYTEK|.
+
+.. note:: **Requires numpy**
+
+    This module relies on `numpy <http://www.numpy.org/>`_, which is not required by the rest of
+    |PYTEK|. You can install it with the ``numpy`` extra.
+
+"""
+
+import numpy
+
+
+class Waveform(object):
+    """
+    A waveform record: the raw curve data from the device, and the waveform preamble
+    which describes how to scale it.
+
+    Example:
+
+    >>> wfm = tds.get_waveform_array()
+    >>> wfm.curve
+    array([32768, 32512, ..., 33024], dtype=uint16)
+    >>> wfm.y
+    array([-0.16, -0.04, ..., -0.08])
+    >>> wfm.sample_rate
+    1000000.0
+    >>>
+
+    """
+
+    def __init__(self, curve, preamble=None):
+        """
+        :param curve:   The raw data points of the curve, as returned by
+            `TDS3k.get_curve <pytek.TDS3k.get_curve>`. Any sequence of integers is
+            accepted, it is converted to a `numpy.ndarray`.
+
+        :param dict preamble:   The waveform preamble for the curve, as returned by
+            `TDS3k.get_waveform_preamble <pytek.TDS3k.get_waveform_preamble>`. If `None`,
+            an empty preamble is used, meaning the curve is unscaled: one unit per sample on the
+            X axis, and one unit per code on the Y axis.
+        """
+        self.curve = numpy.asarray(curve)
+        self.preamble = dict(preamble or {})
+        self.__y = None
+
+    def __len__(self):
+        return len(self.curve)
+
+    def __repr__(self):
+        return "<%s of %d points, %s>" % (type(self).__name__, len(self), self.preamble.get("waveform_id", "no preamble"))
+
+    @property
+    def x_incr(self):
+        """
+        The time (or other X unit) between consecutive samples, from the ``x_incr`` field of
+        the preamble.
+        """
+        return float(self.preamble.get("x_incr", 1.0))
+
+    @property
+    def xzero(self):
+        """
+        The time (or other X unit) of the first sample, from the ``xzero`` field of the preamble.
+        """
+        return float(self.preamble.get("xzero", 0.0))
+
+    @property
+    def y_scale(self):
+        """
+        The Y units per code of the raw curve, from the ``y_scale`` field of the preamble.
+        """
+        return float(self.preamble.get("y_scale", 1.0))
+
+    @property
+    def y_offset(self):
+        """
+        The raw code which corresponds to `y_zero`, from the ``y_offset`` field of the preamble.
+        """
+        return float(self.preamble.get("y_offset", 0.0))
+
+    @property
+    def y_zero(self):
+        """
+        The Y value of the `y_offset` code, from the ``y_zero`` field of the preamble.
+        """
+        return float(self.preamble.get("y_zero", 0.0))
+
+    @property
+    def sample_rate(self):
+        """
+        The sample rate of the record, i.e., ``1/x_incr``.
+        """
+        return 1.0 / self.x_incr
+
+    @property
+    def x(self):
+        """
+        A `numpy.ndarray` of X values (typically times) for every point of the record.
+        This is computed each time it is accessed.
+        """
+        return self.xzero + numpy.arange(len(self.curve)) * self.x_incr
+
+    @property
+    def y(self):
+        """
+        A `numpy.ndarray` of scaled Y values (typically Volts) for every point of the record,
+        computed the same way as `TDS3k.get_waveform <pytek.TDS3k.get_waveform>` does. This is
+        computed the first time it is accessed, and cached.
+        """
+        if self.__y is None:
+            self.__y = self.to_y(self.curve)
+        return self.__y
+
+    def to_y(self, codes):
+        """
+        Scales raw codes (a scalar or an array) into Y values, based on this object's preamble.
+        """
+        return (numpy.asarray(codes, dtype=numpy.float64) - self.y_offset) * self.y_scale + self.y_zero
+
+    def to_codes(self, y):
+        """
+        The inverse of `to_y`: converts Y values into (fractional) raw codes, based on this
+        object's preamble.
+        """
+        return (numpy.asarray(y, dtype=numpy.float64) - self.y_zero) / self.y_scale + self.y_offset
+
@@ -23,6 +23,10 @@ setup(
     ],
     extras_require = {
         'serial': ["pyserial"],
+        'numpy': ["numpy"],
+        'arrow': ["numpy", "pyarrow"],
+        'scipy': ["numpy", "scipy"],
+        'yaml': ["PyYAML"],
         'dev': ["nose==1.3.7",
                 "unittest2==1.1.0",
                 "coverage==4.2",
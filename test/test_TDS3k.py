@@ -1,8 +1,16 @@
 import unittest2 as unittest
 # from unittest.mock import Mock
 from mock import Mock, call
+import math
+import os
+import shutil
+import tempfile
+
+import numpy
 
 from pytek import TDS3k
+from pytek.util import DeviceError
+from pytek.hardcopy import FormatCache
 
 
 class TestTDS3k(unittest.TestCase):
@@ -47,3 +55,248 @@ class TestTDS3k(unittest.TestCase):
 
         self.assertEqual(response, "ab")
         self.port.read.assert_has_calls([call(1), call(1), call(1)])
+
+    def test_measurement_type(self):
+        self.port.readline.return_value = "freq"
+
+        self.assertEqual(self.scope.measurement_type(), "FREQ")
+        self.port.write.assert_called_with("MEASUREMENT:IMMED:TYPE?\r")
+
+        self.scope.measurement_type("PERIOD")
+        self.port.write.assert_called_with("MEASUREMENT:IMMED:TYPE PERIOD\r")
+
+    def test_invalid_settings(self):
+        self.assertRaises(ValueError, self.scope.measurement_type, "FREQUENT")
+        self.assertRaises(ValueError, self.scope.measurement_source, "CH5")
+        self.assertRaises(ValueError, self.scope.acquire_averages, 1024)
+        self.assertRaises(ValueError, self.scope.acquire_averages, 100)
+        self.assertRaises(TypeError, self.scope.trigger_state, "ready")
+        self.assertFalse(self.port.write.called)
+
+        self.scope.measurement_source("ref2")
+        self.port.write.assert_called_with("MEASUREMENT:IMMED:SOURCE1 REF2\r")
+        self.port.readline.return_value = "CH3"
+        self.assertEqual(self.scope.measurement_source(), "CH3")
+        self.scope.acquire_averages(64)
+        self.port.write.assert_called_with("ACQUIRE:NUMAVG 64\r")
+        self.scope.acquire_averages("128")
+        self.port.write.assert_called_with("ACQUIRE:NUMAVG 128\r")
+
+    def test_trigger_state(self):
+        self.port.readline.return_value = "SAV"
+        self.assertEqual(self.scope.trigger_state(), "save")
+        self.port.write.assert_called_with("TRIGGER:STATE?\r")
+        self.port.readline.return_value = "TRIGGER"
+        self.assertEqual(self.scope.trigger_state(), "trigger")
+
+    def test_measure_immediate(self):
+        self.port.readline.return_value = "1.0E3;3.28;9.9E37"
+
+        values = self.scope.measure_immediate([("FREQ", "CH1"), ("pk2pk", "CH2"), ("RISE", "ch1")])
+
+        self.port.write.assert_called_with(
+            ":MEASUREMENT:IMMED:SOURCE1 CH1;TYPE FREQ;VALUE?;TYPE RISE;VALUE?;SOURCE1 CH2;TYPE PK2PK;VALUE?\r"
+        )
+        self.assertEqual(self.port.readline.call_count, 1)
+        self.assertEqual(values[("FREQ", "CH1")], 1000.0)
+        self.assertEqual(values[("RISE", "ch1")], 3.28)
+        self.assertTrue(math.isnan(values[("pk2pk", "CH2")]))
+
+    def test_measure_immediate_long_poll(self):
+        types = ["FREQ", "PERIOD", "PK2PK", "RISE", "FALL", "PWIDTH", "NWIDTH", "MEAN", "RMS", "AMPLITUDE"]
+        self.port.readline.side_effect = lambda: ";".join(["1.0"] * self.port.write.call_args[0][0].count("?"))
+
+        values = self.scope.measure_immediate([(t, "CH1") for t in types])
+
+        self.assertEqual(len(values), 10)
+        self.assertLessEqual(self.port.readline.call_count, 2)
+        for args, kwargs in self.port.write.call_args_list:
+            self.assertLessEqual(len(args[0]), TDS3k.MEASUREMENT_MAX_LINE + 1)
+
+    def test_measure_immediate_unknown_type(self):
+        for pair in [("BOGUS", "CH1"), ("P", "CH1"), ("FRE", "CH1"), ("FREQ", "CH9")]:
+            with self.assertRaises(ValueError):
+                self.scope.measure_immediate([("RMS", "CH1"), pair])
+        self.port.write.assert_not_called()
+
+    def test_measure_immediate_duplicates(self):
+        self.port.readline.return_value = "1.0E3"
+
+        values = self.scope.measure_immediate([("FREQ", "CH1"), ("frequency", "ch1"), ("Freq", "CH1")])
+
+        self.port.write.assert_called_with(":MEASUREMENT:IMMED:SOURCE1 CH1;TYPE FREQ;VALUE?\r")
+        self.assertEqual(values, {("FREQ", "CH1"): 1000.0, ("frequency", "ch1"): 1000.0, ("Freq", "CH1"): 1000.0})
+
+    def test_snapshot(self):
+        self.port.readline.return_value = ":ACQUIRE:STOPAFTER RUNSTOP;STATE 1;:TRIGGER:A:MODE AUTO"
+
+        setup = self.scope.snapshot()
+
+        self.port.write.assert_called_with("SET?\r")
+        self.assertEqual(list(setup.items()), [("ACQUIRE:STOPAFTER", "RUNSTOP"), ("ACQUIRE:STATE", "1"), ("TRIGGER:A:MODE", "AUTO")])
+
+    def test_restore(self):
+        self.port.readline.return_value = ":ACQUIRE:STOPAFTER RUNSTOP;STATE 1;MODE SAMPLE;:TRIGGER:A:MODE AUTO"
+        setup = self.scope.snapshot()
+        self.scope.enable_settings_cache()
+        self.scope.trigger_auto(True)
+        self.port.readline.return_value = ":ACQUIRE:STOPAFTER SEQUENCE;STATE 1;MODE AVERAGE;:TRIGGER:A:MODE NORMAL"
+        self.port.reset_mock()
+
+        changes = self.scope.restore(setup)
+
+        self.assertEqual(list(changes), ["ACQUIRE:STOPAFTER", "ACQUIRE:MODE", "TRIGGER:A:MODE"])
+        self.port.write.assert_called_with(":ACQUIRE:STOPAFTER RUNSTOP;MODE SAMPLE;:TRIGGER:A:MODE AUTO\r")
+        #One query for the current setup, one write for the changes.
+        self.assertEqual(self.port.readline.call_count, 1)
+        self.assertEqual(len([c for c in self.port.write.call_args_list if "HEADER" not in c[0][0]]), 2)
+        self.assertEqual(len(self.scope.settings_cache), 0)
+
+    def test_batch(self):
+        self.port.readline.return_value = "0;0,\"No events to report - queue empty\""
+
+        with self.scope.batch():
+            self.scope.acquire_single(True)
+            self.scope.trigger_auto(False)
+            self.scope.acquire_state(True)
+
+        writes = [c[0][0] for c in self.port.write.call_args_list if "HEADER" not in c[0][0]]
+        self.assertEqual(writes, ["*CLS;:ACQUIRE:STOPAFTER seq;:TRIGGER:A:MODE norm;:ACQUIRE:STATE 1\r", "*ESR?;:EVMSG?\r"])
+        self.assertEqual(self.port.readline.call_count, 1)
+
+    def test_batch_error(self):
+        self.scope.enable_settings_cache()
+        self.port.readline.return_value = "32;113,\"Undefined header; unrecognized command - TRIGGER:A:MODE\""
+
+        with self.assertRaises(DeviceError) as ctx:
+            with self.scope.batch():
+                self.scope.trigger_auto(False)
+        self.assertEqual(ctx.exception.code, 113)
+        self.assertEqual(ctx.exception.status, 32)
+        self.assertIn("Undefined header", str(ctx.exception))
+        self.assertNotIn("TRIGGER:A:MODE", self.scope.settings_cache)
+
+    def test_settings_cache(self):
+        self.scope.enable_settings_cache()
+        self.scope.acquire_single(True)
+        self.scope.trigger_auto(False)
+        self.assertTrue(self.scope.acquire_single())
+        self.assertFalse(self.scope.trigger_auto())
+        self.assertFalse(self.port.readline.called)
+
+        #The acquisition state can change by itself, so it's always queried.
+        self.port.readline.return_value = "0"
+        self.scope.acquire_state(True)
+        self.assertFalse(self.scope.acquire_state())
+        self.port.write.assert_called_with("ACQUIRE:STATE?\r")
+
+    def test_measure_immediate_invalidates(self):
+        self.scope.enable_settings_cache()
+        self.scope.measurement_type("FREQ")
+        self.port.readline.return_value = "1.0"
+        self.scope.measure_immediate([("PK2PK", "CH2")])
+        self.port.readline.return_value = "PK2"
+        self.assertEqual(self.scope.measurement_type(), "PK2")
+
+    def test_iter_curve(self):
+        self.port.readline.side_effect = ["3", "3", "1"]
+        #No timeouts: each window is read to the end of its block and linefeed, and no further.
+        self.port.read.side_effect = list("#13\x00\x01\x02\n#13\x03\x04\x05\n#11\x06\n")
+
+        windows = list(self.scope.iter_curve(double=False, start=1, stop=7, window=3))
+
+        self.assertEqual(windows, [(0, [0, 1, 2]), (3, [3, 4, 5]), (6, [6])])
+        self.port.write.assert_any_call("DATA:START 4\r")
+        self.port.write.assert_any_call("DATA:STOP 7\r")
+
+    def test_get_curve_block(self):
+        self.port.readline.return_value = "2"
+        self.port.read.side_effect = ["#", "2", "04", "\x01\x02\x03\x04", "\n"]
+
+        self.assertEqual(self.scope.get_curve(double=True, preamble=True), ["#204", [0x0102, 0x0304]])
+        self.port.read.assert_called_with(1)
+
+    def test_get_curve_truncated(self):
+        self.port.readline.return_value = "3"
+        self.port.read.side_effect = list("#13\x00\x01") + [""]
+        self.assertRaises(ValueError, self.scope.get_curve, double=False)
+
+    def round_trip(self, data, double):
+        self.port.reset_mock()
+        self.scope.put_waveform(2, data, {"x_incr": 1e-06, "y_scale": 0.5, "y_unit": '"V"', "x_units": "s"}, double=double)
+        #Everything is sent in a single write.
+        self.assertEqual(self.port.write.call_count, 1)
+        message = self.port.write.call_args[0][0]
+        self.assertIn(":DATA:WIDTH %d;:WFMPRE:BYT_NR %d;" % ((2, 2) if double else (1, 1)), message)
+        settings, block = message.split(":CURVE ", 1)
+        self.assertTrue(settings.startswith("DATA:DESTINATION REF2;"))
+        self.assertIn(";NR_PT %d;XINCR 1e-06;XUNIT \"s\";YMULT 0.5;YUNIT \"V\";" % len(data), settings)
+        self.assertEqual(block[-1], "\r")
+
+        #Feed the block back, as the device would send it in response to CURVE?
+        self.port.readline.return_value = str(len(data))
+        self.port.read.side_effect = list(block[:-1] + "\n") + [""]
+        return self.scope.get_curve(source="REF2", double=double)
+
+    def test_screenshot(self):
+        self.port.read.side_effect = ["B", "M\x06\0\0\0", ""]
+        progress = Mock()
+
+        data = self.scope.screenshot(fmt="BMP", progress=progress)
+
+        self.assertEqual(data, "BM\x06\0\0\0")
+        self.port.write.assert_called_with("HARDCOPY START\r")
+        self.assertEqual(progress.call_args[0][0], 6)
+        self.assertEqual(progress.call_args[0][2], 6)
+
+    def test_probe_img_formats(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            self.scope.format_cache = FormatCache(os.path.join(tmp, "hardcopy.json"))
+            #Each check queries the original format and then the new one, the identity is queried last.
+            self.port.readline.side_effect = ["RLE", "RLE", "RLE", "RLE", "RLE", "TIFF", "IDN"]
+
+            supported = self.scope.probe_img_formats(["RLE", "PNG", "TIFF"])
+
+            self.assertEqual(supported, ["RLE", "TIFF"])
+            self.assertEqual(self.scope.format_cache.supported("IDN"), ["RLE", "TIFF"])
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_screenshot_auto(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            cache = self.scope.format_cache = FormatCache(os.path.join(tmp, "hardcopy.json"))
+            cache.set_supported("IDN", ["BMP", "TIFF"])
+            self.port.readline.return_value = "IDN"
+            self.port.read.side_effect = ["B", "M\x06\0\0\0"]
+
+            self.scope.screenshot(fmt="auto")
+
+            self.port.write.assert_any_call("HARDCOPY:FORMAT TIFF\r")
+            self.assertEqual(cache.timing("IDN", "TIFF")[0], 6)
+            #The identity is only queried once.
+            self.port.read.side_effect = ["B", "M\x06\0\0\0"]
+            self.port.reset_mock()
+            self.scope.screenshot(fmt="auto")
+            self.assertFalse(self.port.readline.called)
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_put_waveform(self):
+        data = [0, 1, 255, 256, 4660, 65535]
+        self.assertEqual(self.round_trip(data, True), data)
+        self.assertEqual(self.round_trip(data[:3], False), data[:3])
+
+    def test_put_waveform_errors(self):
+        self.assertRaises(ValueError, self.scope.put_waveform, "REF5", [1, 2])
+        self.assertRaises(ValueError, self.scope.put_waveform, 1, [1, 256], double=False)
+        self.assertRaises(ValueError, self.scope.put_waveform, 1, [-1])
+        self.assertRaises(ValueError, self.scope.put_waveform, 1, [127.9], double=False)
+        self.assertRaises(ValueError, self.scope.put_waveform, 1, numpy.array([0.0, 127.9]), double=False)
+        self.assertRaises(ValueError, self.scope.put_waveform, 1, numpy.array([float("nan")]))
+        self.assertFalse(self.port.write.called)
+
+    def test_put_waveform_float(self):
+        #Whole numbers in a floating point array are sent exactly.
+        self.assertEqual(self.round_trip(numpy.array([0.0, 127.0, 65535.0]), True), [0, 127, 65535])
@@ -0,0 +1,84 @@
+import unittest2 as unittest
+from io import BytesIO
+
+import numpy
+
+from pytek.waveform import Waveform
+from pytek.archive import ArchiveWriter, ArchiveReader, encode_samples, decode_samples
+
+
+PREAMBLE = {
+    "bytes_per_sample": 2,
+    "number_of_points": 1000,
+    "x_incr": 1e-06,
+    "xzero": -0.0045,
+    "y_scale": 0.08 / 256,
+    "y_offset": 32768.0,
+    "y_zero": 0.0,
+    "waveform_id": '"Ch1, DC coupling, 2.0E0 V/div, 1.0E-3 s/div, 10000 points, Sample mode"',
+}
+
+
+def random_curve(seed, count=1000):
+    rng = numpy.random.RandomState(seed)
+    return (32768 + numpy.cumsum(rng.randint(-300, 300, count))).astype(numpy.uint16)
+
+
+class TestArchive(unittest.TestCase):
+
+    def write_archive(self, count=5, close=True, **kwargs):
+        ofile = BytesIO()
+        writer = ArchiveWriter(ofile, **kwargs)
+        for i in xrange(count):
+            writer.append(random_curve(i), PREAMBLE)
+        if close:
+            writer.close()
+        return BytesIO(ofile.getvalue())
+
+    def test_encode_decode(self):
+        for width, curve in ((2, [0, 65535, 1, 32768, 32767]), (1, [255, 0, 17, 16])):
+            data = encode_samples(curve, width)
+            self.assertEqual(list(decode_samples(data, width, len(curve))), curve)
+
+    def test_round_trip(self):
+        reader = ArchiveReader(self.write_archive())
+        self.assertEqual(len(reader), 5)
+        records = list(reader)
+        self.assertEqual(len(records), 5)
+        for i, wfm in enumerate(records):
+            self.assertIsInstance(wfm, Waveform)
+            self.assertEqual(wfm.preamble, PREAMBLE)
+            numpy.testing.assert_array_equal(wfm.curve, random_curve(i))
+
+    def test_random_access(self):
+        reader = ArchiveReader(self.write_archive(codec="bz2"))
+        numpy.testing.assert_array_equal(reader[3].curve, random_curve(3))
+        numpy.testing.assert_array_equal(reader[-1].curve, random_curve(4))
+        numpy.testing.assert_array_equal(reader[0].curve, random_curve(0))
+
+    def test_compresses(self):
+        #Noisy sine wave from an 8-bit ADC, left-aligned to 16 bits.
+        rng = numpy.random.RandomState(0)
+        codes = 128 + 100*numpy.sin(numpy.arange(10000) / 50.0) + rng.normal(0, 1, 10000)
+        curve = (codes.round().astype(numpy.uint16) << 8)
+        ofile = BytesIO()
+        with ArchiveWriter(ofile) as writer:
+            writer.append(curve, PREAMBLE)
+        self.assertLess(len(ofile.getvalue()), 2 * len(curve) / 4)
+
+    def test_unclosed_archive(self):
+        ifile = self.write_archive(close=False)
+        #Truncate part of the last record.
+        ifile = BytesIO(ifile.getvalue()[:-10])
+        reader = ArchiveReader(ifile)
+        self.assertEqual(len(reader), 4)
+        numpy.testing.assert_array_equal(reader[3].curve, random_curve(3))
+        self.assertEqual(len(list(reader)), 4)
+
+    def test_single_byte_width(self):
+        ofile = BytesIO()
+        with ArchiveWriter(ofile) as writer:
+            writer.append(Waveform([0, 255, 128, 3], {"bytes_per_sample": 1}))
+        wfm = ArchiveReader(BytesIO(ofile.getvalue()))[0]
+        self.assertEqual(wfm.curve.dtype, numpy.uint8)
+        self.assertEqual(list(wfm.curve), [0, 255, 128, 3])
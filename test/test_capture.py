@@ -0,0 +1,117 @@
+import unittest2 as unittest
+import os
+import shutil
+import tempfile
+
+import numpy
+
+from pytek.capture import CaptureService, Frame
+from test_imaging import bmp, screen
+
+
+class FakeDevice(object):
+    """
+    Returns the given hardcopies from `screenshot`, in order, repeating the last one.
+    """
+
+    def __init__(self, images):
+        self.images = list(images)
+        self.calls = []
+
+    def screenshot(self, **kwargs):
+        self.calls.append(kwargs)
+        return self.images.pop(0) if len(self.images) > 1 else self.images[0]
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestCaptureService(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def service(self, images, **kwargs):
+        self.tds = FakeDevice(images)
+        return CaptureService(self.tds, os.path.join(self.dir, "frames"), sleep=self.clock.sleep, clock=self.clock, **kwargs)
+
+    def test_unchanged(self):
+        service = self.service([b"a", b"a", b"b", b"b", b"a"], inksaver=False)
+        kept = [service.capture() for i in xrange(5)]
+        self.assertEqual([f is not None for f in kept], [True, False, True, False, True])
+        self.assertIsInstance(kept[0], Frame)
+        self.assertEqual(len(service.frames()), 3)
+        with open(service.frames()[1], "rb") as ifile:
+            self.assertEqual(ifile.read(), b"b")
+        self.assertTrue(service.frames()[0].endswith("frame-000000.bmp"))
+        self.assertEqual(self.tds.calls[0], {"fmt": "RLE", "inksaver": False})
+
+    def test_ring(self):
+        service = self.service([str(i) for i in xrange(10)], ring_size=4)
+        for i in xrange(10):
+            service.capture()
+        frames = service.frames()
+        self.assertEqual([os.path.basename(f) for f in frames], ["frame-%06d.bmp" % i for i in xrange(6, 10)])
+
+        #A new service on the same directory continues the ring, and doesn't keep the same screen again.
+        service = self.service([b"9", b"10"], ring_size=4)
+        self.assertIsNone(service.capture())
+        self.assertTrue(service.capture().path.endswith("frame-000010.bmp"))
+        self.assertEqual(len(service.frames()), 4)
+
+        service = self.service([b"11", b"12"], ring_size=1)
+        service.capture()
+        service.capture()
+        self.assertEqual([os.path.basename(f) for f in service.frames()], ["frame-000012.bmp"])
+        self.assertRaises(ValueError, self.service, [], ring_size=0)
+
+    def test_region(self):
+        first = screen(64, 48)
+        clock = first.copy()
+        clock[1:5, 50:60] = 3
+        trace = first.copy()
+        trace[20:30, 10:20] = 2
+        service = self.service([bmp(first), bmp(clock), bmp(trace)], region=(8, 48, 0, 64))
+        self.assertIsNotNone(service.capture())
+        #Only the excluded top of the screen changed.
+        self.assertIsNone(service.capture())
+        self.assertIsNotNone(service.capture())
+
+    def test_adaptive(self):
+        service = self.service([b"a", b"b", b"c"], interval=8.0, min_interval=1.0, max_interval=20.0)
+        service.run(count=8)
+        self.assertEqual(service.captures, 8)
+        #Halved while the screen changes, then grows while it doesn't.
+        self.assertEqual(self.clock.sleeps, [4.0, 2.0, 1.0, 1.5, 2.25, 3.375, 5.0625])
+        service.run(count=20)
+        self.assertEqual(service.interval, 20.0)
+
+    def test_duration(self):
+        service = self.service([b"a"], interval=10.0)
+        service.run(duration=35.0)
+        self.assertEqual(service.captures, 3)
+
+    def test_stop(self):
+        service = self.service([b"a"])
+        self.tds.screenshot = lambda **kwargs: service.stop() or b"a"
+        service.run()
+        self.assertEqual(service.captures, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
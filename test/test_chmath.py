@@ -0,0 +1,81 @@
+import unittest2 as unittest
+
+import numpy
+import numpy.testing as npt
+
+from pytek.chmath import channel, Expression
+from pytek.waveform import Waveform
+
+
+PREAMBLE = {
+    "x_incr": 0.001,
+    "xzero": 0.0,
+    "y_scale": 0.5,
+    "y_offset": 10.0,
+    "y_zero": 1.0,
+}
+
+
+class TestChannelMath(unittest.TestCase):
+
+    def setUp(self):
+        self.a = Waveform(numpy.arange(100) % 20, PREAMBLE)
+        self.b = Waveform(numpy.full(100, 14), PREAMBLE)
+
+    def test_channel(self):
+        result = channel(self.a).evaluate()
+        npt.assert_allclose(result.curve, self.a.y)
+        self.assertEqual(result.x_incr, 0.001)
+        npt.assert_allclose(result.y, self.a.y)
+        npt.assert_allclose(channel(self.a.curve, PREAMBLE).evaluate().y, self.a.y)
+
+    def test_arithmetic(self):
+        a, b = channel(self.a), channel(self.b)
+        npt.assert_allclose((a - b).evaluate().y, self.a.y - self.b.y)
+        npt.assert_allclose((a * b + 1).evaluate().y, self.a.y * self.b.y + 1)
+        npt.assert_allclose((2 - a / b).evaluate().y, 2 - self.a.y / self.b.y)
+        npt.assert_allclose((-a).evaluate().y, -self.a.y)
+        npt.assert_allclose(abs(a - 3).evaluate().y, numpy.abs(self.a.y - 3))
+        npt.assert_allclose((a ** 2).evaluate().y, self.a.y ** 2)
+        npt.assert_allclose((a * a - a * b).evaluate().y, self.a.y * self.a.y - self.a.y * self.b.y)
+        npt.assert_allclose((a + self.b).evaluate().y, self.a.y + self.b.y)
+
+    def test_lazy(self):
+        curve = numpy.zeros(100)
+        expr = channel(curve, PREAMBLE) * 2
+        self.assertIsInstance(expr, Expression)
+        curve[:] = 12
+        npt.assert_allclose(expr.evaluate().y, 4.0)
+
+    def test_out(self):
+        out = numpy.empty(100)
+        result = (channel(self.a) + channel(self.b)).evaluate(out=out)
+        self.assertIs(result.curve, out)
+        self.assertRaises(ValueError, channel(self.a).evaluate, numpy.empty(50))
+
+    def test_integrate(self):
+        ramp = channel(numpy.full(100, 12), PREAMBLE).integrate().evaluate()
+        npt.assert_allclose(ramp.y, 2.0 * 0.001 * numpy.arange(100))
+
+    def test_derivative(self):
+        wfm = Waveform(numpy.arange(100) * 2, PREAMBLE)
+        npt.assert_allclose(channel(wfm).derivative().evaluate().y, 1000.0)
+        npt.assert_allclose(channel(wfm).integrate().derivative().evaluate().y[1:-1], wfm.y[1:-1])
+
+    def test_measure(self):
+        m = (channel(self.b) - 3).measure()
+        self.assertAlmostEqual(m["mean"], 0.0)
+        self.assertAlmostEqual(m["max"], 0.0)
+
+    def test_timebase(self):
+        other = Waveform(self.b.curve, dict(PREAMBLE, xzero=0.5))
+        self.assertRaises(ValueError, lambda: channel(self.a) + channel(other))
+        shorter = Waveform(self.b.curve[:50], PREAMBLE)
+        self.assertRaises(ValueError, lambda: channel(self.a) * shorter)
+        expr = channel(self.a)
+        self.assertEqual(expr.timebase, (100, 0.001, 0.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
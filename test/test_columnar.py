@@ -0,0 +1,76 @@
+import unittest2 as unittest
+import tempfile
+import shutil
+import os
+
+import numpy
+import pyarrow
+import pyarrow.parquet
+
+from pytek.waveform import Waveform
+from pytek.columnar import to_record_batch, to_table, write_parquet, ParquetExporter
+
+
+PREAMBLE = {
+    "bytes_per_sample": 2,
+    "number_of_points": 8,
+    "waveform_id": '"Ch1, DC coupling, 2.0E0 V/div, 1.0E-3 s/div, 10000 points, Sample mode"',
+    "x_incr": 1e-06,
+    "xzero": -0.0045,
+    "y_scale": 0.08,
+    "y_offset": 128.0,
+}
+
+
+def record(i):
+    return Waveform(numpy.arange(8, dtype=numpy.uint16) + i, PREAMBLE)
+
+
+class TestColumnar(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_record_batch(self):
+        batch = to_record_batch([record(i) for i in xrange(3)])
+        self.assertEqual(batch.num_rows, 3)
+        self.assertEqual(batch.schema.field("samples").type, pyarrow.list_(pyarrow.uint16(), 8))
+        self.assertEqual(batch.schema.field("x_incr").type, pyarrow.float64())
+        self.assertEqual(batch.schema.field("number_of_points").type, pyarrow.int64())
+        self.assertEqual(batch.schema.field("waveform_id").type, pyarrow.string())
+        self.assertEqual(batch.column(0).to_pylist()[2], range(2, 10))
+        self.assertEqual(batch.to_pydict()["y_scale"], [0.08] * 3)
+        self.assertEqual(batch.to_pydict()["y_unit"], [None] * 3)
+
+    def test_single_record_no_copy(self):
+        wfm = record(0)
+        batch = to_record_batch(wfm)
+        values = batch.column(0).flatten()
+        self.assertEqual(values.buffers()[1].address, wfm.curve.ctypes.data)
+
+    def test_curve_preamble_pairs(self):
+        table = to_table([([1, 2], PREAMBLE), ([3, 4], PREAMBLE)])
+        self.assertEqual(table.num_rows, 2)
+
+    def test_mismatched_lengths(self):
+        with self.assertRaises(ValueError):
+            to_record_batch([record(0), Waveform([1, 2, 3], PREAMBLE)])
+
+    def test_parquet(self):
+        path = os.path.join(self.tmpdir, "records.parquet")
+        write_parquet([record(i) for i in xrange(3)], path)
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.to_pydict()["samples"][1], range(1, 9))
+
+    def test_parquet_exporter(self):
+        path = os.path.join(self.tmpdir, "records.parquet")
+        with ParquetExporter(path) as exporter:
+            exporter.write([record(i) for i in xrange(3)])
+            exporter.write([record(i) for i in xrange(3, 5)])
+        table = pyarrow.parquet.read_table(path)
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.to_pydict()["samples"][4], range(4, 12))
@@ -0,0 +1,103 @@
+import unittest2 as unittest
+
+import numpy
+
+from pytek.archive import ArchiveReader, ArchiveWriter
+from pytek.compare import Comparator, DiffReport
+from pytek.waveform import Waveform
+
+from io import BytesIO
+
+
+PREAMBLE = {
+    "x_incr": 1e-08,
+    "xzero": 0.0,
+    "y_scale": 0.01,
+    "y_offset": 128.0,
+    "y_zero": 0.0,
+}
+
+
+def sine(delay=0.0, length=2000, period=250.0):
+    t = numpy.arange(length)
+    return 128 + numpy.round(100 * numpy.sin(2 * numpy.pi * (t - delay) / period))
+
+
+class TestComparator(unittest.TestCase):
+
+    def setUp(self):
+        self.golden = Waveform(sine(), PREAMBLE)
+        self.comparator = Comparator(self.golden, abs_tol=0.03, max_shift=8)
+
+    def test_identical(self):
+        report = self.comparator.compare(sine(), PREAMBLE)
+        self.assertIsInstance(report, DiffReport)
+        self.assertTrue(report.passed)
+        self.assertAlmostEqual(report.shift / PREAMBLE["x_incr"], 0.0, delta=0.05)
+        self.assertLess(report.max_error, 0.01)
+        self.assertEqual(report.violations, 0)
+        self.assertIsNone(report.first_violation)
+
+    def test_subsample_alignment(self):
+        report = self.comparator.compare(Waveform(sine(3.4), PREAMBLE))
+        self.assertTrue(report.passed)
+        self.assertAlmostEqual(report.shift / PREAMBLE["x_incr"], 3.4, delta=0.1)
+
+        report = self.comparator.compare(sine(-2.7), PREAMBLE)
+        self.assertTrue(report.passed)
+        self.assertAlmostEqual(report.shift / PREAMBLE["x_incr"], -2.7, delta=0.1)
+
+    def test_no_alignment(self):
+        comparator = Comparator(self.golden, abs_tol=0.03, max_shift=0)
+        report = comparator.compare(sine(3), PREAMBLE)
+        self.assertEqual(report.shift, 0.0)
+        self.assertFalse(report.passed)
+
+    def test_violation(self):
+        curve = sine(1.0)
+        curve[1000:1010] += 20
+        report = self.comparator.compare(curve, PREAMBLE)
+        self.assertFalse(report.passed)
+        self.assertAlmostEqual(report.shift / PREAMBLE["x_incr"], 1.0, delta=0.1)
+        self.assertGreater(report.violations, 8)
+        self.assertIn(report.first_violation, (999, 1000, 1001))
+        self.assertAlmostEqual(report.max_error, 0.2, delta=0.03)
+
+    def test_relative_tolerance(self):
+        #Scaled by 5%, which only passes with a relative tolerance.
+        curve = 128 + (sine() - 128) * 1.05
+        self.assertFalse(self.comparator.compare(curve, PREAMBLE).passed)
+        comparator = Comparator(self.golden, abs_tol=0.03, rel_tol=0.06, max_shift=8)
+        self.assertTrue(comparator.compare(curve, PREAMBLE).passed)
+
+    def test_batch(self):
+        curves = numpy.array([sine(), sine(2.5), sine(5.0) + 20])
+        reports = self.comparator.compare_batch(curves, PREAMBLE)
+        self.assertEqual([r.passed for r in reports], [True, True, False])
+        self.assertEqual(reports[2].violations, 2000 - 18)
+        self.assertEqual(reports[2].first_violation, 9)
+
+    def test_archive(self):
+        buf = BytesIO()
+        with ArchiveWriter(buf) as writer:
+            for i in xrange(5):
+                curve = sine(i - 2.0)
+                if i == 3:
+                    curve[500] += 20
+                writer.append(curve.astype(numpy.uint8), PREAMBLE)
+        buf.seek(0)
+        reports = list(self.comparator.compare_many(ArchiveReader(buf), batch=2))
+        self.assertEqual([r.passed for r in reports], [True, True, True, False, True])
+        #The capture is one sample late, so its glitch lines up with the previous point of the reference.
+        self.assertEqual(reports[3].first_violation, 499)
+
+    def test_mismatch(self):
+        self.assertRaises(ValueError, self.comparator.compare, sine(length=1000), PREAMBLE)
+        preamble = dict(PREAMBLE, x_incr=2e-08)
+        self.assertRaises(ValueError, self.comparator.compare, sine(), preamble)
+        self.assertRaises(ValueError, Comparator, self.golden, max_shift=1000)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
@@ -0,0 +1,135 @@
+import unittest2 as unittest
+
+import numpy
+import numpy.testing as npt
+
+from pytek.decimate import envelope, lttb, Envelope, Pyramid, PyramidCache
+from pytek.waveform import Waveform
+
+
+PREAMBLE = {
+    "x_incr": 1e-06,
+    "xzero": -1e-03,
+    "y_scale": 0.01,
+    "y_offset": 128.0,
+    "y_zero": 0.0,
+}
+
+
+def record(length=10000):
+    t = numpy.arange(length)
+    curve = numpy.round(128 + 50 * numpy.sin(2 * numpy.pi * t / 2500.0)).astype(numpy.int64)
+    #A single point glitch.
+    curve[length * 2 // 3 + 10] = 250
+    return Waveform(curve, PREAMBLE)
+
+
+class TestEnvelope(unittest.TestCase):
+
+    def test_envelope(self):
+        wfm = record()
+        env = envelope(wfm, 100)
+        self.assertIsInstance(env, Envelope)
+        self.assertEqual(len(env.x), 100)
+        npt.assert_allclose(env.lower, wfm.y.reshape(100, 100).min(axis=1))
+        npt.assert_allclose(env.upper, wfm.y.reshape(100, 100).max(axis=1))
+        npt.assert_allclose(env.x, wfm.x.reshape(100, 100).mean(axis=1))
+        self.assertAlmostEqual(env.upper.max(), 1.22)
+
+    def test_short(self):
+        env = envelope(numpy.array([130, 120, 140]), 10, PREAMBLE)
+        npt.assert_allclose(env.lower, env.upper)
+        self.assertEqual(len(env.x), 3)
+
+    def test_uneven(self):
+        wfm = record(1000)
+        env = envelope(wfm, 7)
+        self.assertEqual(len(env.x), 7)
+        self.assertEqual(env.lower.min(), wfm.y.min())
+        self.assertEqual(env.upper.max(), wfm.y.max())
+
+    def test_empty(self):
+        empty = numpy.array([], dtype=numpy.int64)
+        self.assertRaises(ValueError, envelope, empty, 10, PREAMBLE)
+        self.assertRaises(ValueError, lttb, empty, 10, PREAMBLE)
+        self.assertRaises(ValueError, Pyramid, Waveform(empty, PREAMBLE))
+
+
+class TestLttb(unittest.TestCase):
+
+    def test_lttb(self):
+        wfm = record()
+        x, y = lttb(wfm, 500)
+        self.assertEqual(len(x), 500)
+        self.assertEqual(x[0], wfm.x[0])
+        self.assertEqual(x[-1], wfm.x[-1])
+        self.assertTrue((numpy.diff(x) > 0).all())
+        #The glitch is the most significant point in its bucket.
+        self.assertIn(1.22, numpy.round(y, 2))
+        npt.assert_allclose(y, wfm.y[numpy.round((x - wfm.xzero) / wfm.x_incr).astype(int)])
+
+    def test_short(self):
+        x, y = lttb(numpy.array([1, 2, 3]), 10, PREAMBLE)
+        self.assertEqual(len(x), 3)
+        self.assertRaises(ValueError, lttb, record(), 2)
+
+
+class TestPyramid(unittest.TestCase):
+
+    def test_whole(self):
+        wfm = record(12800)
+        pyramid = Pyramid(wfm, factor=2)
+        self.assertEqual(len(pyramid), 12800)
+        self.assertEqual(len(pyramid.levels), 14)
+        env = pyramid.envelope(100)
+        direct = envelope(wfm, 100)
+        npt.assert_allclose(env.lower, direct.lower)
+        npt.assert_allclose(env.upper, direct.upper)
+        npt.assert_allclose(env.x, direct.x)
+
+    def test_rounded(self):
+        #With buckets which don't line up with the levels, the extremes are still kept.
+        wfm = record()
+        env = Pyramid(wfm).envelope(100)
+        self.assertEqual(len(env.x), 100)
+        self.assertEqual(env.upper.max(), wfm.y.max())
+        self.assertEqual(env.lower.min(), wfm.y.min())
+        npt.assert_allclose(env.upper, envelope(wfm, 100).upper, atol=0.07)
+
+    def test_zoom(self):
+        wfm = record()
+        pyramid = Pyramid(wfm, factor=2)
+        #Zoomed in on 6400 through 6719 us after the start: 320 samples in 10 buckets.
+        env = pyramid.envelope(10, start=wfm.x[6400], stop=wfm.x[6719])
+        self.assertEqual(len(env.x), 10)
+        npt.assert_allclose(env.upper, wfm.y[6400:6720].reshape(10, 32).max(axis=1))
+        npt.assert_allclose(env.x, wfm.x[6400:6720].reshape(10, 32).mean(axis=1))
+
+        #Zoomed in further than the number of buckets.
+        env = pyramid.envelope(100, start=wfm.x[6540], stop=wfm.x[6549])
+        npt.assert_allclose(env.upper, wfm.y[6540:6550])
+
+    def test_cache(self):
+        loads = []
+
+        def loader(key):
+            loads.append(key)
+            return record()
+
+        cache = PyramidCache(loader, maxsize=2)
+        cache.envelope("a", 50)
+        cache.envelope("a", 80)
+        cache.envelope("b", 50)
+        self.assertEqual(loads, ["a", "b"])
+        cache.envelope("a", 50)
+        cache.envelope("c", 50)
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(len(cache), 2)
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
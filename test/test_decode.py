@@ -0,0 +1,169 @@
+import unittest2 as unittest
+
+import numpy
+
+from pytek.decode import UartDecoder, UartFrame, SpiDecoder, SpiWord, I2cDecoder, I2cTransaction
+
+
+PREAMBLE = {
+    "x_incr": 1e-06,
+    "xzero": 0.0,
+    "y_scale": 0.1,
+    "y_offset": 0.0,
+    "y_zero": 0.0,
+}
+
+HIGH = 33
+LOW = 0
+
+
+def levels(bits, repeat):
+    """
+    Returns a curve of codes for the given logic levels, each held for `repeat` samples.
+    """
+    return numpy.repeat(numpy.where(numpy.array(bits, dtype=bool), HIGH, LOW), repeat)
+
+
+def uart_bits(data, parity=None):
+    bits = [1, 1]
+    for value in bytearray(data):
+        frame = [(value >> k) & 1 for k in xrange(8)]
+        bits += [0] + frame
+        if parity == "even":
+            bits.append(sum(frame) % 2)
+        bits += [1, 1]
+    return bits
+
+
+class TestUart(unittest.TestCase):
+
+    def test_decode(self):
+        #10 samples per bit, at 1 us per sample.
+        curve = levels(uart_bits(b"Hi!"), 10)
+        uart = UartDecoder(baud=100000, level=1.65)
+        frames = uart.decode(curve, PREAMBLE)
+        self.assertEqual([f.value for f in frames], [ord("H"), ord("i"), ord("!")])
+        self.assertIsInstance(frames[0], UartFrame)
+        self.assertAlmostEqual(frames[0].time, 20e-06)
+        self.assertTrue(all(f.error is None for f in frames))
+
+    def test_errors(self):
+        bits = uart_bits(b"AB", parity="even")
+        bits[2 + 9] ^= 1    #Parity bit of the first frame.
+        bits[-2] = 0        #Stop bit of the second frame.
+        uart = UartDecoder(baud=100000, level=1.65, parity="even")
+        frames = uart.decode(levels(bits, 10), PREAMBLE)
+        self.assertEqual([f.error for f in frames], ["parity", "framing"])
+
+    def test_split(self):
+        curve = levels(uart_bits(b"split me"), 10)
+        whole = UartDecoder(baud=100000, level=1.65).decode(curve, PREAMBLE)
+
+        uart = UartDecoder(baud=100000, level=1.65)
+        frames = []
+        for start in xrange(0, len(curve), 137):
+            preamble = dict(PREAMBLE, xzero=start * 1e-06)
+            frames += uart.decode(curve[start:start + 137], preamble)
+        self.assertEqual([f.value for f in frames], [f.value for f in whole])
+        numpy.testing.assert_allclose([f.time for f in frames], [f.time for f in whole])
+
+
+def spi_levels(mosi, miso, bits=8, cs_gap=True):
+    """
+    Returns clk, mosi, miso and cs curves for SPI mode 0, with 4 samples per clock phase.
+    """
+    clk, d_out, d_in, cs = [0] * 2, [0] * 2, [0] * 2, [1] * 2
+    for a, b in zip(mosi, miso):
+        for k in reversed(xrange(bits)):
+            for c in (0, 1):
+                clk.append(c)
+                d_out.append((a >> k) & 1)
+                d_in.append((b >> k) & 1)
+                cs.append(0)
+        if cs_gap:
+            clk += [0, 0]
+            d_out += [0, 0]
+            d_in += [0, 0]
+            cs += [1, 1]
+    return [levels(x, 4) for x in (clk, d_out, d_in, cs)]
+
+
+class TestSpi(unittest.TestCase):
+
+    def test_decode(self):
+        clk, mosi, miso, cs = spi_levels([0xA5, 0x3C], [0x01, 0xFF])
+        words = SpiDecoder(level=1.65).decode(clk, mosi, miso, cs, preamble=PREAMBLE)
+        self.assertEqual([(w.mosi, w.miso) for w in words], [(0xA5, 0x01), (0x3C, 0xFF)])
+        self.assertIsInstance(words[0], SpiWord)
+        self.assertAlmostEqual(words[0].time, 12e-06)
+
+    def test_partial_word_dropped(self):
+        clk, mosi, miso, cs = spi_levels([0xA5], [0x00])
+        #Deassert chip select half way through the word.
+        cs[40:] = HIGH
+        words = SpiDecoder(level=1.65).decode(clk, mosi, cs=cs, preamble=PREAMBLE)
+        self.assertEqual(words, [])
+
+    def test_split(self):
+        data = range(0, 256, 17)
+        clk, mosi, miso, cs = spi_levels(data, data[::-1], cs_gap=False)
+        spi = SpiDecoder(level=1.65)
+        words = []
+        for start in xrange(0, len(clk), 50):
+            preamble = dict(PREAMBLE, xzero=start * 1e-06)
+            chunk = slice(start, start + 50)
+            words += spi.decode(clk[chunk], mosi[chunk], miso[chunk], cs[chunk], preamble=preamble)
+        self.assertEqual([w.mosi for w in words], data)
+        self.assertEqual([w.miso for w in words], data[::-1])
+
+
+def i2c_levels(transactions):
+    """
+    Returns SCL and SDA curves for the given transactions, each a list of bytes and their ACK bits.
+    """
+    scl, sda = [1, 1], [1, 1]
+    for payload in transactions:
+        #START
+        scl += [1, 1, 0]
+        sda += [1, 0, 0]
+        for value, ack in payload:
+            for bit in [(value >> k) & 1 for k in reversed(xrange(8))] + [0 if ack else 1]:
+                scl += [0, 1, 1, 0]
+                sda += [bit] * 4
+        #STOP
+        scl += [0, 1, 1, 1]
+        sda += [0, 0, 1, 1]
+    return levels(scl, 3), levels(sda, 3)
+
+
+class TestI2c(unittest.TestCase):
+
+    def test_decode(self):
+        scl, sda = i2c_levels([
+            [(0x50 << 1, True), (0x12, True), (0x34, False)],
+            [(0x50 << 1 | 1, True), (0x99, False)],
+        ])
+        trans = I2cDecoder(level=1.65).decode(scl, sda, PREAMBLE)
+        self.assertEqual(trans, [
+            I2cTransaction(9e-06, 0x50, False, (0x12, 0x34), (True, True, False)),
+            trans[1],
+        ])
+        self.assertEqual(trans[1][1:], (0x50, True, (0x99,), (True, False)))
+
+    def test_split(self):
+        scl, sda = i2c_levels([[(0x20 << 1, True)] + [(i, True) for i in xrange(10)]])
+        i2c = I2cDecoder(level=1.65)
+        trans = []
+        for start in xrange(0, len(scl), 100):
+            preamble = dict(PREAMBLE, xzero=start * 1e-06)
+            trans += i2c.decode(scl[start:start + 100], sda[start:start + 100], preamble)
+        self.assertEqual(len(trans), 1)
+        self.assertEqual(trans[0].data, tuple(xrange(10)))
+
+    def test_mismatched_channels(self):
+        self.assertRaises(ValueError, I2cDecoder(1.65).decode, numpy.zeros(10), numpy.zeros(11), PREAMBLE)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
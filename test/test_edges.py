@@ -0,0 +1,117 @@
+import unittest2 as unittest
+
+import numpy
+import numpy.testing as npt
+
+from pytek.edges import find_edges, Edges, JitterStats, Statistic
+from pytek.waveform import Waveform
+
+
+PREAMBLE = {
+    "x_incr": 1e-08,
+    "xzero": -5e-07,
+    "y_scale": 0.01,
+    "y_offset": 0.0,
+    "y_zero": 0.0,
+}
+
+
+def clock(edges, length=1000, rise=10.0):
+    """
+    A clock signal, in codes from 0 to 100, with linear edges of `rise` samples centered on
+    the given (fractional) sample indices, alternating rising and falling.
+    """
+    t = numpy.arange(length, dtype=numpy.float64)
+    y = numpy.zeros(length)
+    for i, e in enumerate(edges):
+        ramp = numpy.clip((t - e) / rise + 0.5, 0, 1)
+        y += ramp if i % 2 == 0 else -ramp
+    return 100 * y
+
+
+class TestFindEdges(unittest.TestCase):
+
+    def test_interpolated(self):
+        edges = find_edges(clock([100.25, 300.5, 500.75]), level=0.5, preamble=PREAMBLE)
+        self.assertIsInstance(edges, Edges)
+        npt.assert_allclose(edges.times, -5e-07 + numpy.array([100.25, 300.5, 500.75]) * 1e-08, atol=1e-12)
+        npt.assert_array_equal(edges.rising, [True, False, True])
+
+    def test_default_level(self):
+        wfm = Waveform(clock([100.25, 300.5]), PREAMBLE)
+        npt.assert_allclose(find_edges(wfm).times, -5e-07 + numpy.array([100.25, 300.5]) * 1e-08, atol=1e-12)
+
+    def test_hysteresis(self):
+        curve = clock([100.0, 300.0], rise=40.0)
+        #Noise which makes the slow edges chatter around the threshold.
+        curve[::2] += 8
+        curve[1::2] -= 8
+
+        edges = find_edges(curve, level=0.5, preamble=PREAMBLE)
+        self.assertGreater(len(edges.times), 2)
+
+        edges = find_edges(curve, level=0.5, hysteresis=0.4, preamble=PREAMBLE)
+        npt.assert_array_equal(edges.rising, [True, False])
+        npt.assert_allclose((edges.times + 5e-07) / 1e-08, [100.0, 300.0], atol=5)
+
+    def test_start_in_band(self):
+        #The record starts inside the band, so leaving it below isn't an edge.
+        edges = find_edges([0.55, 0.52, 0.3, 0, 0, 1, 1, 0], level=0.5, hysteresis=0.2, preamble={"x_incr": 1})
+        npt.assert_allclose(edges.times, [4.5, 6.5])
+        npt.assert_array_equal(edges.rising, [True, False])
+
+    def test_no_edges(self):
+        edges = find_edges(numpy.zeros(100), preamble=PREAMBLE)
+        self.assertEqual(len(edges.times), 0)
+        edges = find_edges(numpy.full(100, 60.0), level=0.5, hysteresis=0.2, preamble=PREAMBLE)
+        self.assertEqual(len(edges.times), 0)
+
+
+class TestJitterStats(unittest.TestCase):
+
+    def test_statistic(self):
+        values = numpy.random.RandomState(0).normal(3.0, 2.0, 1000)
+        stat = Statistic()
+        for chunk in numpy.split(values, 10):
+            stat.add(chunk)
+        self.assertEqual(stat.count, 1000)
+        self.assertAlmostEqual(stat.mean, values.mean())
+        self.assertAlmostEqual(stat.std(), values.std(ddof=1))
+        self.assertEqual(stat.pk2pk, values.max() - values.min())
+        self.assertTrue(numpy.isnan(Statistic().std()))
+
+    def test_jitter(self):
+        rng = numpy.random.RandomState(1)
+        stats = JitterStats()
+        for acq in xrange(20):
+            jitter = rng.uniform(-0.5, 0.5, 20)
+            rising = 20 + 40.0 * numpy.arange(20) + jitter
+            edges = numpy.sort(numpy.concatenate([rising, rising + 20]))
+            stats.add(clock(edges, length=820, rise=4.0), level=0.5, preamble=PREAMBLE)
+
+        self.assertEqual(stats.acquisitions, 20)
+        self.assertEqual(stats.period.count, 20 * 19)
+        self.assertEqual(stats.cycle_to_cycle.count, 20 * 18)
+        self.assertAlmostEqual(stats.period.mean, 40e-08, delta=1e-10)
+        self.assertLess(stats.tie.max, 0.7e-08)
+        self.assertGreater(stats.tie.max, 0.3e-08)
+        self.assertAlmostEqual(stats.tie.mean, 0.0, delta=1e-12)
+
+    def test_nominal_and_merge(self):
+        edges = Edges(numpy.array([0.0, 1.0, 2.1, 3.0, 4.0]), numpy.ones(5, dtype=bool))
+        a = JitterStats(nominal_period=1.0)
+        a.add(edges)
+        npt.assert_allclose([a.tie.min, a.tie.max], [-0.02, 0.08])
+        self.assertAlmostEqual(a.period.max, 1.1)
+
+        b = JitterStats(nominal_period=1.0)
+        b.add(edges)
+        b.add(Edges(numpy.array([0.0]), numpy.ones(1, dtype=bool)))
+        a.merge(b)
+        self.assertEqual(a.acquisitions, 2)
+        self.assertEqual(a.period.count, 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
@@ -0,0 +1,101 @@
+import unittest2 as unittest
+
+import numpy
+import numpy.testing as npt
+
+from pytek.filters import FirFilter, IirFilter
+from pytek.waveform import Waveform
+
+
+PREAMBLE = {
+    "x_incr": 1e-06,
+    "xzero": 0.0,
+    "y_scale": 0.01,
+    "y_offset": 128.0,
+    "y_zero": 0.0,
+}
+
+
+def tone(freq, length=4000):
+    """
+    Raw codes for a sine wave of the given frequency, at 1 MS/s.
+    """
+    t = numpy.arange(length) * 1e-06
+    return numpy.round(128 + 100 * numpy.sin(2 * numpy.pi * freq * t))
+
+
+class FilterTests(object):
+
+    def create(self, kind="lowpass", cutoff=20e3, **kwargs):
+        raise NotImplementedError()
+
+    def test_lowpass(self):
+        lowpass = self.create()
+        npt.assert_allclose(lowpass.process(tone(1e3), PREAMBLE).y[2000:].std(), 1 / numpy.sqrt(2), rtol=0.02)
+        lowpass.reset()
+        self.assertLess(lowpass.process(tone(200e3), PREAMBLE).y[2000:].std(), 0.01)
+
+    def test_highpass(self):
+        highpass = self.create("highpass", 50e3)
+        self.assertLess(highpass.process(tone(1e3), PREAMBLE).y[2000:].std(), 0.05)
+
+    def test_bandpass(self):
+        bandpass = self.create("bandpass", (20e3, 60e3))
+        npt.assert_allclose(bandpass.process(tone(40e3), PREAMBLE).y[2000:].std(), 1 / numpy.sqrt(2), rtol=0.05)
+        bandpass.reset()
+        self.assertLess(bandpass.process(tone(2e3), PREAMBLE).y[2000:].std(), 0.02)
+
+    def test_chunks(self):
+        curve = tone(5e3) + numpy.random.RandomState(0).randint(-10, 10, 4000)
+        whole = self.create().process(curve, PREAMBLE)
+        stream = self.create()
+        chunks = [stream.process(curve[i:i + 333], dict(PREAMBLE, xzero=i * 1e-06)) for i in xrange(0, 4000, 333)]
+        npt.assert_array_equal(numpy.concatenate([c.y for c in chunks]), whole.y)
+        self.assertEqual(chunks[1].xzero, 333 * 1e-06)
+
+    def test_prime(self):
+        dc = numpy.full(500, 228)
+        npt.assert_allclose(self.create().process(dc, PREAMBLE).y, 1.0)
+        self.assertAlmostEqual(self.create(prime=False).process(dc, PREAMBLE).y[0], 0.0, places=3)
+
+    def test_sample_rate(self):
+        lowpass = self.create()
+        lowpass.process(tone(1e3), PREAMBLE)
+        self.assertRaises(ValueError, lowpass.process, tone(1e3), dict(PREAMBLE, x_incr=2e-06))
+        lowpass.reset()
+        lowpass.process(tone(1e3), dict(PREAMBLE, x_incr=2e-06))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, self.create, "notch")
+        self.assertRaises(ValueError, self.create, "bandpass", 20e3)
+        self.assertRaises(ValueError, self.create("lowpass", 600e3).process, tone(1e3), PREAMBLE)
+
+
+class TestFirFilter(FilterTests, unittest.TestCase):
+
+    def create(self, kind="lowpass", cutoff=20e3, **kwargs):
+        return FirFilter(kind, cutoff, numtaps=151, **kwargs)
+
+    def test_design(self):
+        fir = FirFilter("lowpass", 100e3, numtaps=31)
+        fir.process(tone(1e3), PREAMBLE)
+        self.assertEqual(len(fir.design), 31)
+        self.assertAlmostEqual(fir.design.sum(), 1.0)
+        self.assertEqual(fir.delay, 15)
+        self.assertRaises(ValueError, FirFilter, "highpass", 100e3, numtaps=30)
+
+
+class TestIirFilter(FilterTests, unittest.TestCase):
+
+    def create(self, kind="lowpass", cutoff=20e3, **kwargs):
+        return IirFilter(kind, cutoff, order=6, **kwargs)
+
+    def test_types(self):
+        for ftype, kw in (("cheby1", {"rp": 1}), ("cheby2", {"rs": 60}), ("ellip", {"rp": 1, "rs": 60}), ("bessel", {})):
+            iir = IirFilter("lowpass", 20e3, ftype=ftype, **kw)
+            self.assertLess(iir.process(tone(300e3), PREAMBLE).y[2000:].std(), 0.01)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
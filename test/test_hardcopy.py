@@ -0,0 +1,190 @@
+import unittest2 as unittest
+from mock import Mock
+from io import BytesIO
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+
+from pytek.hardcopy import read_hardcopy, ImageTracker, FormatCache
+
+
+def bitmap(size):
+    return b"BM" + struct.pack("<I", size) + b"\0" * (size - 6)
+
+
+def png(width=64, height=48):
+    def chunk(ctype, data):
+        return struct.pack(">I", len(data)) + ctype + data + struct.pack(">I", zlib.crc32(ctype + data) & 0xffffffff)
+    rows = (b"\0" + bytes(bytearray(xrange(width)))) * height
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(bytes(rows))) + chunk(b"IEND", b""))
+
+
+def tiff(strips, order="<"):
+    """
+    A TIFF file with its directory at the start, followed by the given strips of data.
+    """
+    count = len(strips)
+    #Header, directory with three entries, and the strip offsets and counts, if they don't fit inline.
+    start = 8 + 2 + 3 * 12 + 4 + (8 * count if count > 1 else 0)
+    offsets = [start + sum(len(s) for s in strips[:i]) for i in xrange(count)]
+    counts = [len(s) for s in strips]
+    if count > 1:
+        offsets_value, counts_value = 50, 50 + 4 * count
+        extra = struct.pack(order + "%dI" % (2 * count), *(offsets + counts))
+    else:
+        offsets_value, counts_value = offsets[0], counts[0]
+        extra = b""
+    directory = struct.pack(order + "H", 3) + b"".join([
+        struct.pack(order + "HHII", 256, 4, 1, 64),
+        struct.pack(order + "HHII", 273, 4, count, offsets_value),
+        struct.pack(order + "HHII", 279, 4, count, counts_value),
+    ]) + struct.pack(order + "I", 0)
+    magic = b"II*\0" if order == "<" else b"MM\0*"
+    return magic + struct.pack(order + "I", 8) + directory + extra + b"".join(strips)
+
+
+class StreamPort(object):
+    """
+    A port which returns the given data, followed by trailing bytes which mustn't be read.
+    """
+
+    def __init__(self, data):
+        self.stream = BytesIO(data + b"TRAILING")
+
+    def read(self, size):
+        return self.stream.read(size)
+
+
+class TestHardcopy(unittest.TestCase):
+
+    def setUp(self):
+        self.port = Mock()
+        self.ofile = BytesIO()
+
+    def test_stream(self):
+        image = bitmap(3000)
+        self.port.read.side_effect = [b"", b""] + [image[:1], image[1:1025], image[1025:2049], image[2049:], b""]
+        calls = []
+        ticks = iter(xrange(100))
+        received = read_hardcopy(self.port, self.ofile, lambda *args: calls.append(args), clock=lambda: next(ticks))
+        self.assertEqual(received, 3000)
+        self.assertEqual(self.ofile.getvalue(), image)
+        self.assertEqual([c[0] for c in calls], [1, 1025, 2049, 3000])
+        self.assertEqual([c[2] for c in calls], [None, 3000, 3000, 3000])
+        self.assertEqual(calls[0][1], 1.0)
+        self.assertEqual(calls[-1][1], 3000 / 4.0)
+
+    def test_no_progress(self):
+        self.port.read.side_effect = [b"a", b"bcd", b""]
+        self.assertEqual(read_hardcopy(self.port, self.ofile), 4)
+        self.assertEqual(self.ofile.getvalue(), b"abcd")
+
+    def read(self, image):
+        port = StreamPort(image)
+        received = read_hardcopy(port, self.ofile, chunk_size=100)
+        self.assertEqual(received, len(image))
+        self.assertEqual(self.ofile.getvalue(), image)
+        #Stops as soon as the image is complete, without waiting for a timeout.
+        self.assertEqual(port.stream.read(), b"TRAILING")
+
+    def test_bmp_end(self):
+        self.read(bitmap(1234))
+
+    def test_png_end(self):
+        self.read(png())
+
+    def test_tiff_end(self):
+        self.read(tiff([b"\1" * 700]))
+
+    def test_tiff_strips(self):
+        self.read(tiff([b"\1" * 300, b"\2" * 300, b"\3" * 123], order=">"))
+
+    def test_png_tracker(self):
+        #Fed one byte at a time, the chunk headers are collected across feeds.
+        image = png()
+        tracker = ImageTracker()
+        for i in xrange(len(image)):
+            self.assertFalse(tracker.complete)
+            tracker.feed(image[i:i + 1])
+        self.assertEqual(tracker.total, len(image))
+        self.assertTrue(tracker.complete)
+
+    def test_tracker(self):
+        tracker = ImageTracker()
+        tracker.feed(b"II*\0")
+        self.assertIsNone(tracker.total)
+        tracker = ImageTracker()
+        for byte in bitmap(100)[:10]:
+            tracker.feed(byte)
+        self.assertEqual(tracker.total, 100)
+        self.assertEqual(tracker.received, 10)
+
+
+class TestFormatCache(unittest.TestCase):
+
+    IDN = "TEKTRONIX,TDS 3034,0,CF:91.1CT FV:v2.11"
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "pytek", "hardcopy.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_persist(self):
+        cache = FormatCache(self.path)
+        self.assertIsNone(cache.supported(self.IDN))
+        cache.set_supported(self.IDN, ["RLE", "TIFF"])
+        cache.record(self.IDN, "TIFF", 40000, 35.5)
+
+        cache = FormatCache(self.path)
+        self.assertEqual(cache.supported(self.IDN), ["RLE", "TIFF"])
+        self.assertEqual(cache.timing(self.IDN, "TIFF"), (40000, 35.5))
+        self.assertIsNone(cache.timing(self.IDN, "RLE"))
+        self.assertIsNone(cache.supported("TEKTRONIX,TDS 3012"))
+
+    def test_corrupt(self):
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, "w") as ofile:
+            ofile.write("{not json")
+        self.assertIsNone(FormatCache(self.path).supported(self.IDN))
+
+    def test_fastest(self):
+        cache = FormatCache(self.path)
+        self.assertIsNone(cache.fastest(self.IDN))
+        cache.set_supported(self.IDN, ["BMP", "TIFF", "RLE", "EPSON"])
+        #Untimed: the expected fastest.
+        self.assertEqual(cache.fastest(self.IDN), "RLE")
+        #Slower formats aren't chosen just because they haven't been timed.
+        cache.record(self.IDN, "RLE", 38000, 40.0)
+        self.assertEqual(cache.fastest(self.IDN), "RLE")
+        cache.record(self.IDN, "TIFF", 30000, 31.0)
+        self.assertEqual(cache.fastest(self.IDN), "TIFF")
+        #A bigger screenshot takes longer, but at the same throughput.
+        cache.record(self.IDN, "RLE", 76000, 80.0)
+        self.assertEqual(cache.fastest(self.IDN), "TIFF")
+        cache.record(self.IDN, "RLE", 76000, 60.0)
+        self.assertEqual(cache.fastest(self.IDN), "RLE")
+        cache.set_supported(self.IDN, ["EPSON"])
+        self.assertIsNone(cache.fastest(self.IDN))
+
+    def test_record_writes(self):
+        cache = FormatCache(self.path)
+        self.assertTrue(cache.record(self.IDN, "RLE", 38000, 40.0))
+        mtime = os.path.getmtime(self.path)
+        os.utime(self.path, (mtime - 100, mtime - 100))
+        #Within the tolerance: the stored timing is kept, and the file isn't written.
+        self.assertFalse(cache.record(self.IDN, "RLE", 40000, 41.0))
+        self.assertFalse(cache.record(self.IDN, "RLE", 1000, 0.0))
+        self.assertEqual(os.path.getmtime(self.path), mtime - 100)
+        self.assertEqual(cache.timing(self.IDN, "RLE"), (38000, 40.0))
+        self.assertAlmostEqual(cache.throughput(self.IDN, "RLE"), 950.0)
+        self.assertTrue(cache.record(self.IDN, "RLE", 38000, 20.0))
+        self.assertEqual(FormatCache(self.path).timing(self.IDN, "RLE"), (38000, 20.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+import unittest2 as unittest
+import struct
+import zlib
+
+import numpy
+import numpy.testing as npt
+
+from pytek.imaging import decode_image, decode_bmp, decode_pcx, decode_tiff, encode_png, transcode_png
+
+
+PALETTE = numpy.array([(0, 0, 0), (255, 255, 255), (255, 200, 0), (0, 160, 255)], dtype=numpy.uint8)
+
+
+def screen(width=40, height=30):
+    """
+    Palette indices of a small image: a white frame around a black background, with a yellow trace.
+    """
+    indices = numpy.zeros((height, width), dtype=numpy.uint8)
+    indices[0] = indices[-1] = indices[:, 0] = indices[:, -1] = 1
+    x = numpy.arange(1, width - 1)
+    indices[(height // 2 + (height // 3) * numpy.sin(x / 3.0)).astype(int), x] = 2
+    indices[3, 5:9] = [3, 2, 3, 2]
+    return indices
+
+
+def bmp(indices, compression=0, bits=8, palette=PALETTE):
+    """
+    A bottom-up Windows bitmap of the given palette indices.
+    """
+    height, width = indices.shape
+    if compression == 1:
+        body = b""
+        for row in indices[::-1]:
+            #Absolute mode for the first four pixels, then runs.
+            body += b"\0\x04" + row[:4].tobytes()
+            x = 4
+            while x < width:
+                run = 1
+                while x + run < width and row[x + run] == row[x] and run < 255:
+                    run += 1
+                body += struct.pack("BB", run, row[x])
+                x += run
+            body += b"\0\0"
+        body += b"\0\x01"
+    elif bits == 24:
+        rows = palette[indices][::-1, :, ::-1].reshape(height, -1)
+        stride = (width * 3 + 3) // 4 * 4
+        body = numpy.hstack((rows, numpy.zeros((height, stride - width * 3), dtype=numpy.uint8))).tobytes()
+    else:
+        stride = (width + 3) // 4 * 4
+        body = numpy.hstack((indices[::-1], numpy.zeros((height, stride - width), dtype=numpy.uint8))).tobytes()
+    table = b"" if bits == 24 else numpy.hstack((palette[:, ::-1], numpy.zeros((len(palette), 1), dtype=numpy.uint8))).tobytes()
+    offset = 14 + 40 + len(table)
+    header = b"BM" + struct.pack("<IHHI", offset + len(body), 0, 0, offset)
+    info = struct.pack("<IiiHHIIiiII", 40, width, height, 1, bits, compression, len(body), 0, 0, 0 if bits == 24 else len(palette), 0)
+    return header + info + table + body
+
+
+def pcx(indices, palette=PALETTE):
+    """
+    A run length encoded, 256 color PCX image of the given palette indices.
+    """
+    height, width = indices.shape
+    line = width + (width & 1)
+    body = bytearray()
+    for row in indices:
+        row = list(row) + [0] * (line - width)
+        x = 0
+        while x < line:
+            run = 1
+            while x + run < line and row[x + run] == row[x] and run < 63:
+                run += 1
+            if run > 1 or row[x] >= 0xC0:
+                body += bytearray([0xC0 | run, row[x]])
+            else:
+                body.append(row[x])
+            x += run
+    header = struct.pack("<BBBBHHHHHH", 10, 5, 1, 8, 0, 0, width - 1, height - 1, 72, 72)
+    header += b"\0" * 48 + b"\0" + struct.pack("<BHH", 1, line, 1)
+    header += b"\0" * (128 - len(header))
+    table = numpy.zeros((256, 3), dtype=numpy.uint8)
+    table[:len(palette)] = palette
+    return header + bytes(body) + b"\x0C" + table.tobytes()
+
+
+def packbits(data):
+    out = bytearray()
+    i = 0
+    while i < len(data):
+        run = 1
+        while i + run < len(data) and data[i + run] == data[i] and run < 128:
+            run += 1
+        if run > 1:
+            out += bytearray([257 - run, data[i]])
+        else:
+            out += bytearray([0, data[i]])
+        i += run
+    return bytes(out)
+
+
+def tiff(indices, compression=1, palette=PALETTE):
+    """
+    A big endian, palette TIFF image of the given palette indices, in strips of 8 rows.
+    """
+    height, width = indices.shape
+    strips = [indices[i:i + 8].tobytes() for i in xrange(0, height, 8)]
+    if compression == 32773:
+        strips = [packbits(bytearray(s)) for s in strips]
+    colormap = numpy.zeros((3, 256), dtype=numpy.uint16)
+    colormap[:, :len(palette)] = palette.T.astype(numpy.uint16) * 257
+    entries = [(256, 3, 1, width), (257, 3, 1, height), (258, 3, 1, 8), (259, 3, 1, compression), (262, 3, 1, 3),
+        (273, 4, len(strips), None), (277, 3, 1, 1), (279, 4, len(strips), None), (320, 3, 768, None)]
+    ifd_size = 2 + 12 * len(entries) + 4
+    extra_offset = 8 + ifd_size
+    offsets_at = extra_offset
+    counts_at = offsets_at + 4 * len(strips)
+    colormap_at = counts_at + 4 * len(strips)
+    data_at = colormap_at + 2 * 768
+    offsets = [data_at + sum(len(s) for s in strips[:i]) for i in xrange(len(strips))]
+    pointers = {273: offsets_at, 279: counts_at, 320: colormap_at}
+    ifd = struct.pack(">H", len(entries))
+    for tag, vtype, count, value in entries:
+        if value is None:
+            ifd += struct.pack(">HHII", tag, vtype, count, pointers[tag])
+        else:
+            ifd += struct.pack(">HHIHH", tag, vtype, count, value, 0)
+    ifd += struct.pack(">I", 0)
+    extra = struct.pack(">%dI" % len(strips), *offsets) + struct.pack(">%dI" % len(strips), *[len(s) for s in strips])
+    extra += colormap.astype(">u2").tobytes()
+    return b"MM\0*" + struct.pack(">I", 8) + ifd + extra + b"".join(strips)
+
+
+def read_png(data):
+    """
+    Decodes the pixels of a PNG image from `encode_png` (unfiltered, 8 bit) as an array of RGB pixels.
+    """
+    pos, chunks = 8, {}
+    while pos < len(data):
+        length, ctype = struct.unpack_from(">I4s", data, pos)
+        chunks[ctype] = chunks.get(ctype, b"") + data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+    width, height, depth, ctype = struct.unpack_from(">IIBB", chunks[b"IHDR"])
+    channels = {0: 1, 2: 3, 3: 1}[ctype]
+    raw = numpy.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=numpy.uint8).reshape(height, -1)
+    assert not raw[:, 0].any()
+    pixels = raw[:, 1:].reshape(height, width, channels)
+    if ctype == 3:
+        palette = numpy.frombuffer(chunks[b"PLTE"], dtype=numpy.uint8).reshape(-1, 3)
+        return palette[pixels[:, :, 0]]
+    return pixels
+
+
+class TestDecode(unittest.TestCase):
+
+    def setUp(self):
+        self.indices = screen()
+        self.expected = PALETTE[self.indices]
+
+    def test_bmp(self):
+        npt.assert_array_equal(decode_bmp(bmp(self.indices)), self.expected)
+        npt.assert_array_equal(decode_bmp(bmp(self.indices, bits=24)), self.expected)
+
+    def test_bmp_rle8(self):
+        data = bmp(self.indices, compression=1)
+        npt.assert_array_equal(decode_image(data), self.expected)
+
+    def test_bmp_rle4(self):
+        #Two rows of 6 pixels: a run, an absolute run of 3, then a delta past the rest of the image.
+        body = b"\x03\x12" + b"\0\x03\x32\x10" + b"\0\0" + b"\x02\x33" + b"\0\x02\x02\x05" + b"\0\x01"
+        info = struct.pack("<IiiHHIIiiII", 40, 6, 2, 1, 4, 2, len(body), 0, 0, 4, 0)
+        table = numpy.hstack((PALETTE[:, ::-1], numpy.zeros((4, 1), dtype=numpy.uint8))).tobytes()
+        data = b"BM" + struct.pack("<IHHI", 70 + len(body), 0, 0, 70) + info + table + body
+        expected = numpy.array([[3, 3, 0, 0, 0, 0], [1, 2, 1, 3, 2, 1]])
+        npt.assert_array_equal(decode_image(data), PALETTE[expected])
+
+    def test_pcx(self):
+        npt.assert_array_equal(decode_pcx(pcx(self.indices)), self.expected)
+        #Literal bytes which look like counts must be encoded as runs.
+        indices = numpy.array([[0xC1, 0xC1, 0xC5, 1, 0xFF, 2]], dtype=numpy.uint8)
+        palette = numpy.arange(768, dtype=numpy.uint8).reshape(256, 3)
+        npt.assert_array_equal(decode_image(pcx(indices, palette)), palette[indices])
+
+    def test_tiff(self):
+        npt.assert_array_equal(decode_tiff(tiff(self.indices)), self.expected)
+        npt.assert_array_equal(decode_image(tiff(self.indices, compression=32773)), self.expected)
+
+    def test_unsupported(self):
+        self.assertRaises(ValueError, decode_image, b"\x89PNG\r\n\x1a\n")
+        self.assertRaises(ValueError, decode_bmp, bmp(self.indices)[:2] + b"\0" * 100)
+
+
+class TestPng(unittest.TestCase):
+
+    def test_palette(self):
+        pixels = PALETTE[screen()]
+        png = encode_png(pixels)
+        self.assertIn(b"PLTE", png)
+        npt.assert_array_equal(read_png(png), pixels)
+
+    def test_rgb(self):
+        pixels = numpy.random.RandomState(0).randint(0, 256, (20, 30, 3)).astype(numpy.uint8)
+        npt.assert_array_equal(read_png(encode_png(pixels)), pixels)
+
+    def test_gray(self):
+        gray = numpy.arange(600, dtype=numpy.uint8).reshape(20, 30)
+        npt.assert_array_equal(read_png(encode_png(gray))[:, :, 0], gray)
+
+    def test_transcode(self):
+        data = bmp(screen(), compression=1)
+        npt.assert_array_equal(read_png(transcode_png(data)), PALETTE[screen()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest2 as unittest
+
+import numpy
+
+from pytek.mask import Mask
+
+
+PREAMBLE = {
+    "number_of_points": 100,
+    "x_incr": 1e-06,
+    "xzero": 0.0,
+    "y_scale": 0.1,
+    "y_offset": 128.0,
+    "y_zero": 0.0,
+}
+
+
+class FakeDevice(object):
+    def __init__(self, curve):
+        self.curve = curve
+        self.windows = 0
+
+    def iter_curve(self, source="CH1", double=True, start=1, stop=10000, window=1000):
+        for first in xrange(start - 1, stop, window):
+            self.windows += 1
+            yield first - start + 1, list(self.curve[first:min(first + window, stop)])
+
+
+class TestMask(unittest.TestCase):
+
+    def setUp(self):
+        #Limits at +/- 1 V (codes 138 and 118), and a square forbidden around 50 us, 0 V.
+        self.mask = Mask(upper=1.0, lower=-1.0, polygons=[
+            [(40e-6, -0.5), (60e-6, -0.5), (60e-6, 0.5), (40e-6, 0.5)],
+        ])
+        self.compiled = self.mask.compile(PREAMBLE)
+        #A pulse that stays out of the forbidden square.
+        self.good = numpy.full(100, 128)
+        self.good[30:70] = 136
+
+    def test_compile(self):
+        self.assertEqual(len(self.compiled), 100)
+        numpy.testing.assert_allclose(self.compiled.upper, 138.0)
+        numpy.testing.assert_allclose(self.compiled.lower, 118.0)
+        idx, bottom, top = self.compiled.regions[0]
+        self.assertEqual(list(idx), range(40, 61))
+        numpy.testing.assert_allclose(bottom, 123.0)
+        numpy.testing.assert_allclose(top, 133.0)
+
+    def test_limits(self):
+        self.assertTrue(self.compiled.test(self.good).passed)
+        bad = self.good.copy()
+        bad[10] = 139
+        bad[90:92] = 117
+        result = self.compiled.test(bad)
+        self.assertFalse(result.passed)
+        self.assertEqual(result.violations, 3)
+        self.assertEqual(result.first_violation, 10)
+        self.assertEqual(result.points_tested, 100)
+
+    def test_polygon(self):
+        bad = self.good.copy()
+        bad[45:47] = 128
+        result = self.compiled.test(bad)
+        self.assertEqual((result.passed, result.violations, result.first_violation), (False, 2, 45))
+
+    def test_triangle(self):
+        mask = Mask(polygons=[[(0.0, 0.0), (10e-6, 1.0), (20e-6, 0.0)]]).compile(PREAMBLE)
+        idx, bottom, top = mask.regions[0]
+        numpy.testing.assert_allclose(mask.regions[0][2][[0, 5, 10, 15, 20]] - 128, [0, 5, 10, 5, 0])
+        numpy.testing.assert_allclose(bottom, 128)
+
+    def test_interpolated_limits(self):
+        mask = Mask(upper=[0.0, 1.0], x=[0.0, 99e-6]).compile(PREAMBLE)
+        numpy.testing.assert_allclose(mask.upper[[0, 99]], [128, 138])
+        numpy.testing.assert_array_equal(mask.lower, -numpy.inf)
+
+    def test_batch(self):
+        bad = self.good.copy()
+        bad[50] = 128
+        numpy.testing.assert_array_equal(self.compiled.test_batch([self.good, bad, self.good]), [True, False, True])
+
+    def test_partial(self):
+        result = self.compiled.test(self.good[40:60], offset=40)
+        self.assertTrue(result.passed)
+        result = self.compiled.test(numpy.full(20, 128), offset=40)
+        self.assertEqual(result.first_violation, 40)
+
+    def test_stream_early_abort(self):
+        bad = self.good.copy()
+        bad[25] = 200
+        device = FakeDevice(bad)
+        result = self.compiled.stream_test(device, window=20)
+        self.assertEqual(result, (False, 1, 25, 40))
+        self.assertEqual(device.windows, 2)
+
+        device = FakeDevice(self.good)
+        self.assertEqual(self.compiled.stream_test(device, window=20), (True, 0, None, 100))
+        self.assertEqual(device.windows, 5)
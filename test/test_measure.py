@@ -0,0 +1,75 @@
+import unittest2 as unittest
+
+import numpy
+
+from pytek.waveform import Waveform
+from pytek.measure import measure, measure_batch, MEASUREMENTS
+
+
+PREAMBLE = {
+    "x_incr": 1e-06,
+    "xzero": 0.0,
+    "y_scale": 0.01,
+    "y_offset": 128.0,
+    "y_zero": 0.0,
+}
+
+
+def trapezoid(count=2000, period=500, high_len=150, ramp=50, low_code=28, high_code=228):
+    """
+    A periodic trapezoid wave of raw codes: rises over `ramp` samples, stays high for `high_len`,
+    falls over `ramp` samples and stays low for the rest of the period.
+    """
+    shape = numpy.concatenate([
+        numpy.linspace(0.0, 1.0, ramp, endpoint=False),
+        numpy.ones(high_len),
+        numpy.linspace(1.0, 0.0, ramp, endpoint=False),
+        numpy.zeros(period - high_len - 2*ramp),
+    ])
+    shape = numpy.roll(numpy.tile(shape, count // period), 100)
+    return low_code + (high_code - low_code) * shape
+
+
+class TestMeasure(unittest.TestCase):
+
+    def test_trapezoid(self):
+        m = measure(Waveform(trapezoid(), PREAMBLE))
+        self.assertEqual(set(m), set(MEASUREMENTS))
+        self.assertAlmostEqual(m["high"], 1.0, delta=0.01)
+        self.assertAlmostEqual(m["low"], -1.0, delta=0.01)
+        self.assertAlmostEqual(m["pk2pk"], 2.0)
+        self.assertAlmostEqual(m["period"], 500e-6, delta=1e-9)
+        self.assertAlmostEqual(m["frequency"], 2000.0, delta=0.01)
+        self.assertAlmostEqual(m["rise"], 40e-6, delta=1e-6)
+        self.assertAlmostEqual(m["fall"], 40e-6, delta=1e-6)
+        self.assertAlmostEqual(m["pwidth"], 200e-6, delta=1e-6)
+        self.assertAlmostEqual(m["nwidth"], 300e-6, delta=1e-6)
+        self.assertAlmostEqual(m["pduty"], 40.0, delta=0.5)
+
+    def test_rms_and_mean(self):
+        t = numpy.arange(10000)
+        curve = 128 + 100 * numpy.sin(2 * numpy.pi * t / 1000.0)
+        m = measure(curve, PREAMBLE, method="minmax")
+        self.assertAlmostEqual(m["mean"], 0.0, places=6)
+        self.assertAlmostEqual(m["rms"], 1.0 / numpy.sqrt(2), places=6)
+        self.assertAlmostEqual(m["amplitude"], 2.0, places=3)
+        self.assertAlmostEqual(m["frequency"], 1000.0, delta=0.01)
+
+    def test_undefined(self):
+        m = measure(numpy.full(100, 128), PREAMBLE)
+        self.assertTrue(numpy.isnan(m["period"]))
+        self.assertTrue(numpy.isnan(m["rise"]))
+        self.assertEqual(m["pk2pk"], 0.0)
+
+    def test_empty(self):
+        self.assertRaises(ValueError, measure, numpy.array([], dtype=int), PREAMBLE)
+        self.assertRaises(ValueError, measure, Waveform([], PREAMBLE))
+        self.assertRaises(ValueError, measure_batch, [])
+
+    def test_batch_matches_single(self):
+        curves = numpy.array([trapezoid(), numpy.roll(trapezoid(), 37), trapezoid(high_code=200)])
+        batch = measure_batch(curves, PREAMBLE)
+        for i, curve in enumerate(curves):
+            single = measure(curve, PREAMBLE)
+            for name in MEASUREMENTS:
+                self.assertAlmostEqual(batch[name][i], single[name])
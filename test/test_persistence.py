@@ -0,0 +1,60 @@
+import unittest2 as unittest
+
+import numpy
+
+from pytek.waveform import Waveform
+from pytek.persistence import PersistenceHistogram
+
+
+PREAMBLE = {
+    "bytes_per_sample": 1,
+    "x_incr": 1e-06,
+    "xzero": 0.0,
+    "y_scale": 0.1,
+    "y_offset": 128.0,
+    "y_zero": 0.0,
+}
+
+
+class TestPersistence(unittest.TestCase):
+
+    def test_default_axes(self):
+        hist = PersistenceHistogram(shape=(256, 100))
+        curve = numpy.arange(100) + 50
+        hist.add(curve, PREAMBLE)
+        hist.add(Waveform(curve, PREAMBLE))
+        self.assertEqual(hist.count, 2)
+        self.assertEqual(hist.dropped, 0)
+        self.assertEqual(hist.grid.sum(), 200)
+        self.assertAlmostEqual(hist.y_range[0], -12.8)
+        self.assertAlmostEqual(hist.y_range[1], 12.8)
+        self.assertAlmostEqual(hist.x_range[1], 100e-6)
+        for i in xrange(100):
+            self.assertEqual(hist.grid[curve[i], i], 2)
+
+    def test_y_range_and_dropped(self):
+        hist = PersistenceHistogram(shape=(10, 10), y_range=(0.0, 1.0))
+        #Codes 128 through 137 are 0.0 V through 0.9 V, code 140 is out of range.
+        hist.add_batch([[128, 129, 130, 131, 132, 133, 134, 135, 137, 140]], PREAMBLE)
+        self.assertEqual(hist.dropped, 1)
+        self.assertEqual(list(numpy.argmax(hist.grid[:, :9], axis=0)), [0, 1, 2, 3, 4, 5, 6, 7, 9])
+
+    def test_eye_folding(self):
+        #A clock with a period of 10 samples (10 us), folded on a 5 us unit interval over two intervals.
+        curve = numpy.tile([108] * 5 + [148] * 5, 100)
+        eye = PersistenceHistogram(shape=(2, 10), y_range=(-4.0, 4.0), unit_interval=5e-6, unit_intervals=2)
+        eye.add(curve, PREAMBLE)
+        self.assertEqual(eye.x_range, (0.0, 10e-6))
+        numpy.testing.assert_array_equal(eye.grid, [[100] * 5 + [0] * 5, [0] * 5 + [100] * 5])
+
+    def test_merge(self):
+        a = PersistenceHistogram(shape=(4, 4), y_range=(-1, 1), x_range=(0, 4e-6))
+        b = PersistenceHistogram(shape=(4, 4), y_range=(-1, 1), x_range=(0, 4e-6))
+        a.add([128, 128, 128, 128], PREAMBLE)
+        b.add([125, 126, 129, 140], PREAMBLE)
+        a.merge(b)
+        self.assertEqual(a.count, 2)
+        self.assertEqual(a.grid.sum(), 7)
+        self.assertEqual(a.dropped, 1)
+        with self.assertRaises(ValueError):
+            a.merge(PersistenceHistogram(shape=(4, 5)))
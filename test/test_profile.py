@@ -0,0 +1,114 @@
+import unittest2 as unittest
+from mock import Mock
+import os
+import shutil
+import tempfile
+
+from pytek import TDS3k
+from pytek.util import Configurator, Configurable
+from pytek.profile import Profile
+
+
+class Device(Configurable):
+
+    def __init__(self, state):
+        self.state = state
+        self.send_command = Mock()
+        self.snapshot = Mock(side_effect=lambda: dict(self.state))
+
+    @Configurator.boolean("ACQUIRE:STATE", nocase=True, after=("single", "mode"))
+    def running(flag):
+        if flag:
+            return ("1", "ON", "RUN")
+        return ("0", "OFF", "STOP")
+
+    @Configurator.boolean("ACQUIRE:STOPAFTER", nocase=True, volatile=False)
+    def single(flag):
+        if flag:
+            return ("SEQ", "SEQUENCE")
+        return ("RUNST", "RUNSTOP")
+
+    @Configurator.config("ACQUIRE:MODE", volatile=False)
+    def mode(self, val):
+        return val.upper()
+
+    @Configurator.config("ACQUIRE:NUMAVG", volatile=False, after=("mode",))
+    def averages(self, val):
+        return int(val)
+
+
+STATE = {"ACQUIRE:STATE": "0", "ACQUIRE:STOPAFTER": "RUNSTOP", "ACQUIRE:MODE": "SAMPLE", "ACQUIRE:NUMAVG": "16"}
+
+
+class TestProfile(unittest.TestCase):
+
+    def setUp(self):
+        self.dev = Device(STATE)
+
+    def test_registry(self):
+        self.assertEqual(sorted(Device.configurators), ["averages", "mode", "running", "single"])
+        self.assertEqual(Device.configurators["single"].name, "ACQUIRE:STOPAFTER")
+        self.assertIs(Device.single.configurator, Device.configurators["single"])
+
+    def test_order(self):
+        profile = Profile(Device, [("running", True), ("averages", 64), ("mode", "AVERAGE"), ("single", True)])
+        self.assertEqual(profile.order, ["single", "mode", "running", "averages"])
+        self.assertRaises(ValueError, Profile, Device, {"frobbed": True})
+
+    def test_readonly(self):
+        self.assertTrue(TDS3k.configurators["trigger_state"].readonly)
+        self.assertFalse(TDS3k.configurators["measurement_type"].readonly)
+        with self.assertRaises(ValueError):
+            Profile(TDS3k, [("acquire_single", True), ("trigger_state", "ready")])
+
+    def test_diff(self):
+        profile = Profile(Device, [("running", False), ("single", True), ("mode", "sample"), ("averages", 16)])
+        self.assertEqual(list(profile.diff(self.dev)), ["single"])
+        self.assertEqual(self.dev.snapshot.call_count, 1)
+        #Settings the shadow model doesn't have are sent.
+        self.assertEqual(list(profile.diff(self.dev, {})), profile.order)
+
+    def test_apply(self):
+        profile = Profile(Device, [("running", True), ("single", True), ("mode", "SAMPLE")])
+        shadow = self.dev.snapshot()
+        changes = profile.apply(self.dev, shadow)
+        self.assertEqual(list(changes.items()), [("single", True), ("running", True)])
+        self.dev.send_command.assert_called_once_with(":ACQUIRE:STOPAFTER seq;STATE 1")
+        self.assertEqual(shadow["ACQUIRE:STOPAFTER"], "seq")
+
+        #Applying it again, or a similar profile, only sends the delta.
+        self.dev.send_command.reset_mock()
+        self.assertEqual(profile.apply(self.dev, shadow), {})
+        self.assertFalse(self.dev.send_command.called)
+        other = Profile(Device, [("running", True), ("single", True), ("mode", "AVERAGE")])
+        other.apply(self.dev, shadow)
+        self.dev.send_command.assert_called_once_with(":ACQUIRE:MODE AVERAGE")
+
+    def test_cache_shadow(self):
+        self.dev.enable_settings_cache()
+        self.dev.single(True)
+        self.dev.mode("SAMPLE")
+        profile = Profile(Device, [("single", True), ("mode", "SAMPLE")])
+        self.assertEqual(profile.diff(self.dev), {})
+        self.assertFalse(self.dev.snapshot.called)
+
+    def test_load(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, "profile.json")
+            with open(path, "w") as ofile:
+                ofile.write('{"single": true, "mode": "AVERAGE", "averages": 64}')
+            profile = Profile.load(Device, path)
+            self.assertEqual(list(profile.settings.items()), [("single", True), ("mode", "AVERAGE"), ("averages", 64)])
+            self.assertEqual(Profile.from_json(Device, profile.to_json()).settings, profile.settings)
+
+            path = os.path.join(tmp, "profile.yaml")
+            with open(path, "w") as ofile:
+                ofile.write("single: false\nmode: SAMPLE\n")
+            self.assertEqual(Profile.load(Device, path).settings, {"single": False, "mode": "SAMPLE"})
+        finally:
+            shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+import unittest2 as unittest
+
+import numpy
+
+from pytek.waveform import Waveform
+from pytek.spectrum import SpectrumAnalyzer
+
+
+PREAMBLE = {
+    "x_incr": 1e-05,
+    "xzero": 0.0,
+    "y_scale": 1.0,
+    "y_offset": 0.0,
+    "y_zero": 0.0,
+}
+
+
+def sine(freq=1000.0, amplitude=1.0, offset=0.0, noise=0.0, seed=0, count=10000):
+    t = numpy.arange(count) * PREAMBLE["x_incr"]
+    y = offset + amplitude * numpy.sin(2 * numpy.pi * freq * t + 0.3)
+    if noise:
+        y += numpy.random.RandomState(seed).normal(0, noise, count)
+    return Waveform(y, PREAMBLE)
+
+
+class TestSpectrum(unittest.TestCase):
+
+    def test_frequency_axis(self):
+        spectrum = SpectrumAnalyzer().process(sine())
+        self.assertEqual(len(spectrum), 5001)
+        self.assertAlmostEqual(spectrum.frequency[1], 10.0)
+        self.assertAlmostEqual(spectrum.frequency[-1], 50000.0)
+
+    def test_amplitude(self):
+        for window in ("rectangular", "hanning", "flattop"):
+            spectrum = SpectrumAnalyzer(window=window).process(sine(amplitude=2.0, offset=0.5))
+            freq, value = spectrum.peak()
+            self.assertAlmostEqual(freq, 1000.0)
+            self.assertAlmostEqual(value, 2.0, places=3)
+        spectrum = SpectrumAnalyzer(window="rectangular").process(sine(amplitude=2.0, offset=0.5))
+        self.assertAlmostEqual(spectrum.values[0], 0.5, places=6)
+
+    def test_truncated(self):
+        #Only the first 2000 points are used, and the window is applied to just those.
+        analyzer = SpectrumAnalyzer(window="hanning", nfft=2000)
+        spectrum = analyzer.process(sine(amplitude=2.0))
+        self.assertEqual(len(spectrum), 1001)
+        freq, value = spectrum.peak()
+        self.assertAlmostEqual(freq, 1000.0)
+        self.assertAlmostEqual(value, 2.0, places=3)
+        wfm = sine(amplitude=2.0)
+        short = SpectrumAnalyzer(window="hanning").process(Waveform(wfm.curve[:2000], PREAMBLE))
+        numpy.testing.assert_allclose(spectrum.values, short.values)
+
+    def test_flattop_off_bin(self):
+        spectrum = SpectrumAnalyzer(window="flattop").process(sine(freq=1005.0))
+        self.assertAlmostEqual(spectrum.peak()[1], 1.0, delta=0.01)
+
+    def test_dbv(self):
+        spectrum = SpectrumAnalyzer(scaling="dbv").process(sine())
+        self.assertAlmostEqual(spectrum.peak()[1], -3.0103, places=3)
+
+    def test_psd_parseval(self):
+        wfm = sine(amplitude=0.0, noise=0.1)
+        spectrum = SpectrumAnalyzer(window="rectangular", scaling="psd").process(wfm)
+        power = numpy.sum(spectrum.values) * spectrum.frequency[1]
+        self.assertAlmostEqual(power, numpy.mean(wfm.y ** 2), places=6)
+
+    def test_averaging(self):
+        linear = SpectrumAnalyzer(average="linear")
+        peak = SpectrumAnalyzer(average="peak")
+        single = SpectrumAnalyzer()
+        for i in xrange(20):
+            wfm = sine(noise=0.5, seed=i)
+            averaged = linear.process(wfm)
+            held = peak.process(wfm)
+            last = single.process(wfm)
+        self.assertEqual(averaged.count, 20)
+        self.assertEqual(last.count, 1)
+        noise_avg = numpy.std(averaged.values[200:])
+        noise_single = numpy.std(last.values[200:])
+        self.assertLess(noise_avg, noise_single / 2)
+        self.assertTrue(numpy.all(held.values >= averaged.values - 1e-12))
+        self.assertAlmostEqual(averaged.peak()[1], 1.0, delta=0.02)
+
+    def test_length_change_during_average(self):
+        analyzer = SpectrumAnalyzer(average="linear")
+        analyzer.process(sine())
+        with self.assertRaises(ValueError):
+            analyzer.process(sine(count=5000))
+        analyzer.reset()
+        self.assertEqual(analyzer.process(sine(count=5000)).count, 1)
@@ -0,0 +1,76 @@
+import unittest2 as unittest
+from io import BytesIO
+
+import numpy
+
+from pytek.waveform import Waveform
+from pytek.stats import RunningStats
+
+
+PREAMBLE = {
+    "x_incr": 1e-06,
+    "xzero": -0.0045,
+    "y_scale": 0.01,
+    "y_offset": 32768.0,
+    "y_zero": 0.0,
+}
+
+
+def records(count, seed=0, length=100):
+    rng = numpy.random.RandomState(seed)
+    return rng.randint(30000, 36000, size=(count, length))
+
+
+class TestRunningStats(unittest.TestCase):
+
+    def assertMatches(self, stats, curves):
+        y = Waveform((), PREAMBLE).to_y(curves)
+        self.assertEqual(stats.count, len(curves))
+        numpy.testing.assert_allclose(stats.mean, y.mean(axis=0))
+        numpy.testing.assert_allclose(stats.variance(), y.var(axis=0, ddof=1))
+        numpy.testing.assert_allclose(stats.std(ddof=0), y.std(axis=0))
+        numpy.testing.assert_array_equal(stats.min, y.min(axis=0))
+        numpy.testing.assert_array_equal(stats.max, y.max(axis=0))
+
+    def test_add(self):
+        curves = records(50)
+        stats = RunningStats()
+        for curve in curves:
+            stats.add(Waveform(curve, PREAMBLE))
+        self.assertMatches(stats, curves)
+
+    def test_add_batch_and_merge(self):
+        curves = records(60)
+        a = RunningStats()
+        a.add_batch(curves[:25], PREAMBLE)
+        b = RunningStats()
+        for curve in curves[25:]:
+            b.add(curve, PREAMBLE)
+        a.merge(b)
+        self.assertMatches(a, curves)
+        self.assertEqual(b.count, 35)
+
+    def test_stable_with_large_offset(self):
+        stats = RunningStats()
+        preamble = dict(PREAMBLE, y_zero=1e9)
+        for i in xrange(1000):
+            stats.add(numpy.array([32768 + (i % 2)]), preamble)
+        self.assertAlmostEqual(stats.variance(ddof=0)[0], 0.25e-4, places=10)
+
+    def test_save_load(self):
+        stats = RunningStats()
+        stats.add_batch(records(10), PREAMBLE)
+        ofile = BytesIO()
+        stats.save(ofile)
+        loaded = RunningStats.load(BytesIO(ofile.getvalue()))
+        loaded.add_batch(records(5, seed=1), PREAMBLE)
+        self.assertMatches(loaded, numpy.concatenate([records(10), records(5, seed=1)]))
+        self.assertEqual(loaded.preamble, PREAMBLE)
+
+    def test_time_base_mismatch(self):
+        stats = RunningStats()
+        stats.add(records(1)[0], PREAMBLE)
+        with self.assertRaises(ValueError):
+            stats.add(records(1)[0], dict(PREAMBLE, x_incr=2e-6))
+        with self.assertRaises(ValueError):
+            stats.add(records(1, length=10)[0], PREAMBLE)
@@ -0,0 +1,310 @@
+import unittest2 as unittest
+from mock import Mock
+
+from pytek.util import Configurator, Configurable, SettingsCache, parse_settings, join_settings
+
+
+class Device(Configurable):
+
+    def __init__(self):
+        self.send_command = Mock()
+        self.send_query = Mock(return_value="ON")
+
+    @Configurator.boolean("FROBBED", volatile=False)
+    def frobbed(flag):
+        if flag:
+            return ("ON", "1")
+        return ("OFF", "0")
+
+    @Configurator.config("FOO:BAR", volatile=False, ttl=5)
+    def foobar(self, val):
+        return val.lower()
+
+    @Configurator.boolean("RUNNING")
+    def running(flag):
+        if flag:
+            return ("ON",)
+        return ("OFF",)
+
+    @Configurator.enum("MODE")
+    def mode():
+        return (("SAMple",), ("PEAKdetect", "PEAK"), ("AVErage",), ("CH1",), ("PK2pk",))
+
+    @Configurator.enum("STATE", readonly=True, strict=True)
+    def state():
+        return (("ready",), ("save", "sav"))
+
+    @Configurator.numeric("DELAY", range=(0, 10), step=0.001, units="s")
+    def delay():
+        pass
+
+    @Configurator.numeric("COUNT", range=(1, None), integer=True)
+    def count():
+        pass
+
+    @Configurator.numeric("WINDOW", values=(1, 2, 4, 1024), integer=True)
+    def window():
+        pass
+
+
+class Clock(object):
+    now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestSettingsCache(unittest.TestCase):
+
+    def setUp(self):
+        self.dev = Device()
+        self.clock = Clock()
+
+    def test_disabled(self):
+        self.dev.frobbed(False)
+        self.assertTrue(self.dev.frobbed())
+        self.assertEqual(self.dev.send_query.call_count, 1)
+
+    def test_write_through(self):
+        self.dev.enable_settings_cache(clock=self.clock)
+        self.dev.frobbed(False)
+        self.dev.send_command.assert_called_with("FROBBED", "OFF")
+        self.assertFalse(self.dev.frobbed())
+        self.assertFalse(self.dev.send_query.called)
+
+        #Queried values are cached too.
+        self.assertEqual(self.dev.foobar(), "on")
+        self.assertEqual(self.dev.foobar(), "on")
+        self.assertEqual(self.dev.send_query.call_count, 1)
+
+    def test_volatile(self):
+        self.dev.enable_settings_cache()
+        self.dev.running(False)
+        self.assertTrue(self.dev.running())
+        self.dev.send_query.assert_called_once_with("RUNNING")
+        self.assertNotIn("RUNNING", self.dev.settings_cache)
+
+    def test_ttl(self):
+        self.dev.enable_settings_cache(ttl=60, clock=self.clock)
+        self.dev.foobar("TAZ")
+        self.dev.frobbed(True)
+        self.clock.now = 4.0
+        self.assertEqual(self.dev.foobar(), "taz")
+        #The setting's own time to live takes precedence over the cache's.
+        self.clock.now = 6.0
+        self.assertEqual(self.dev.foobar(), "on")
+        self.dev.send_query.assert_called_once_with("FOO:BAR")
+        self.assertTrue(self.dev.frobbed())
+        self.clock.now = 61.0
+        self.dev.frobbed()
+        self.dev.send_query.assert_called_with("FROBBED")
+
+    def test_invalidate(self):
+        self.dev.enable_settings_cache()
+        self.dev.frobbed(False)
+        self.dev.foobar("TAZ")
+        self.dev.invalidate("frobbed")
+        self.assertTrue(self.dev.frobbed())
+        self.assertEqual(self.dev.foobar(), "taz")
+        self.dev.invalidate()
+        self.assertEqual(len(self.dev.settings_cache), 0)
+        self.dev.disable_settings_cache()
+        self.dev.invalidate()
+        self.assertIsNone(self.dev.settings_cache)
+
+    def test_cache(self):
+        cache = SettingsCache(ttl=1, clock=self.clock)
+        self.assertIsNone(cache.get("A"))
+        cache.put("a", "1")
+        self.assertEqual(cache.get("A"), "1")
+        self.assertEqual(cache.get("A", ttl=0.5), "1")
+        self.clock.now = 2.0
+        self.assertIsNone(cache.get("A"))
+        self.assertNotIn("A", cache)
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.dev = Device()
+
+    def test_batch(self):
+        with self.dev.batch():
+            self.dev.frobbed(True)
+            self.dev.foobar("taz")
+            self.dev.running(False)
+            self.dev.frobbed(False)
+            self.assertEqual(self.dev.settings_batch[0], ("FROBBED", "ON"))
+            self.assertFalse(self.dev.send_command.called)
+        self.dev.send_command.assert_called_once_with(":FOO:BAR taz;:RUNNING OFF;:FROBBED OFF")
+        self.assertIsNone(self.dev.settings_batch)
+
+    def test_nested(self):
+        with self.dev.batch():
+            self.dev.frobbed(True)
+            with self.dev.batch():
+                self.dev.running(True)
+            self.assertFalse(self.dev.send_command.called)
+        self.dev.send_command.assert_called_once_with(":FROBBED ON;:RUNNING ON")
+
+    def test_exception(self):
+        with self.assertRaises(KeyError):
+            with self.dev.batch():
+                self.dev.frobbed(True)
+                raise KeyError()
+        self.assertFalse(self.dev.send_command.called)
+        self.assertIsNone(self.dev.settings_batch)
+
+    def test_exception_cache(self):
+        self.dev.enable_settings_cache()
+        self.dev.foobar("taz")
+        with self.assertRaises(KeyError):
+            with self.dev.batch():
+                self.dev.frobbed(True)
+                self.dev.foobar("zap")
+                self.assertTrue(self.dev.frobbed())
+                raise KeyError()
+        self.assertEqual(self.dev.send_command.call_count, 1)
+        self.dev.send_query.return_value = "OFF"
+        self.assertFalse(self.dev.frobbed())
+        self.dev.send_query.return_value = "TAZ"
+        self.assertEqual(self.dev.foobar(), "taz")
+        self.assertEqual(self.dev.send_query.call_count, 2)
+
+    def test_send_failure_cache(self):
+        self.dev.enable_settings_cache()
+        self.dev.send_command.side_effect = IOError()
+        with self.assertRaises(IOError):
+            with self.dev.batch():
+                self.dev.frobbed(True)
+        self.assertNotIn("FROBBED", self.dev.settings_cache)
+
+    def test_lines(self):
+        self.dev.BATCH_MAX_LINE = 26
+        with self.dev.batch():
+            self.dev.foobar("taz")
+            self.dev.frobbed(True)
+            self.dev.running(True)
+        self.assertEqual(self.dev.send_command.call_count, 2)
+
+
+class TestTypes(unittest.TestCase):
+
+    def setUp(self):
+        self.dev = Device()
+
+    def test_enum(self):
+        self.assertEqual(Device.mode.configurator.values, ("SAM", "PEAK", "AVE", "CH1", "PK2"))
+        self.dev.mode("sample")
+        self.dev.send_command.assert_called_with("MODE", "SAMPLE")
+        self.dev.mode("Peak")
+        self.dev.send_command.assert_called_with("MODE", "PEAKDETECT")
+        self.dev.mode("AVE")
+        self.dev.send_command.assert_called_with("MODE", "AVERAGE")
+        self.dev.mode("ch1")
+        self.dev.send_command.assert_called_with("MODE", "CH1")
+        self.dev.mode("pk2")
+        self.dev.send_command.assert_called_with("MODE", "PK2PK")
+
+        self.dev.send_query.return_value = "peakdetect"
+        self.assertEqual(self.dev.mode(), "PEAK")
+        self.dev.send_query.return_value = "ENV"
+        self.assertEqual(self.dev.mode(), "ENV")
+
+    def test_enum_invalid(self):
+        self.dev.send_command.reset_mock()
+        self.assertRaises(ValueError, self.dev.mode, "samp")
+        self.assertRaises(ValueError, self.dev.mode, "envelope")
+        self.assertRaises(ValueError, self.dev.mode, "CH")
+        with self.dev.batch():
+            self.assertRaises(ValueError, self.dev.mode, 3)
+        self.assertFalse(self.dev.send_command.called)
+
+    def test_readonly(self):
+        self.dev.send_query.return_value = "SAV"
+        self.assertEqual(self.dev.state(), "save")
+        self.assertRaises(TypeError, self.dev.state, "ready")
+        self.assertFalse(self.dev.send_command.called)
+        self.dev.send_query.return_value = "armed"
+        self.assertRaises(ValueError, self.dev.state)
+
+    def test_numeric(self):
+        self.dev.delay(0.5)
+        self.dev.send_command.assert_called_with("DELAY", "0.5")
+        self.dev.delay("20ms")
+        self.dev.send_command.assert_called_with("DELAY", "0.02")
+        self.dev.delay(" 1.5 s")
+        self.dev.send_command.assert_called_with("DELAY", "1.5")
+        self.dev.delay(0.0020000001)
+        self.dev.send_command.assert_called_with("DELAY", "0.002")
+
+        self.dev.send_query.return_value = "2.0E-2"
+        self.assertEqual(self.dev.delay(), 0.02)
+        self.dev.send_query.return_value = "9.9E37"
+        self.assertNotEqual(self.dev.delay(), self.dev.delay())
+
+    def test_numeric_invalid(self):
+        self.dev.send_command.reset_mock()
+        self.assertRaises(ValueError, self.dev.delay, 11)
+        self.assertRaises(ValueError, self.dev.delay, -1)
+        self.assertRaises(ValueError, self.dev.delay, 0.0015)
+        self.assertRaises(ValueError, self.dev.delay, "20 V")
+        self.assertRaises(ValueError, self.dev.delay, float("nan"))
+        self.assertRaises(ValueError, self.dev.count, 2.5)
+        self.assertRaises(ValueError, self.dev.count, 0)
+        self.assertRaises(ValueError, self.dev.window, 3)
+        self.assertRaises(ValueError, self.dev.window, 2048)
+        self.assertFalse(self.dev.send_command.called)
+
+    def test_integer(self):
+        self.dev.count(1e3)
+        self.dev.send_command.assert_called_with("COUNT", "1000")
+        self.dev.count("2k")
+        self.dev.send_command.assert_called_with("COUNT", "2000")
+        self.dev.send_query.return_value = "16"
+        self.assertEqual(self.dev.count(), 16)
+        self.assertIsInstance(self.dev.count(), int)
+        self.dev.window(4.0)
+        self.dev.send_command.assert_called_with("WINDOW", "4")
+        self.assertEqual(Device.window.configurator.values, (1, 2, 4, 1024))
+
+
+class TestSettings(unittest.TestCase):
+
+    RESPONSE = (':ACQUIRE:STOPAFTER RUNSTOP;STATE 1;MODE SAMPLE;:HEADER 1;*ESE 61;'
+        ':TRIGGER:A:MODE AUTO;EDGE:SOURCE CH1;SLOPE RISE;:DISPLAY:CLOCK 1;'
+        ':MESSAGE:STATE 0;SHOW "a;b: c";:TRIGGER:B:STATE 0\n')
+
+    def test_parse(self):
+        settings = parse_settings(self.RESPONSE)
+        self.assertEqual(list(settings.items()), [
+            ("ACQUIRE:STOPAFTER", "RUNSTOP"),
+            ("ACQUIRE:STATE", "1"),
+            ("ACQUIRE:MODE", "SAMPLE"),
+            ("HEADER", "1"),
+            ("*ESE", "61"),
+            ("TRIGGER:A:MODE", "AUTO"),
+            ("TRIGGER:A:EDGE:SOURCE", "CH1"),
+            ("TRIGGER:A:EDGE:SLOPE", "RISE"),
+            ("DISPLAY:CLOCK", "1"),
+            ("MESSAGE:STATE", "0"),
+            ("MESSAGE:SHOW", '"a;b: c"'),
+            ("TRIGGER:B:STATE", "0"),
+        ])
+
+    def test_join(self):
+        settings = parse_settings(self.RESPONSE)
+        lines = join_settings(settings)
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith(":ACQUIRE:STOPAFTER RUNSTOP;STATE 1;MODE SAMPLE;:HEADER 1;*ESE 61;"))
+        self.assertEqual(parse_settings(lines[0]), settings)
+
+        lines = join_settings(settings, max_line=40)
+        self.assertGreater(len(lines), 1)
+        self.assertTrue(all(len(l) <= 40 for l in lines))
+        self.assertTrue(all(l.startswith((":", "*")) for l in lines))
+        self.assertEqual(parse_settings(";".join(lines)), settings)
+
+
+if __name__ == '__main__':
+    unittest.main()